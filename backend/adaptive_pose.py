@@ -0,0 +1,132 @@
+import time
+
+MODEL_URLS = {
+    "lite": "https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_lite/float16/1/pose_landmarker_lite.task",
+    "full": "https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_full/float16/1/pose_landmarker_full.task",
+    "heavy": "https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_heavy/float16/1/pose_landmarker_heavy.task",
+}
+
+# Quality ladder, best first: (model variant, max input side in px, detect every Nth frame)
+# max side None = full input resolution
+LEVELS = [
+    ("heavy", None, 1),
+    ("heavy", 640, 1),
+    ("full", 640, 1),
+    ("full", 480, 1),
+    ("lite", 480, 1),
+    ("lite", 320, 1),
+    ("lite", 320, 2),
+    ("lite", 256, 3),
+    ("lite", 256, 4),
+]
+
+
+class AdaptivePoseController:
+    """
+    Per-stream controller that picks model variant, input size and detect stride
+    to keep the per-frame inference cost (detect time / stride) under a budget.
+    Frames between detections get landmarks extrapolated from the last two results.
+    The first detection on a new variant is not timed: it pays the landmarker swap and a full
+    (untracked) detection. The pose workers keep a pre-built spare of every variant for the swap.
+    """
+    def __init__(self, budget_ms=50.0, variants=("lite", "full", "heavy"), enabled=True, cooldown=15):
+        self.budget_ms = budget_ms
+        self.enabled = enabled
+        self.cooldown = cooldown
+        self.levels = [lv for lv in LEVELS if lv[0] in variants] or [LEVELS[0]]
+        self.level = 0
+        self.ewma_ms = None
+        self.frames_at_level = 0
+        self.untimed = False     # next sample is the first on a new variant
+        self.blocked_until = {}  # level -> frame index; backs off after a level proved too slow
+        self.backoff = {}        # level -> frames to wait before retrying it (doubles each time)
+        self.frame_index = 0
+        self.last_detect_frame = None
+        self.prev = None   # (frame_index, poses)
+        self.last = None
+        self.last_detect_time = None
+        self.interval_ms = None
+        self.input_size = None   # (h, w) actually fed to the detector last time (after every cap)
+
+    @property
+    def variant(self):
+        return self.levels[self.level][0]
+
+    @property
+    def max_side(self):
+        return self.levels[self.level][1] if self.enabled else None
+
+    @property
+    def stride(self):
+        return self.levels[self.level][2] if self.enabled else 1
+
+    def should_detect(self):
+        """Call once per frame, before inference"""
+        self.frame_index += 1
+        if self.last is None or self.last_detect_frame is None:
+            return True
+        return self.frame_index - self.last_detect_frame >= self.stride
+
+    def observe(self, poses, detect_ms, input_size=None):
+        """Record a detector result, its wall time and input (h, w), then adapt the level"""
+        if input_size is not None:
+            self.input_size = tuple(input_size)
+        self.prev, self.last = self.last, (self.frame_index, poses)
+        self.last_detect_frame = self.frame_index
+        now = time.time()
+        if self.last_detect_time is not None:
+            gap = (now - self.last_detect_time) * 1000
+            self.interval_ms = gap if self.interval_ms is None else 0.9 * self.interval_ms + 0.1 * gap
+        self.last_detect_time = now
+        if self.untimed:
+            self.untimed = False
+            return
+        self.ewma_ms = detect_ms if self.ewma_ms is None else 0.8 * self.ewma_ms + 0.2 * detect_ms
+        self.frames_at_level += 1
+        if self.enabled and self.frames_at_level >= self.cooldown:
+            self._adapt()
+
+    def _adapt(self):
+        cost = self.ewma_ms / self.stride
+        if cost > self.budget_ms * 1.1 and self.level < len(self.levels) - 1:
+            self.backoff[self.level] = min(self.backoff.get(self.level, self.cooldown * 5) * 2, self.cooldown * 200)
+            self.blocked_until[self.level] = self.frame_index + self.backoff[self.level]
+            self._set_level(self.level + 1)
+        elif self.level > 0 and self.blocked_until.get(self.level - 1, 0) <= self.frame_index:
+            # Only step up if the better level is predicted to fit with headroom
+            variant, _, stride = self.levels[self.level - 1]
+            if cost * self.stride / stride < self.budget_ms * 0.6:
+                self._set_level(self.level - 1)
+
+    def _set_level(self, level):
+        if self.levels[level][0] != self.variant:
+            self.prev = None  # tracking restarts on a new model
+            self.untimed = True
+        self.level = level
+        self.frames_at_level = 0
+        self.ewma_ms = None
+
+    def interpolated(self):
+        """Landmarks for a frame the detector skipped"""
+        if self.last is None:
+            return None
+        f2, p2 = self.last
+        if self.prev is None:
+            return p2
+        f1, p1 = self.prev
+        if p1.shape != p2.shape or f2 <= f1:
+            return p2
+        # Constant-velocity extrapolation, never further than one stride ahead
+        t = min(self.frame_index - f2, self.stride) / (f2 - f1)
+        return p2 + (p2 - p1) * t
+
+    def stats(self):
+        return {
+            "model": self.variant,
+            # The side inference really ran at: the level's cap, or smaller (server cap / source size)
+            "max_side": max(self.input_size) if self.input_size else self.max_side,
+            "input": f"{self.input_size[1]}x{self.input_size[0]}" if self.input_size else None,
+            "stride": self.stride,
+            "detect_ms": round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+            "detect_fps": round(1000 / self.interval_ms, 1) if self.interval_ms else None,
+        }
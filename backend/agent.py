@@ -2,108 +2,114 @@ import asyncio
 import os
 import cv2
 import json
-import easyocr
-import time
+from collections import deque
 from dotenv import load_dotenv
 from livekit import agents, rtc
-from livekit.agents import JobContext, WorkerOptions, cli
+from livekit.agents import JobContext, JobProcess, WorkerOptions, cli
 import google.generativeai as genai
+import ocr_service
+from scoreboard import ScoreboardOCR
+from review_scheduler import RoomReviewScheduler
 
 load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
 if api_key: genai.configure(api_key=api_key)
 
-# 1. REMOVED GLOBAL READER INITIALIZATION HERE (Crucial Fix)
+# Frames waiting per room (all tracks); when full the oldest is dropped
+ROOM_QUEUE = int(os.getenv("ROOM_QUEUE", "4"))
+
+
+class RoomWorkQueue:
+    """Bounded frame queue shared by a room's tracks: readers never block, stale frames are dropped"""
+    def __init__(self, maxsize=4):
+        self.items = deque(maxlen=maxsize)
+        self.event = asyncio.Event()
+        self.stats = {"queued": 0, "dropped": 0}
+
+    def put(self, item):
+        if len(self.items) == self.items.maxlen:
+            self.stats["dropped"] += 1
+        self.items.append(item)
+        self.stats["queued"] += 1
+        self.event.set()
+
+    async def get(self):
+        while not self.items:
+            self.event.clear()
+            await self.event.wait()
+        return self.items.popleft()
+
+
+def prewarm(proc: JobProcess):
+    # Connections, not state: the OCR model and the review rate limit live once in the shared service process
+    proc.userdata["ocr"] = ocr_service.connect()
+    proc.userdata["review_bucket"] = ocr_service.review_bucket()
 
 async def entrypoint(ctx: JobContext):
     await ctx.connect()
     print(f"🤖 Agent Connected: {ctx.room.name}")
-    
-    # 2. INITIALIZE READER HERE INSTEAD
-    print("📚 Loading OCR Model (this happens once)...")
-    reader = easyocr.Reader(['en'], gpu=False)
-    print("✅ OCR Ready")
+    reader = ctx.proc.userdata.get("ocr") or ocr_service.connect()
+    review_bucket = ctx.proc.userdata.get("review_bucket") or ocr_service.review_bucket()
+
+    async def publish_verdict(clean_json):
+        await ctx.room.local_participant.publish_data(
+            clean_json.encode('utf-8'),
+            reliable=True,
+            topic="ai_verdict"
+        )
+
+    async def publish_score(score):
+        payload = json.dumps({"score": score}).encode('utf-8')
+        await ctx.room.local_participant.publish_data(
+            payload,
+            topic="ai_analysis"
+        )
+
+    # One in-flight review per room (all tracks), unchanged frames skipped, host-wide token bucket
+    referee = RoomReviewScheduler(publish_verdict, review_bucket)
+    work = RoomWorkQueue(ROOM_QUEUE)
+    tasks = {asyncio.create_task(process_room(work, reader, referee, publish_score))}
 
     @ctx.room.on("track_subscribed")
     def on_track_subscribed(track, publication, participant):
         if track.kind == rtc.TrackKind.KIND_VIDEO:
             print(f"🎥 Found Screen Share from {participant.identity}")
-            # Pass reader to the processing function
-            asyncio.create_task(process_video_track(ctx, track, reader))
+            task = asyncio.create_task(read_video_track(track, work))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
 
-async def process_video_track(ctx: JobContext, track: rtc.VideoTrack, reader):
+async def read_video_track(track: rtc.VideoTrack, work):
+    """Only enqueues; conversion and analysis happen in process_room for the frames that survive"""
     video_stream = rtc.VideoStream(track)
     print("🚀 Analysis Pipeline Started")
-    
     frame_count = 0
-    last_analysis_time = 0
-    
     async for frame in video_stream:
+        work.put((track.sid, frame_count, frame))
+        frame_count += 1
+
+async def process_room(work, reader, referee, publish_score):
+    # OCR runs in a worker thread and only when the scoreboard pixels change (one reader per track)
+    scoreboards = {}
+    while True:
+        track_sid, frame_count, frame = await work.get()
+
         # Convert LiveKit YUV -> OpenCV BGR
         img = frame.buffer.to_numpy()
         img = cv2.cvtColor(img, cv2.COLOR_RGBA2BGR)
         h, w = img.shape[:2]
         if h > 480: img = cv2.resize(img, (int(w*(480/h)), 480))
 
-        # 1. OCR (Fast - Every 0.5s)
-        if frame_count % 15 == 0:
-            score = detect_score(img, reader) # Pass reader instance
-            if score:
-                payload = json.dumps({"score": score}).encode('utf-8')
-                await ctx.room.local_participant.publish_data(
-                    payload,
-                    topic="ai_analysis"
-                )
-
-        # 2. GEMINI REFEREE (Every 5 seconds)
-        current_time = time.time()
-        if current_time - last_analysis_time > 5:
-            last_analysis_time = current_time
-            asyncio.create_task(run_gemini_analysis(ctx, img))
-        
-        frame_count += 1
+        # 1. OCR (change-gated, off the loop - checked every 5 frames)
+        if frame_count % 5 == 0:
+            if track_sid not in scoreboards:
+                scoreboards[track_sid] = ScoreboardOCR(reader, publish_score)
+            scoreboards[track_sid].submit(img)
 
-def detect_score(frame, reader):
-    try:
-        # Scans top 15% of screen
-        roi = frame[0:int(frame.shape[0]*0.15), :]
-        res = reader.readtext(roi, detail=0)
-        return " | ".join([x for x in res if any(c.isdigit() for c in x)])
-    except: return None
-
-async def run_gemini_analysis(ctx, img_frame):
-    try:
-        temp_path = f"temp_{int(time.time())}.jpg"
-        cv2.imwrite(temp_path, img_frame)
-        
-        myfile = genai.upload_file(temp_path)
-        while myfile.state.name == "PROCESSING":
-            await asyncio.sleep(0.5)
-            myfile = genai.get_file(myfile.name)
-        
-        # Using Gemini 2.0 Flash
-        model = genai.GenerativeModel("models/gemini-2.0-flash-exp")
-        
-        result = model.generate_content([
-            myfile, 
-            "You are an NBA Ref. Analyze this image. Return JSON ONLY: {\"event\": \"description\", \"foul\": boolean, \"rule_citation\": \"rule name\"}"
-        ])
-        
-        if result.text:
-            clean_json = result.text.replace("```json", "").replace("```", "")
-            await ctx.room.local_participant.publish_data(
-                clean_json.encode('utf-8'),
-                reliable=True,
-                topic="ai_verdict"
-            )
-            
-        try: 
-            myfile.delete()
-            os.remove(temp_path)
-        except: pass
-            
-    except Exception as e:
-        print(f"Gemini Error: {e}")
+        # 2. GEMINI REFEREE (Every 5 seconds at most)
+        referee.offer(img)
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint))
\ No newline at end of file
+    # One OCR model per host, started before any job; later workers reuse it.
+    # Keep the reference: a collected manager shuts its service down.
+    ocr_manager = ocr_service.ensure_service()
+    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
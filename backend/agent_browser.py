@@ -1,22 +1,39 @@
-from browser_use import Agent
-from langchain_google_genai import ChatGoogleGenerativeAI
 import os
+import time
 from dotenv import load_dotenv
 import asyncio
+from rulebook import RulebookLibrary
 
 load_dotenv()
 
-# Setup Gemini for the Browser Agent
-# Note: Browser Use works best with 'gemini-1.5-pro' for reasoning, 
-# but 'flash' is faster. We use Flash for speed.
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash-exp", # Use 2.0 or 1.5-flash
-    api_key=os.getenv("GEMINI_API_KEY")
-)
+# Local rulebook index answers most citations in milliseconds;
+# the browser agent is only launched for misses.
+rulebooks = RulebookLibrary()
+
+llm = None
+def get_llm():
+    # Setup Gemini for the Browser Agent
+    # Note: Browser Use works best with 'gemini-1.5-pro' for reasoning,
+    # but 'flash' is faster. We use Flash for speed.
+    global llm
+    if llm is None:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        llm = ChatGoogleGenerativeAI(
+            model="gemini-2.0-flash-exp", # Use 2.0 or 1.5-flash
+            api_key=os.getenv("GEMINI_API_KEY")
+        )
+    return llm
 
 async def verify_rule_with_browser(rule_citation, sport="NFL"):
+    start = time.perf_counter()
+    hit = rulebooks.lookup(sport, rule_citation)
+    if hit:
+        print(f"📖 RULEBOOK: '{rule_citation}' -> {hit['heading']} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        return hit["text"]
+
     print(f"🕵️ BROWSER AGENT: Verifying '{rule_citation}'...")
-    
+    from browser_use import Agent
+
     task = f"""
     Go to google.com.
     Search for "{sport} Official Rulebook {rule_citation}".
@@ -24,15 +41,15 @@ async def verify_rule_with_browser(rule_citation, sport="NFL"):
     Find the text of the rule.
     Return the exact text description of the foul.
     """
-    
+
     agent = Agent(
         task=task,
-        llm=llm,
+        llm=get_llm(),
         headless=False,  # ✅ TRUE = Invisible, FALSE = User sees the browser open!
     )
-    
+
     try:
         result = await agent.run()
         return result.final_result
     except Exception as e:
-        return f"Could not verify rule: {str(e)}"
\ No newline at end of file
+        return f"Could not verify rule: {str(e)}"
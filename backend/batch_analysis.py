@@ -0,0 +1,190 @@
+"""
+Offline pose extraction for recorded matches.
+
+    python batch_analysis.py match.mp4 --out tracks/match            # all cores, heavy model
+    python batch_analysis.py match.mp4 --out tracks/match --model pose_landmarker_lite.task
+    python batch_analysis.py match.mp4 --out tracks/match --model stub  # pipeline check, no model
+
+The video is cut into time chunks that run in parallel worker processes.
+Output directory (re-running the same command resumes; finished chunks are skipped):
+  poses.npy       float16 (frames x MAX_POSES x 33 x 3), normalized x, y, z; NaN where no pose
+  counts.npy      int8 (frames,) poses found per frame; -1 = frame not analyzed yet
+  timestamps.npy  float64 (frames,) ms from the start of the video
+  meta.json       source, fps, chunk plan and which chunks are done
+The .npy files are memory-mapped, so PoseTrack lookups don't load the whole game.
+"""
+import argparse
+import json
+import multiprocessing as mproc
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import numpy as np
+from inference_pool import NUM_LANDMARKS, MAX_POSES, _create_landmarker, _detect
+
+
+def plan_chunks(frame_count, fps, chunk_seconds):
+    step = max(1, int(round(fps * chunk_seconds)))
+    return [(start, min(start + step, frame_count)) for start in range(0, frame_count, step)]
+
+
+def _write_meta(out_dir, meta):
+    path = os.path.join(out_dir, "meta.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _analyze_chunk(video, out_dir, model_path, start, end, fps, max_side):
+    """Worker process: decode frames [start, end) and write their poses in place"""
+    poses_out = np.load(os.path.join(out_dir, "poses.npy"), mmap_mode="r+")
+    counts_out = np.load(os.path.join(out_dir, "counts.npy"), mmap_mode="r+")
+    ts_out = np.load(os.path.join(out_dir, "timestamps.npy"), mmap_mode="r+")
+
+    landmarker = _create_landmarker(model_path)
+
+    cap = cv2.VideoCapture(video)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    t0 = time.perf_counter()
+    frame_idx = start
+    try:
+        while frame_idx < end:
+            ok, frame = cap.read()
+            if not ok:
+                break  # container frame count can overestimate; the tail stays -1
+            h, w = frame.shape[:2]
+            if max_side and max(h, w) > max_side:
+                scale = max_side / max(h, w)
+                frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            poses = _detect(landmarker, rgb, int(frame_idx * 1000 / fps))
+
+            n = min(len(poses), MAX_POSES)
+            poses_out[frame_idx] = np.nan
+            poses_out[frame_idx, :n] = poses[:n]
+            counts_out[frame_idx] = n
+            ts_out[frame_idx] = frame_idx * 1000 / fps
+            frame_idx += 1
+    finally:
+        cap.release()
+        landmarker.close()
+        for arr in (poses_out, counts_out, ts_out):
+            arr.flush()
+    return start, end, frame_idx - start, time.perf_counter() - t0
+
+
+def analyze_video(video, out_dir, model_path="pose_landmarker.task", chunk_seconds=30.0,
+                  workers=None, max_side=None):
+    """Runs (or resumes) the batch job and returns the finished PoseTrack"""
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video}")
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    if frame_count <= 0:
+        raise ValueError(f"No frames in video: {video}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    meta_path = os.path.join(out_dir, "meta.json")
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        # A different source / model / resolution invalidates earlier results (chunk plan is kept)
+        if (meta["video"], meta["frame_count"], meta["model"], meta["max_side"]) != \
+                (os.path.abspath(video), frame_count, model_path, max_side):
+            print(f"♻️ Settings changed, restarting {out_dir}")
+            meta = None
+
+    if meta is None:
+        chunks = plan_chunks(frame_count, fps, chunk_seconds)
+        meta = {
+            "video": os.path.abspath(video), "frame_count": frame_count, "fps": fps,
+            "model": model_path, "max_side": max_side, "max_poses": MAX_POSES,
+            "chunks": chunks, "done": [],
+        }
+        np.lib.format.open_memmap(os.path.join(out_dir, "poses.npy"), mode="w+", dtype=np.float16,
+                                  shape=(frame_count, MAX_POSES, NUM_LANDMARKS, 3))[:] = np.nan
+        np.lib.format.open_memmap(os.path.join(out_dir, "counts.npy"), mode="w+", dtype=np.int8,
+                                  shape=(frame_count,))[:] = -1
+        np.lib.format.open_memmap(os.path.join(out_dir, "timestamps.npy"), mode="w+", dtype=np.float64,
+                                  shape=(frame_count,))[:] = np.arange(frame_count) * 1000 / fps
+        _write_meta(out_dir, meta)
+
+    todo = [c for i, c in enumerate(meta["chunks"]) if i not in meta["done"]]
+    index = {tuple(c): i for i, c in enumerate(meta["chunks"])}
+    workers = workers or os.cpu_count() or 1
+    print(f"🎬 {video}: {frame_count} frames @ {fps:.1f} fps, {len(todo)}/{len(meta['chunks'])} chunks to run on {workers} workers")
+
+    start = time.perf_counter()
+    # spawn: MediaPipe / OpenCV state must not be forked
+    with ProcessPoolExecutor(max_workers=min(workers, max(len(todo), 1)), mp_context=mproc.get_context("spawn")) as pool:
+        futures = [pool.submit(_analyze_chunk, video, out_dir, model_path, s, e, fps, max_side) for s, e in todo]
+        for fut in as_completed(futures):
+            s, e, frames, secs = fut.result()
+            # Only the parent writes meta.json, so progress survives a crash at any point
+            meta["done"] = sorted(meta["done"] + [index[(s, e)]])
+            _write_meta(out_dir, meta)
+            print(f"✅ Frames {s}-{e}: {frames} in {secs:.1f}s ({frames / max(secs, 1e-6):.1f} fps) [{len(meta['done'])}/{len(meta['chunks'])}]")
+
+    if todo:
+        print(f"🏁 Done in {time.perf_counter() - start:.1f}s -> {out_dir}")
+    return PoseTrack(out_dir)
+
+
+class PoseTrack:
+    """Read-only, memory-mapped view of a batch output directory"""
+    def __init__(self, out_dir):
+        with open(os.path.join(out_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.fps = self.meta["fps"]
+        self.poses = np.load(os.path.join(out_dir, "poses.npy"), mmap_mode="r")
+        self.counts = np.load(os.path.join(out_dir, "counts.npy"), mmap_mode="r")
+        self.timestamps = np.load(os.path.join(out_dir, "timestamps.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def complete(self):
+        return len(self.meta["done"]) == len(self.meta["chunks"])
+
+    def frame_at(self, timestamp_ms):
+        """Index of the frame shown at `timestamp_ms`"""
+        i = int(np.searchsorted(self.timestamps, timestamp_ms, side="right")) - 1
+        return min(max(i, 0), len(self) - 1)
+
+    def at(self, timestamp_ms):
+        """(poses x 33 x 3) float32 for the frame at `timestamp_ms`, None if not analyzed"""
+        i = self.frame_at(timestamp_ms)
+        n = int(self.counts[i])
+        if n < 0:
+            return None
+        return np.asarray(self.poses[i, :n], dtype=np.float32)
+
+    def window(self, start_ms, end_ms):
+        """(timestamps, poses, counts) for every frame in [start_ms, end_ms]"""
+        a = int(np.searchsorted(self.timestamps, start_ms, side="left"))
+        b = int(np.searchsorted(self.timestamps, end_ms, side="right"))
+        return np.asarray(self.timestamps[a:b]), np.asarray(self.poses[a:b], dtype=np.float32), np.asarray(self.counts[a:b])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch pose extraction for a recorded match")
+    parser.add_argument("video")
+    parser.add_argument("--out", help="output directory (default: tracks/<video name>)")
+    parser.add_argument("--model", default="pose_landmarker.task", help=".task file, or 'stub'")
+    parser.add_argument("--chunk-seconds", type=float, default=30.0)
+    parser.add_argument("--workers", type=int, default=None, help="default: all cores")
+    parser.add_argument("--max-side", type=int, default=None, help="downscale frames before inference")
+    args = parser.parse_args()
+
+    if not args.model.startswith("stub") and not os.path.exists(args.model):
+        sys.exit(f"❌ Model not found: {args.model} (start main.py once to download it, or use --model stub)")
+    out = args.out or os.path.join("tracks", os.path.splitext(os.path.basename(args.video))[0])
+    track = analyze_video(args.video, out, args.model, args.chunk_seconds, args.workers, args.max_side)
+    analyzed = int((track.counts >= 0).sum())
+    print(f"📊 {analyzed}/{len(track)} frames analyzed, {int((track.counts > 0).sum())} with poses")
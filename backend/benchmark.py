@@ -0,0 +1,251 @@
+"""
+Replay benchmark for the frame-processing hot path.
+
+    python benchmark.py --video ../mock_data/1.mp4 --backend stub --out bench.json
+    python benchmark.py --video synthetic --frames 300 --mode ws --output pose --binary
+    python benchmark.py --video synthetic --frames 300 --mode ws --output delta   # binary, ACKs every frame
+
+Modes:
+  sync - process_frame_sync() called directly (decode, DVR write, inference, draw/encode)
+  ws   - the same frames through /ws/stream with an in-process TestClient, one frame in flight
+Backends:
+  stub      - deterministic fake landmarker in the pool workers (no model download)
+  mediapipe - the real PoseLandmarker (.task files must be present or downloadable)
+Results are JSON so runs can be diffed between releases. Peak RSS is reported for this process and for
+each pose worker (where the models live), plus their sum.
+"""
+import argparse
+import base64
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import cv2
+import numpy as np
+
+
+def load_frames(video, limit, quality=80, size=(1280, 720)):
+    """Pre-encode the replay as client-side JPEGs so encoding isn't measured"""
+    frames = []
+    if video == "synthetic":
+        w, h = size
+        for i in range(limit):
+            img = np.full((h, w, 3), 40, np.uint8)
+            x = int((i * 7) % (w - 120))
+            cv2.rectangle(img, (x, h // 3), (x + 120, h // 3 + 240), (0, 180, 255), -1)
+            cv2.putText(img, f"{i:05d}", (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+            frames.append(cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), quality])[1].tobytes())
+        return frames
+
+    cap = cv2.VideoCapture(video)
+    while len(frames) < limit:
+        ok, img = cap.read()
+        if not ok:
+            if not frames: break
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # loop short clips up to --frames
+            continue
+        frames.append(cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), quality])[1].tobytes())
+    cap.release()
+    if not frames:
+        raise SystemExit(f"❌ No frames readable from {video} (use --video synthetic)")
+    return frames
+
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6, 1)
+
+
+def worker_peak_rss_mb(pool):
+    """
+    Peak RSS (VmHWM) of each pose worker - the models and inference live there, and the workers are
+    still running, so RUSAGE_CHILDREN wouldn't count them. Linux only (/proc); None elsewhere.
+    """
+    peaks = []
+    for proc in (pool.procs if pool else []):
+        peak = None
+        try:
+            with open(f"/proc/{proc.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        peak = round(int(line.split()[1]) * 1024 / 1e6, 1)  # kB
+                        break
+        except (OSError, AttributeError):
+            pass
+        peaks.append(peak)
+    return peaks
+
+
+def summarize(latencies, wall_s, session, pool=None):
+    lat = np.array(latencies) * 1000
+    workers = worker_peak_rss_mb(pool)
+    return {
+        "frames": len(lat),
+        "fps": round(len(lat) / wall_s, 2) if wall_s else 0.0,
+        "latency_ms": {
+            "mean": round(float(lat.mean()), 2),
+            "p50": round(float(np.percentile(lat, 50)), 2),
+            "p95": round(float(np.percentile(lat, 95)), 2),
+            "p99": round(float(np.percentile(lat, 99)), 2),
+            "max": round(float(lat.max()), 2),
+        },
+        "peak_rss_mb": peak_rss_mb(),             # this process: server, decode / draw / encode
+        "worker_peak_rss_mb": workers,            # per pose worker: models + inference
+        "total_peak_rss_mb": round(peak_rss_mb() + sum(p for p in workers if p), 1),
+        "dvr": {
+            "storage": session.dvr.storage,
+            "frames": len(session.dvr.frame_buffer),
+            "memory_mb": round(session.dvr.memory_bytes() / 1e6, 2),
+        },
+        "inference": session.pose_ctl.stats(),
+    }
+
+
+def run_sync(main, frames, output, binary, warmup):
+    session = main.StreamSession(None, output=output)
+    try:
+        latencies = []
+        start = time.perf_counter()
+        for i, jpeg in enumerate(frames):
+            data = jpeg if binary else base64.b64encode(jpeg).decode()
+            ts = i * 33
+            t0 = time.perf_counter()
+            main.process_frame_sync(session, data, ts, received_at=time.time(), binary_meta=(i, ts) if binary else None)
+            if i == warmup - 1:
+                start = time.perf_counter()
+            elif i >= warmup:
+                latencies.append(time.perf_counter() - t0)
+        return summarize(latencies, time.perf_counter() - start, session, main.pose_pool)
+    finally:
+        session.close()
+
+
+def run_ws(main, client, frames, output, binary, warmup):
+    from wire_protocol import BINARY_SUBPROTOCOL, IN_HEADER
+    frame_types = ("video_frame", "pose_frame")
+    latencies = []
+    sent_bytes = 0
+    with client.websocket_connect(
+        f"/ws/stream?output={output}", subprotocols=[BINARY_SUBPROTOCOL] if binary else None
+    ) as ws:
+        start = time.perf_counter()
+        for i, jpeg in enumerate(frames):
+            t0 = time.perf_counter()
+            if binary:
+                ws.send_bytes(IN_HEADER.pack(i, i * 33) + jpeg)
+            else:
+                ws.send_text("data:image/jpeg;base64," + base64.b64encode(jpeg).decode())
+            # One frame in flight: wait for its result, skip stats / score messages
+            while True:
+                msg = ws.receive()
+                if msg.get("bytes") is not None:
+                    size = len(msg["bytes"])
+                    break
+                if json.loads(msg["text"]).get("type") in frame_types:
+                    size = len(msg["text"])
+                    break
+            if output == "delta":
+                ws.send_text(json.dumps({"type": "ack", "seq": i}))
+            if i == warmup - 1:
+                start = time.perf_counter()
+            elif i >= warmup:
+                latencies.append(time.perf_counter() - t0)
+                sent_bytes += size
+        wall = time.perf_counter() - start
+        session = max(main.sessions.values(), key=lambda s: s.last_active)
+        result = summarize(latencies, wall, session, main.pose_pool)
+        result["stream"] = session.slot.stats()
+        result["kb_per_frame"] = round(sent_bytes / max(len(latencies), 1) / 1024, 2)
+        if session.preview: result["preview"] = session.preview.stats()
+    return result
+
+
+@contextlib.contextmanager
+def logs_to_stderr():
+    """Server / pool-worker prints go to stderr so stdout stays clean JSON (fd-level: covers spawned workers)"""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    os.dup2(2, 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a video through the frame pipeline")
+    parser.add_argument("--video", default="../mock_data/1.mp4", help="video file, or 'synthetic'")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--mode", choices=["sync", "ws", "both"], default="both")
+    parser.add_argument("--backend", choices=["stub", "mediapipe"], default="stub")
+    parser.add_argument("--stub-ms", type=float, default=0.0, help="simulated inference cost per frame")
+    parser.add_argument("--output", choices=["video", "pose", "delta"], default="video")
+    parser.add_argument("--binary", action="store_true", help="use the binary subprotocol")
+    parser.add_argument("--out", help="write JSON here (default: stdout)")
+    args = parser.parse_args()
+    if args.output == "delta":
+        args.binary = True  # delta segments only exist on the binary protocol
+
+    # main.py reads its config at import
+    os.environ["POSE_BACKEND"] = args.backend
+    os.environ["POSE_STUB_MS"] = str(args.stub_ms)
+    os.environ.setdefault("REVIEW_BACKEND", "stub")
+    with logs_to_stderr():
+        import main as server
+    from fastapi.testclient import TestClient
+
+    frames = load_frames(args.video, args.frames)
+    h, w = cv2.imdecode(np.frombuffer(frames[0], np.uint8), cv2.IMREAD_COLOR).shape[:2]
+    report = {
+        "meta": {
+            "video": args.video, "frames": len(frames), "resolution": [w, h],
+            "backend": args.backend, "stub_ms": args.stub_ms, "output": args.output,
+            "transport": "binary" if args.binary else "text", "warmup": args.warmup,
+            "dvr_storage": server.DVR_STORAGE, "adaptive": server.POSE_ADAPTIVE,
+            "workers": server.INFERENCE_WORKERS, "scheduling": server.STREAM_SCHEDULING,
+            "git": git_revision(), "python": platform.python_version(),
+            "opencv": cv2.__version__, "numpy": np.__version__,
+        },
+        "results": {},
+    }
+
+    # The lifespan starts (and later stops) the pose worker pool; server logs go to stderr
+    with logs_to_stderr(), TestClient(server.app) as client:
+        while client.get("/ready").status_code != 200 and not server.startup["ready"]:
+            time.sleep(0.1)
+        report["meta"]["startup_s"] = server.startup["seconds"]
+        if not server.startup["pose"]:
+            raise SystemExit("❌ Pose pool did not start (missing model files?)")
+        if args.mode in ("sync", "both"):
+            print(f"⏱️ sync: {len(frames)} frames", file=sys.stderr)
+            report["results"]["sync"] = run_sync(server, frames, args.output, args.binary, args.warmup)
+        if args.mode in ("ws", "both"):
+            print(f"⏱️ ws: {len(frames)} frames", file=sys.stderr)
+            report["results"]["ws"] = run_ws(server, client, frames, args.output, args.binary, args.warmup)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+        print(f"✅ Wrote {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
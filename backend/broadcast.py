@@ -0,0 +1,167 @@
+import asyncio
+import itertools
+import json
+from collections import deque
+
+TOPICS = ("verdict", "score_update", "video_frame", "pose_frame")
+# Frames are superseded by the next one, so a full queue just loses its oldest frame.
+# Verdicts / score updates must arrive: a client that can't keep up with those is dropped.
+LOSSY_TOPICS = {"video_frame", "pose_frame"}
+
+
+class Subscriber:
+    def __init__(self, sub_id, websocket, topics, source, queue_size, send=None):
+        self.id = sub_id
+        self.websocket = websocket
+        self.topics = set(topics)
+        self.source = source          # only frames from this stream (None = all)
+        self.send = send              # the owner's own send path; such subscribers are never evicted
+        self.queue = deque()          # (message, source, keyframe)
+        self.resync = set()           # sources whose delta chain broke: their deltas wait for a keyframe
+        self.queue_size = queue_size
+        self.ready = asyncio.Event()
+        self.task = None
+        self.sent = 0
+        self.dropped = 0
+
+
+class BroadcastHub:
+    """
+    Fan-out of server events to websocket clients.
+    - publish() serializes once and only enqueues, so its cost doesn't depend on slow clients
+    - each subscriber has a bounded queue drained by its own writer task
+    - a send that takes longer than `send_timeout` (or a full queue of reliable messages) evicts the client
+    - subscribers with their own `send` (a socket the handler also writes to, e.g. an ingest stream) are
+      never evicted or closed by the hub: a full queue drops the oldest message and sends don't time out
+    - delta frames (published with keyframe=True/False) only make sense as an unbroken chain: once one is
+      dropped, that source's deltas are skipped up to its next keyframe and `on_resync(source)` is called
+    """
+    def __init__(self, queue_size=32, send_timeout=2.0, on_resync=None):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.on_resync = on_resync
+        self.subscribers = {}
+        self.ids = itertools.count(1)
+        self.closing = set()  # strong refs to close() tasks of evicted clients
+        self.stats = {"published": 0, "delivered": 0, "dropped": 0, "evicted": 0}
+
+    def subscribe(self, websocket, topics=TOPICS, source=None, send=None):
+        """`send(message)`: coroutine taking a str / bytes message, used instead of writing to the socket"""
+        sub = Subscriber(next(self.ids), websocket, topics, source, self.queue_size, send)
+        self.subscribers[sub.id] = sub
+        sub.task = asyncio.create_task(self._writer(sub))
+        return sub
+
+    async def unsubscribe(self, sub):
+        if self.subscribers.pop(sub.id, None) is None:
+            return
+        sub.task.cancel()
+        try: await sub.task
+        except (asyncio.CancelledError, Exception): pass
+
+    def has_subscribers(self, topic, source=None):
+        return any(topic in s.topics and s.source in (None, source) for s in self.subscribers.values())
+
+    def publish(self, topic, data, source=None, keyframe=None):
+        """
+        dict/str -> one JSON text message, bytes -> one binary message, shared by every subscriber.
+        `keyframe`: None for self-contained messages; True / False for a keyframe / a delta on top of it.
+        """
+        message = None
+        for sub in list(self.subscribers.values()):
+            # Stream-less messages (verdicts) go to everyone; stream messages only to matching viewers
+            if topic not in sub.topics or (source is not None and sub.source not in (None, source)):
+                continue
+            if keyframe:
+                sub.resync.discard(source)
+            elif keyframe is False and source in sub.resync:
+                self._skip(sub)
+                continue
+            if message is None:
+                if isinstance(data, (bytes, bytearray, memoryview)):
+                    message = bytes(data)
+                else:
+                    message = json.dumps({"type": topic, "data": data})
+                self.stats["published"] += 1
+            if len(sub.queue) >= sub.queue_size:
+                if topic not in LOSSY_TOPICS and sub.send is None:
+                    self._evict(sub, "queue full")
+                    continue
+                self._drop_oldest(sub)
+                if keyframe is False and source in sub.resync:
+                    self._skip(sub)  # the drop just broke this delta's own chain
+                    continue
+            sub.queue.append((message, source, keyframe))
+            sub.ready.set()
+
+    def _drop_oldest(self, sub):
+        _, source, keyframe = sub.queue.popleft()
+        dropped = 1
+        if keyframe is not None:
+            # The queued deltas of that source patch a picture the client won't have: drop up to its next keyframe
+            broken, kept = True, deque()
+            for entry in sub.queue:
+                if broken and entry[1] == source and entry[2] is not None:
+                    if entry[2]:
+                        broken = False
+                    else:
+                        dropped += 1
+                        continue
+                kept.append(entry)
+            sub.queue = kept
+            if broken:
+                sub.resync.add(source)
+                if self.on_resync: self.on_resync(source)
+        self._skip(sub, dropped)
+
+    def _skip(self, sub, n=1):
+        sub.dropped += n
+        self.stats["dropped"] += n
+
+    def _evict(self, sub, reason):
+        if self.subscribers.pop(sub.id, None) is None:
+            return
+        self.stats["evicted"] += 1
+        print(f"✂️ Dropped slow client #{sub.id} ({reason}, {len(sub.queue)} queued)")
+        sub.task.cancel()
+        task = asyncio.create_task(self._close(sub.websocket))
+        self.closing.add(task)
+        task.add_done_callback(self.closing.discard)
+
+    async def _close(self, websocket):
+        try: await asyncio.wait_for(websocket.close(code=1013), self.send_timeout)
+        except Exception: pass
+
+    async def _writer(self, sub):
+        while True:
+            while not sub.queue:
+                sub.ready.clear()
+                await sub.ready.wait()
+            message, _, _ = sub.queue.popleft()
+            try:
+                if sub.send is not None:
+                    await sub.send(message)
+                elif isinstance(message, bytes):
+                    await asyncio.wait_for(sub.websocket.send_bytes(message), self.send_timeout)
+                else:
+                    await asyncio.wait_for(sub.websocket.send_text(message), self.send_timeout)
+            except asyncio.TimeoutError:
+                self._evict(sub, f"send > {self.send_timeout}s")
+                return
+            except Exception:
+                # Socket already gone; the owning handler will unsubscribe too
+                self.subscribers.pop(sub.id, None)
+                return
+            sub.sent += 1
+            self.stats["delivered"] += 1
+
+    def snapshot(self):
+        return {
+            **self.stats,
+            "subscribers": len(self.subscribers),
+            "queued": sum(len(s.queue) for s in self.subscribers.values()),
+        }
+
+    async def close(self):
+        for sub in list(self.subscribers.values()):
+            await self.unsubscribe(sub)
@@ -1,8 +1,9 @@
 import cv2
 import os
+import sys
 
-# USE THE EXACT PATH YOU PASTED IN MAIN.PY
-video_path = r"/Users/yashwanth/Documents/Projects/ref-0-hackathon/mock_data/test_match.mp4"
+# python check_video.py path/to/match.mp4
+video_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "..", "mock_data", "1.mp4")
 
 print(f"📂 Verifying: {video_path}")
 
@@ -18,6 +19,10 @@ else:
     else:
         ret, frame = cap.read()
         if ret:
+            frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
             print(f"✅ Success! Video is readable. Size: {frame.shape}")
+            print(f"   {frames} frames @ {fps:.1f} fps ({frames / fps:.0f}s)")
+            print(f"   -> Full-game poses: python batch_analysis.py {video_path}")
         else:
-            print("❌ File exists but has NO frames (Empty video).")
\ No newline at end of file
+            print("❌ File exists but has NO frames (Empty video).")
@@ -0,0 +1,128 @@
+import os
+import cv2
+import numpy as np
+
+THUMB_SIZE = (64, 36)  # motion is measured on tiny grayscale thumbnails
+
+
+def motion_scores(thumbs):
+    """Mean absolute difference to the previous frame (first frame copies the second)"""
+    if len(thumbs) < 2:
+        return np.zeros(len(thumbs), dtype=np.float32)
+    stack = np.stack(thumbs).astype(np.int16)
+    diffs = np.abs(np.diff(stack, axis=0)).mean(axis=(1, 2)).astype(np.float32)
+    return np.concatenate([diffs[:1], diffs])
+
+
+def select_keyframes(timestamps, scores, target_fps=10.0, min_motion=0.3):
+    """
+    One frame per 1/target_fps bin - the one with the most motion - then drop
+    near-identical frames (below `min_motion` or 10% of the busy-frame level).
+    First and last frames are always kept, and at least a quarter of the bins survive.
+    """
+    n = len(scores)
+    if n <= 2:
+        return list(range(n))
+    duration = max(timestamps[-1] - timestamps[0], 1e-3)
+    bins = max(2, int(round(duration * target_fps)) + 1)
+    if bins >= n:
+        picked = list(range(n))
+    else:
+        picked = [int(b[np.argmax(scores[b])]) for b in np.array_split(np.arange(n), bins)]
+    threshold = max(min_motion, 0.1 * float(np.percentile(scores, 90)))
+    keep = [i for i in picked if scores[i] >= threshold]
+    min_keep = max(2, len(picked) // 4)
+    if len(keep) < min_keep:
+        keep = sorted(picked, key=lambda i: scores[i], reverse=True)[:min_keep]
+    return sorted({0, n - 1, *keep})
+
+
+def _resize(frame, max_side):
+    h, w = frame.shape[:2]
+    if max(h, w) <= max_side:
+        return frame
+    s = max_side / max(h, w)
+    # mp4v wants even dimensions
+    return cv2.resize(frame, (int(w * s) // 2 * 2, int(h * s) // 2 * 2), interpolation=cv2.INTER_AREA)
+
+
+def frame_repeats(timestamps, picked, fps):
+    """How many times to write each kept frame at a constant `fps` so it stays up for its real duration"""
+    t0 = timestamps[picked[0]]
+    slots = []
+    for i in picked:
+        # Absolute slots: rounding never accumulates, the clip keeps the capture's real length.
+        # Two frames rounding into one slot: the later one takes the next slot (every frame is shown once).
+        slots.append(max(int(round((timestamps[i] - t0) * fps)), slots[-1] + 1 if slots else 0))
+    slots.append(slots[-1] + 1)
+    return [b - a for a, b in zip(slots, slots[1:])]
+
+
+def _write(frames, filename, fps, repeats):
+    """Writes an iterable of BGR frames (sized like the first); returns (bytes written, (w, h))"""
+    out, size = None, None
+    for f, n in zip(frames, repeats):
+        if out is None:
+            size = (f.shape[1], f.shape[0])
+            out = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+        elif (f.shape[1], f.shape[0]) != size:
+            f = cv2.resize(f, size)
+        for _ in range(n):
+            out.write(f)  # a repeated frame costs a few bytes (no motion)
+    if out is None:
+        return 0, None
+    out.release()
+    return (os.path.getsize(filename) if os.path.exists(filename) else 0), size
+
+
+def reduce_clip(snapshot, filename, max_side=480, target_fps=10.0, max_bytes=2_000_000,
+                min_motion=0.3, min_frames=10, motion=None):
+    """
+    Keyframe selection + downscale + re-encode of a DVR snapshot for upload. Kept frames are held
+    for their real duration, so the clip plays in real time at a constant `target_fps`.
+    `motion` can override frame differencing with per-frame scores (e.g. pose motion energy).
+    Only motion thumbnails are kept in memory; the picked frames are decoded again while writing.
+    Blocking - run it in a worker. Returns (path or None, stats dict); None if nothing could be written.
+    """
+    if len(snapshot) < min_frames:
+        return None, {}
+
+    index, thumbs = [], []  # snapshot positions that decode, and their thumbnails
+    for i in range(len(snapshot)):
+        f = snapshot.decode(i)
+        if f is None:
+            continue
+        index.append(i)
+        thumbs.append(cv2.cvtColor(cv2.resize(f, THUMB_SIZE, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY))
+    if not index:
+        return None, {}
+
+    timestamps = [snapshot.timestamps[i] for i in index]
+    if motion is not None and len(motion) >= len(snapshot):
+        scores = np.asarray(motion, dtype=np.float32)[index]
+    else:
+        scores = motion_scores(thumbs)
+    picked = [index[k] for k in select_keyframes(timestamps, scores, target_fps, min_motion)]
+    fps = float(min(target_fps, snapshot.fps()))
+    repeats = frame_repeats(snapshot.timestamps, picked, fps)
+
+    def keyframes(side):
+        for i in picked:
+            yield _resize(snapshot.decode(i), side)
+
+    # Shrink until the encoded clip fits the byte budget
+    nbytes, size = _write(keyframes(max_side), filename, fps, repeats)
+    for _ in range(3):
+        if not nbytes or nbytes <= max_bytes or min(size) <= 120:
+            break
+        nbytes, size = _write(keyframes(int(max(size) * 0.7)), filename, fps, repeats)
+    if not nbytes:
+        print(f"⚠️ Review Clip: {filename} could not be written")
+        return None, {}
+
+    stats = {
+        "frames_in": len(snapshot), "frames_out": len(picked), "frames_written": sum(repeats),
+        "size": f"{size[0]}x{size[1]}", "fps": round(fps, 1), "bytes": nbytes,
+    }
+    print(f"🗜️ Review Clip: {filename} {stats}")
+    return filename, stats
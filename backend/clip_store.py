@@ -0,0 +1,105 @@
+import os
+import threading
+from collections import OrderedDict
+
+STAGING_DIR = ".incoming"
+
+
+class ClipStore:
+    """
+    Bounded directory of exported clips.
+    - writers render into a staging file, then commit() renames it into place atomically
+    - a byte and a count budget, enforced on every commit, oldest-used clip first
+    - clips with a reference (an upload in progress) are never evicted
+    """
+    def __init__(self, root, max_bytes=512 * 1024 * 1024, max_clips=200):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_clips = max_clips
+        self.clips = OrderedDict()  # clip_id -> [path, nbytes, refs], least recently used first
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.stats = {"committed": 0, "evicted": 0, "discarded": 0}
+        self.staging = os.path.join(root, STAGING_DIR)
+        os.makedirs(self.staging, exist_ok=True)
+        self._adopt()
+
+    def _adopt(self):
+        """Startup: drop half-written files, keep finished clips (newest survive the budget)"""
+        for name in os.listdir(self.staging):
+            try: os.remove(os.path.join(self.staging, name))
+            except OSError: pass
+        found = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith("clip_") and name.endswith(".mp4") and os.path.isfile(path):
+                st = os.stat(path)
+                found.append((st.st_mtime, name[5:-4], path, st.st_size))
+        for _, clip_id, path, size in sorted(found):
+            self.clips[clip_id] = [path, size, 0]
+            self.bytes += size
+        with self.lock:
+            self._evict()
+
+    def staging_path(self, clip_id):
+        return os.path.join(self.staging, f"clip_{clip_id}.mp4")
+
+    def commit(self, clip_id, staged_path, hold=True):
+        """Moves a finished staging file into the store; `hold` returns it with one reference taken"""
+        path = os.path.join(self.root, f"clip_{clip_id}.mp4")
+        os.replace(staged_path, path)  # same filesystem -> atomic, readers never see a partial file
+        size = os.path.getsize(path)
+        with self.lock:
+            old = self.clips.pop(clip_id, None)
+            if old: self.bytes -= old[1]
+            self.clips[clip_id] = [path, size, 1 if hold else 0]
+            self.bytes += size
+            self.stats["committed"] += 1
+            self._evict()
+        return path
+
+    def discard(self, staged_path):
+        try:
+            os.remove(staged_path)
+            self.stats["discarded"] += 1
+        except FileNotFoundError:
+            pass
+
+    def acquire(self, clip_id):
+        """Path of a stored clip with a reference held (None if evicted); pair with release()"""
+        with self.lock:
+            entry = self.clips.get(clip_id)
+            if entry is None:
+                return None
+            entry[2] += 1
+            self.clips.move_to_end(clip_id)
+            return entry[0]
+
+    def release(self, clip_id):
+        with self.lock:
+            entry = self.clips.get(clip_id)
+            if entry is not None and entry[2] > 0:
+                entry[2] -= 1
+                self._evict()
+
+    def __contains__(self, clip_id):
+        return clip_id in self.clips
+
+    def _evict(self):
+        # Caller holds the lock. One file at a time, never a whole-directory sweep.
+        for clip_id in list(self.clips):
+            if self.bytes <= self.max_bytes and len(self.clips) <= self.max_clips:
+                break
+            path, size, refs = self.clips[clip_id]
+            if refs:
+                continue
+            del self.clips[clip_id]
+            self.bytes -= size
+            self.stats["evicted"] += 1
+            try: os.remove(path)
+            except FileNotFoundError: pass
+
+    def snapshot(self):
+        with self.lock:
+            held = sum(1 for _, _, refs in self.clips.values() if refs)
+            return {**self.stats, "clips": len(self.clips), "bytes": self.bytes, "held": held}
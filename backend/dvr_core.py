@@ -1,43 +1,406 @@
 import cv2
+import hashlib
 import os
+import shutil
 import time
+import threading
+import numpy as np
 from collections import deque
 
+
+class EncodedFrameRing:
+    """
+    Fixed-size ring of JPEG bytes.
+    One preallocated arena + offset/length/timestamp index arrays,
+    so memory per stream is capped at `max_bytes` no matter the resolution.
+    """
+    def __init__(self, capacity=150, max_bytes=32 * 1024 * 1024):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.arena = np.zeros(max_bytes, dtype=np.uint8)
+        self.offsets = np.zeros(capacity, dtype=np.int64)
+        self.lengths = np.zeros(capacity, dtype=np.int64)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.head = 0       # next slot to write
+        self.count = 0      # live slots
+        self.write_pos = 0  # next byte in the arena
+
+    def __len__(self):
+        return self.count
+
+    def _oldest(self):
+        return (self.head - self.count) % self.capacity
+
+    def append(self, data, timestamp=None):
+        n = len(data)
+        if n == 0 or n > self.max_bytes:
+            return False
+
+        if self.write_pos + n > self.max_bytes:
+            # Entries past write_pos belong to the previous lap -> drop them, then wrap
+            while self.count and self.offsets[self._oldest()] >= self.write_pos:
+                self.count -= 1
+            self.write_pos = 0
+
+        # Evict the oldest entries that overlap the bytes we are about to write
+        end = self.write_pos + n
+        while self.count:
+            i = self._oldest()
+            if self.offsets[i] < end and self.offsets[i] + self.lengths[i] > self.write_pos:
+                self.count -= 1
+            else:
+                break
+        if self.count == self.capacity:
+            self.count -= 1
+
+        self.arena[self.write_pos:end] = np.frombuffer(data, dtype=np.uint8)
+        slot = self.head
+        self.offsets[slot] = self.write_pos
+        self.lengths[slot] = n
+        self.timestamps[slot] = time.time() if timestamp is None else timestamp
+        self.head = (self.head + 1) % self.capacity
+        self.count += 1
+        self.write_pos = end
+        return True
+
+    def slots(self):
+        """Live slot indices, oldest first"""
+        start = self._oldest()
+        return [(start + k) % self.capacity for k in range(self.count)]
+
+    def get(self, slot):
+        o, n = int(self.offsets[slot]), int(self.lengths[slot])
+        return self.arena[o:o + n]
+
+    def items(self):
+        """Copies out (jpeg_bytes, timestamp) pairs, oldest first"""
+        return [(self.get(s).tobytes(), float(self.timestamps[s])) for s in self.slots()]
+
+    def clear(self):
+        self.head = self.count = self.write_pos = 0
+
+
+class ClipSnapshot:
+    def __init__(self, storage, frames, timestamps):
+        self.storage = storage
+        self.frames = frames          # BGR arrays or JPEG bytes
+        self.timestamps = timestamps  # capture time (seconds) per frame
+
+    def __len__(self):
+        return len(self.frames)
+
+    def fps(self, default=20.0):
+        """Real playback rate from capture timestamps"""
+        if len(self.timestamps) < 2: return default
+        duration = self.timestamps[-1] - self.timestamps[0]
+        if duration <= 0: return default
+        return float(min(max((len(self.timestamps) - 1) / duration, 1.0), 60.0))
+
+    def trimmed(self, start=None, end=None):
+        """Frames with start <= timestamp <= end"""
+        keep = [i for i, t in enumerate(self.timestamps)
+                if (start is None or t >= start) and (end is None or t <= end)]
+        return ClipSnapshot(self.storage, [self.frames[i] for i in keep], [self.timestamps[i] for i in keep])
+
+    def digest(self):
+        """sha1 of the source frames (JPEG bytes or BGR pixels): the same footage gives the same key"""
+        h = hashlib.sha1()
+        for f in self.frames:
+            h.update(f if isinstance(f, bytes) else np.ascontiguousarray(f))
+        return h.hexdigest()
+
+    def decode(self, i):
+        """BGR frame `i` (None if its JPEG doesn't decode)"""
+        f = self.frames[i]
+        if self.storage == "encoded":
+            f = cv2.imdecode(np.frombuffer(f, np.uint8), cv2.IMREAD_COLOR)
+        return f
+
+    def decoded(self):
+        for i in range(len(self.frames)):
+            f = self.decode(i)
+            if f is not None:
+                yield f
+
+
+def export_clip(snapshot, filename, min_frames=10):
+    """Encodes a snapshot to MP4. Blocking - run it in a worker, not on the event loop."""
+    if len(snapshot) < min_frames:
+        return None
+
+    frames = snapshot.decoded()
+    first = next(frames, None)
+    if first is None: return None
+
+    # Get dimensions from first frame
+    height, width, _ = first.shape
+
+    # mp4v is the safest codec for headless environments
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(filename, fourcc, snapshot.fps(), (width, height))
+
+    out.write(first)
+    for frame in frames:
+        if frame.shape[:2] != (height, width):
+            frame = cv2.resize(frame, (width, height))
+        out.write(frame)
+
+    out.release()
+    print(f"📼 DVR Saved: {filename} ({len(snapshot)} frames @ {snapshot.fps():.1f} fps)")
+    return filename
+
+
 class SmartDVR:
-    def __init__(self, buffer_size=150, temp_dir="temp_clips"):
+    def __init__(self, buffer_size=150, temp_dir="temp_clips", storage="decoded", max_bytes=32 * 1024 * 1024):
         # Keep last ~150 frames (approx 5-7 seconds)
-        self.frame_buffer = deque(maxlen=buffer_size)
+        # storage="decoded" -> BGR numpy frames (legacy)
+        # storage="encoded" -> JPEG bytes in a byte-budgeted ring, decoded on export
+        self.storage = storage
+        self.buffer_size = buffer_size
+        if storage == "encoded":
+            self.frame_buffer = EncodedFrameRing(buffer_size, max_bytes)
+        else:
+            self.frame_buffer = deque(maxlen=buffer_size)
+        self.timestamps = deque(maxlen=buffer_size)
+        self.lock = threading.Lock()  # writer runs in the frame executor, snapshot on the loop
         self.temp_dir = temp_dir
-        
+
         if not os.path.exists(self.temp_dir):
             os.makedirs(self.temp_dir)
 
-    def write_frame(self, frame):
-        """Add frame to rolling buffer"""
-        if frame is not None:
-            self.frame_buffer.append(frame)
+    def write_frame(self, frame, jpeg_bytes=None, timestamp=None):
+        """Add frame to rolling buffer (pass the received JPEG to skip re-encoding)"""
+        if timestamp is None: timestamp = time.time()
+        if self.storage == "encoded":
+            if jpeg_bytes is None:
+                if frame is None: return
+                ok, buf = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 90])
+                if not ok: return
+                jpeg_bytes = buf
+            with self.lock:
+                self.frame_buffer.append(jpeg_bytes, timestamp)
+        elif frame is not None:
+            with self.lock:
+                self.frame_buffer.append(frame)
+                self.timestamps.append(timestamp)
+
+    def snapshot(self):
+        """
+        Cheap point-in-time view of the buffer for export off the event loop.
+        Decoded mode only copies frame references; encoded mode copies the
+        (small) JPEG bytes since the arena keeps being overwritten.
+        """
+        with self.lock:
+            if self.storage == "encoded":
+                items = self.frame_buffer.items()
+                return ClipSnapshot("encoded", [x for x, _ in items], [t for _, t in items])
+            return ClipSnapshot("decoded", list(self.frame_buffer), list(self.timestamps))
 
-    def save_last_clip(self):
+    def save_last_clip(self, clip_id=None):
         """Saves buffer to MP4"""
-        if len(self.frame_buffer) < 10:
-            return None
-            
-        timestamp = int(time.time())
-        filename = f"{self.temp_dir}/clip_{timestamp}.mp4"
-        
-        # Get dimensions from first frame
-        height, width, _ = self.frame_buffer[0].shape
-        
-        # mp4v is the safest codec for headless environments
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(filename, fourcc, 20.0, (width, height))
-        
-        for frame in list(self.frame_buffer):
-            out.write(frame)
-            
-        out.release()
-        print(f"📼 DVR Saved: {filename}")
-        return filename
+        clip_id = clip_id or str(int(time.time()))
+        return export_clip(self.snapshot(), f"{self.temp_dir}/clip_{clip_id}.mp4")
+
+    def memory_bytes(self):
+        if self.storage == "encoded":
+            return self.frame_buffer.arena.nbytes
+        return sum(f.nbytes for f in self.frame_buffer)
 
     def release(self):
-        self.frame_buffer.clear()
\ No newline at end of file
+        with self.lock:
+            self.frame_buffer.clear()
+            self.timestamps.clear()
+
+
+class SegmentedRecorder:
+    """
+    Long-horizon DVR on disk: the received JPEGs are appended to rolling MJPEG segments
+    (`segment_seconds` each) with a (timestamp, offset, length) index per segment.
+    Only the open segment's index lives in memory, so RAM stays flat for a full match.
+    Segments older than `retention` seconds (or beyond `max_bytes` on disk) are deleted on rotation
+    and by expire(), which the server runs periodically so idle streams expire too.
+    """
+    def __init__(self, root, segment_seconds=10.0, retention=3600.0, max_bytes=None):
+        self.root = root
+        self.segment_seconds = segment_seconds
+        self.retention = retention
+        self.max_bytes = max_bytes
+        self.segments = deque()   # closed: (first_ts, last_ts, frames, nbytes, data path)
+        self.file = None
+        self.path = None
+        self.index = []           # open segment: [(ts, offset, length), ...]
+        self.offset = 0
+        self.disk_bytes = 0
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @classmethod
+    def load(cls, root):
+        """
+        Read-only view of the segments a closed recorder left in `root` (an ended stream), or None.
+        Only segments with an index are used; retention for them is sweep_recordings()'s job.
+        """
+        if not os.path.isdir(root):
+            return None
+        recorder = cls(root, retention=float("inf"))
+        for name in sorted((n for n in os.listdir(root) if n.endswith(".mjpeg.idx")), key=lambda n: int(n.split(".")[0])):
+            path = os.path.join(root, name[:-4])
+            try:
+                index = np.load(path + ".idx")
+                nbytes = os.path.getsize(path)
+            except (FileNotFoundError, ValueError):
+                continue
+            if len(index):
+                recorder.segments.append((float(index[0, 0]), float(index[-1, 0]), len(index), nbytes, path))
+                recorder.disk_bytes += nbytes
+        return recorder if recorder.segments else None
+
+    def write(self, jpeg_bytes, timestamp):
+        data = memoryview(jpeg_bytes).cast("B")
+        with self.lock:
+            if self.file is not None and timestamp - self.index[0][0] >= self.segment_seconds:
+                self._rotate()
+            if self.file is None:
+                self.path = os.path.join(self.root, f"{int(timestamp * 1000)}.mjpeg")
+                self.file = open(self.path, "wb")
+                self.index, self.offset = [], 0
+            self.file.write(data)
+            self.index.append((timestamp, self.offset, len(data)))
+            self.offset += len(data)
+            self.disk_bytes += len(data)
+
+    def _rotate(self):
+        self.file.close()
+        self.file = None
+        index = np.array(self.index, dtype=np.float64)
+        # index next to the data, written last so a segment without one is known incomplete
+        tmp = self.path + ".idx.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, index)
+        os.replace(tmp, self.path + ".idx")
+        self.segments.append((float(index[0, 0]), float(index[-1, 0]), len(index), self.offset, self.path))
+        self.index = []  # now described by the closed segment
+        self._expire(index[-1, 0])
+
+    def _expire(self, now):
+        while self.segments and (
+            self.segments[0][1] < now - self.retention
+            or (self.max_bytes and self.disk_bytes > self.max_bytes)
+        ):
+            _, _, _, nbytes, path = self.segments.popleft()
+            self.disk_bytes -= nbytes
+            for p in (path, path + ".idx"):
+                try: os.remove(p)
+                except FileNotFoundError: pass
+
+    def expire(self, now=None):
+        """Applies retention without a new frame: an idle open segment is closed first so it can expire"""
+        now = time.time() if now is None else now
+        with self.lock:
+            if self.file is not None and now - self.index[-1][0] >= self.segment_seconds:
+                self._rotate()
+            self._expire(now)
+
+    def span(self):
+        """(oldest, newest) recorded timestamp, or None"""
+        with self.lock:
+            first = self.segments[0][0] if self.segments else (self.index[0][0] if self.index else None)
+            last = self.index[-1][0] if self.index else (self.segments[-1][1] if self.segments else None)
+        return None if first is None else (first, last)
+
+    def count(self, start, end):
+        """Approximate frames in [start, end] from segment metadata (no disk reads)"""
+        with self.lock:
+            n = 0
+            for first, last, frames, _, _ in self.segments:
+                if first <= end and last >= start:
+                    overlap = min(last, end) - max(first, start)
+                    n += frames if last == first else int(frames * max(overlap, 0) / (last - first)) + 1
+            n += sum(1 for ts, _, _ in self.index if start <= ts <= end)
+        return n
+
+    def snapshot(self, start, end, max_frames=None):
+        """
+        JPEGs captured in [start, end] as an encoded ClipSnapshot (trimmed per frame, nothing re-encoded).
+        Blocking disk reads - call it from a worker. `max_frames` thins long ranges evenly; only the kept frames are read.
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+            parts = [(path, None) for first, last, _, _, path in self.segments if first <= end and last >= start]
+            if self.index and self.index[-1][0] >= start and self.index[0][0] <= end:
+                parts.append((self.path, np.array(self.index, dtype=np.float64)))
+
+        # Choose the frames from the indexes first, so a long range never holds more than max_frames JPEGs
+        paths, rows = [], []
+        for path, index in parts:
+            try:
+                if index is None:
+                    index = np.load(path + ".idx")
+            except FileNotFoundError:
+                continue  # expired while we were reading
+            sel = index[(index[:, 0] >= start) & (index[:, 0] <= end)]
+            if len(sel):
+                rows.append(np.column_stack([np.full(len(sel), len(paths)), sel]))
+                paths.append(path)
+        if not rows:
+            return ClipSnapshot("encoded", [], [])
+        rows = np.concatenate(rows)
+        if max_frames and len(rows) > max_frames:
+            rows = rows[np.linspace(0, len(rows) - 1, max_frames).astype(int)]
+
+        frames, timestamps = [], []
+        for k, path in enumerate(paths):
+            chosen = rows[rows[:, 0] == k]
+            if not len(chosen):
+                continue
+            try:
+                with open(path, "rb") as f:
+                    for _, ts, off, n in chosen:
+                        f.seek(int(off))
+                        frames.append(f.read(int(n)))
+                        timestamps.append(float(ts))
+            except FileNotFoundError:
+                continue
+        return ClipSnapshot("encoded", frames, timestamps)
+
+    def close(self, delete=True):
+        with self.lock:
+            if self.file is not None:
+                if delete:
+                    self.file.close()
+                    self.file = None
+                else:
+                    self._rotate()
+            if delete:
+                shutil.rmtree(self.root, ignore_errors=True)
+                self.segments.clear()
+                self.disk_bytes = 0
+
+
+def sweep_recordings(root, retention, keep=()):
+    """
+    Retention for streams that have no recorder any more (ended, or from a previous run):
+    deletes their segment files last written more than `retention` seconds ago, then empty folders.
+    `keep`: folder names of live streams (their recorders expire themselves). Returns files removed.
+    """
+    cutoff = time.time() - retention
+    removed = 0
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        folder = os.path.join(root, name)
+        if name in keep or not os.path.isdir(folder):
+            continue
+        for entry in os.scandir(folder):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        try: os.rmdir(folder)
+        except OSError: pass  # still holds segments inside retention
+    return removed
@@ -0,0 +1,110 @@
+import cv2
+import numpy as np
+
+# OpenCV >= 4.10 can decode straight to RGB; older builds decode BGR and convert into a reused buffer
+_RGB = getattr(cv2, "IMREAD_COLOR_RGB", None)
+_REDUCED = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+if _RGB is not None:
+    _REDUCED_RGB = {f: (flag & ~cv2.IMREAD_COLOR) | _RGB for f, flag in _REDUCED.items()}
+
+# Start-of-frame markers carry the image size (DHT / JPG / DAC share the range but are not SOFs)
+_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(buf):
+    """(height, width) read from the JPEG header without decoding; None if it isn't a JPEG"""
+    mv = memoryview(buf)
+    n = len(mv)
+    if n < 4 or mv[0] != 0xFF or mv[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < n:
+        if mv[i] != 0xFF:
+            return None
+        marker = mv[i + 1]
+        if marker == 0xFF:           # fill byte
+            i += 1
+        elif marker in _SOF:
+            return (mv[i + 5] << 8) | mv[i + 6], (mv[i + 7] << 8) | mv[i + 8]
+        elif marker in (0xD9, 0xDA):  # end of image / start of scan before any SOF
+            return None
+        elif 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            i += 2
+        else:
+            i += 2 + ((mv[i + 2] << 8) | mv[i + 3])
+    return None
+
+
+def fit_size(h, w, max_side=None, max_bytes=None):
+    """Target (h, w) for inference: longest side <= max_side and h * w * 3 <= max_bytes, never upscaled"""
+    scale = 1.0
+    if max_side and max(h, w) > max_side:
+        scale = max_side / max(h, w)
+    if max_bytes and h * w * 3 * scale * scale > max_bytes:
+        scale = (max_bytes / (h * w * 3)) ** 0.5
+    if scale >= 1.0:
+        return h, w
+    return max(1, int(h * scale)), max(1, int(w * scale))
+
+
+def reduce_factor(h, w, max_side):
+    """Largest 1/2, 1/4 or 1/8 JPEG scale that still leaves >= max_side pixels (no quality lost)"""
+    factor = 1
+    for f in (2, 4, 8):
+        if max_side and max(h, w) / f >= max_side:
+            factor = f
+    return factor
+
+
+class FrameDecoder:
+    """
+    Per-stream decode state. Inference frames are decoded at reduced scale straight to RGB and
+    written into a caller-provided buffer (the pose slot's shared memory), so the hot loop
+    doesn't allocate a full-resolution frame, an RGB copy or a resized copy per frame.
+    """
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.buffers = {}
+        self.frame = None
+
+    def full(self, jpeg):
+        """Full-resolution BGR frame (for drawing / re-encoding). None if undecodable."""
+        # Drop the previous frame only after the new one is allocated: freeing it first lets malloc
+        # hand the pages back to the OS and fault them in again every frame (~2 ms at 720p)
+        frame = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+        self.frame = frame
+        return frame
+
+    def _buffer(self, name, shape):
+        buf = self.buffers.get(name)
+        if buf is None or buf.shape != shape:
+            buf = self.buffers[name] = np.empty(shape, np.uint8)
+        return buf
+
+    def rgb(self, jpeg, size, max_side=None, frame=None, alloc=None):
+        """
+        RGB frame of at most `max_side` for pose inference (landmarks are normalized, so they still map
+        onto the full frame). `frame`: an already decoded full BGR frame to reuse instead of decoding.
+        `alloc(shape)` returns the output buffer; a reused private one by default. None if undecodable.
+        """
+        is_rgb = False
+        if frame is None:
+            factor = reduce_factor(*size, max_side)
+            if _RGB is not None:
+                frame, is_rgb = cv2.imdecode(jpeg, _REDUCED_RGB[factor]), True
+            else:
+                frame = cv2.imdecode(jpeg, _REDUCED[factor])
+            if frame is None:
+                return None
+        h, w = frame.shape[:2]
+        th, tw = fit_size(h, w, max_side, self.max_bytes)
+        out = alloc((th, tw, 3)) if alloc else self._buffer("rgb", (th, tw, 3))
+
+        if (th, tw) != (h, w):
+            src = out if is_rgb else self._buffer("resized", (th, tw, 3))
+            frame = cv2.resize(frame, (tw, th), dst=src, interpolation=cv2.INTER_AREA)
+        if is_rgb:
+            if frame is not out: out[...] = frame
+        else:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=out)
+        return out
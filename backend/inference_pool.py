@@ -0,0 +1,359 @@
+import itertools
+import os
+import queue
+import threading
+import time
+import multiprocessing as mproc
+from concurrent.futures import Future, wait
+from multiprocessing import shared_memory
+import numpy as np
+
+# One RGB slot per stream. 1080p fits; bigger frames are downscaled by the caller.
+MAX_FRAME_BYTES = 1920 * 1080 * 3
+NUM_LANDMARKS = 33
+MAX_POSES = 4  # people tracked per frame (landmarker num_poses; pose_events / batch_analysis size to it)
+# Model path "stub" (or "stub:<ms>" to simulate inference cost) selects StubLandmarker
+STUB_MODEL = "stub"
+
+
+class StubLandmarker:
+    """
+    Deterministic stand-in for PoseLandmarker (benchmarks / CI without the model).
+    One pose whose position depends only on the timestamp; same input -> same output.
+    """
+    def __init__(self, delay_ms=0.0):
+        self.delay_ms = delay_ms
+        rng = np.random.default_rng(0)
+        self.base = np.column_stack([
+            rng.uniform(0.35, 0.65, NUM_LANDMARKS),
+            np.linspace(0.1, 0.9, NUM_LANDMARKS),
+            np.zeros(NUM_LANDMARKS),
+        ]).astype(np.float32)
+
+    def detect(self, rgb, timestamp_ms):
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000)
+        poses = self.base.copy()
+        poses[:, 0] += 0.1 * np.sin(timestamp_ms / 500.0)
+        return poses[None]
+
+    def close(self):
+        pass
+
+
+def _create_landmarker(model_path, num_poses=MAX_POSES):
+    if model_path.startswith(STUB_MODEL):
+        _, _, delay = model_path.partition(":")
+        return StubLandmarker(float(delay or 0))
+    from mediapipe.tasks import python
+    from mediapipe.tasks.python import vision
+    base_options = python.BaseOptions(model_asset_path=model_path)
+    options = vision.PoseLandmarkerOptions(
+        base_options=base_options,
+        running_mode=vision.RunningMode.VIDEO,
+        num_poses=num_poses,
+        min_pose_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+    return vision.PoseLandmarker.create_from_options(options)
+
+
+def _detect(lm, rgb, timestamp_ms):
+    """(poses x 33 x 3) float32 from either landmarker type"""
+    if isinstance(lm, StubLandmarker):
+        return lm.detect(rgb, timestamp_ms)
+    import mediapipe as mp
+    image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb)
+    result = lm.detect_for_video(image, timestamp_ms)
+    del image  # release the view before the slot can be closed
+    return np.array(
+        [[(p.x, p.y, p.z) for p in pose] for pose in result.pose_landmarks],
+        dtype=np.float32
+    ).reshape(-1, NUM_LANDMARKS, 3)
+
+
+def _warm_landmarker(model_path):
+    """Built and run once at ts 0, so the first real frame pays neither load nor graph init"""
+    lm = _create_landmarker(model_path)
+    _detect(lm, np.zeros((256, 256, 3), dtype=np.uint8), 0)
+    return lm
+
+
+def _worker_main(worker_id, model_paths, requests, responses):
+    """
+    Runs in a child process. Keeps one VIDEO-mode landmarker per stream
+    (tracking state + timestamp domain are per stream) and reads frames
+    straight out of the stream's shared memory slot.
+    model_paths: {"lite"|"full"|"heavy": path}; a stream switching variant gets a fresh landmarker.
+    After a "warmup" message the worker keeps one pre-built spare landmarker per variant
+    and hands it to the next stream that needs one; a background thread builds the replacement,
+    so the streams already on this worker never wait for a model load.
+    """
+    landmarkers = {}   # session_id -> (variant, landmarker, timestamp offset)
+    spares = {}        # variant -> warmed landmarker (already used at ts 0)
+    warm = set()       # variants to keep a spare of
+    building = set()
+    spare_lock = threading.Lock()
+    segments = {}
+    print(f"🧠 Pose worker {worker_id} started (pid {os.getpid()})")
+
+    def build_spare(variant):
+        try:
+            lm = _warm_landmarker(model_paths[variant])
+        except Exception as e:
+            print(f"❌ Spare {variant} failed: {e!r}")
+            with spare_lock:
+                warm.discard(variant)
+                building.discard(variant)
+            return
+        with spare_lock:
+            spares[variant] = lm
+            building.discard(variant)
+
+    def take_spare(variant):
+        with spare_lock:
+            spare = spares.pop(variant, None)
+            refill = variant in warm and variant not in building
+            if refill: building.add(variant)
+        if refill:
+            threading.Thread(target=build_spare, args=(variant,), daemon=True).start()
+        return spare
+
+    while True:
+        msg = requests.get()
+        if msg is None:
+            break
+        kind = msg[0]
+
+        if kind == "warmup":
+            _, req_id, variants = msg
+            try:
+                t0 = time.perf_counter()
+                for v in variants:
+                    with spare_lock:
+                        missing = v not in spares and v not in building
+                    if missing:
+                        lm = _warm_landmarker(model_paths[v])
+                        with spare_lock: spares[v] = lm
+                    with spare_lock: warm.add(v)
+                print(f"🔥 Pose worker {worker_id} warm {sorted(variants)} in {time.perf_counter() - t0:.1f}s")
+                responses.put((req_id, None, None))
+            except Exception as e:
+                responses.put((req_id, None, repr(e)))
+            continue
+
+        if kind == "close":
+            _, session_id, shm_name = msg
+            entry = landmarkers.pop(session_id, None)
+            if entry: entry[1].close()
+            shm = segments.pop(shm_name, None)
+            if shm: shm.close()
+            continue
+
+        _, req_id, session_id, shm_name, shape, timestamp_ms, variant = msg
+        try:
+            shm = segments.get(shm_name)
+            if shm is None:
+                shm = segments[shm_name] = shared_memory.SharedMemory(name=shm_name)
+            entry = landmarkers.get(session_id)
+            if entry is None or entry[0] != variant:
+                if entry: entry[1].close()
+                spare = take_spare(variant)
+                # A spare already saw ts 0, so its stream's timestamps are shifted by 1 ms
+                entry = landmarkers[session_id] = (
+                    (variant, spare, 1) if spare else (variant, _create_landmarker(model_paths[variant]), 0)
+                )
+            _, lm, ts_offset = entry
+
+            rgb = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+            poses = _detect(lm, rgb, timestamp_ms + ts_offset)
+            del rgb
+            responses.put((req_id, poses, None))
+        except Exception as e:
+            responses.put((req_id, None, repr(e)))
+
+    for _, lm, _ in landmarkers.values(): lm.close()
+    with spare_lock:
+        for lm in spares.values(): lm.close()
+    for shm in segments.values(): shm.close()
+
+
+class PoseWorkerPool:
+    """
+    Pool of processes, each holding its own PoseLandmarker(s).
+    Streams are pinned to a worker so VIDEO-mode tracking stays consistent;
+    frames travel through shared memory, only a small header is pickled.
+    Results are (poses x 33 x 3) float32 arrays of normalized x, y, z.
+    A worker that dies is restarted in place (its streams keep their pin and get fresh landmarkers);
+    requests it had in flight fail.
+    """
+    def __init__(self, num_workers, model_paths, check_interval=1.0):
+        if isinstance(model_paths, str):
+            model_paths = {"heavy": model_paths}
+        self.model_paths = model_paths
+        self.default_variant = "heavy" if "heavy" in model_paths else next(iter(model_paths))
+        self.ctx = mproc.get_context("spawn")
+        self.responses = self.ctx.Queue()
+        self.queues = [None] * num_workers
+        self.procs = [None] * num_workers
+        self.load = [0] * num_workers
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+        self.check_interval = check_interval
+        self.warm_variants = None
+        self.restarts = 0
+        self.closing = False
+
+        for i in range(num_workers):
+            self._start_worker(i)
+
+        self.reader = threading.Thread(target=self._read_responses, daemon=True)
+        self.reader.start()
+
+    def _start_worker(self, i):
+        q = self.ctx.Queue()
+        p = self.ctx.Process(target=_worker_main, args=(i, self.model_paths, q, self.responses), daemon=True)
+        p.start()
+        with self.lock:
+            self.queues[i], self.procs[i] = q, p
+        return q
+
+    def _check_workers(self):
+        for i, p in enumerate(list(self.procs)):
+            if p.is_alive() or self.closing:
+                continue
+            print(f"💀 Pose worker {i} died (exit {p.exitcode}), restarting")
+            q = self._start_worker(i)
+            with self.lock:
+                lost = [fut for req_id, fut in self.pending.items() if getattr(fut, "worker", None) == i]
+                for fut in lost:
+                    del self.pending[fut.req_id]
+                self.restarts += 1
+            for fut in lost:
+                fut.set_exception(RuntimeError(f"Pose worker {i} died"))
+            if self.warm_variants:
+                q.put(("warmup", next(self.ids), self.warm_variants))  # nobody waits for this one
+
+    def _read_responses(self):
+        last_check = time.monotonic()
+        while True:
+            # Liveness is checked on a clock: a busy pool still notices a worker that died
+            if time.monotonic() - last_check >= self.check_interval:
+                self._check_workers()
+                last_check = time.monotonic()
+            try:
+                msg = self.responses.get(timeout=self.check_interval)
+            except queue.Empty:
+                continue
+            if msg is None:
+                break
+            req_id, poses, error = msg
+            with self.lock:
+                fut = self.pending.pop(req_id, None)
+            if fut is None:
+                continue
+            if error: fut.set_exception(RuntimeError(error))
+            else: fut.set_result(poses)
+
+    def warmup(self, variants=None, timeout=120.0):
+        """Blocks until every worker has a warmed landmarker per variant (raises on failure)"""
+        variants = list(variants or self.model_paths)
+        self.warm_variants = variants  # restarted workers warm the same set
+        futures = []
+        for worker, q in enumerate(list(self.queues)):
+            fut = Future()
+            req_id = fut.req_id = next(self.ids)
+            fut.worker = worker
+            with self.lock:
+                self.pending[req_id] = fut
+            q.put(("warmup", req_id, variants))
+            futures.append(fut)
+        for fut in futures:
+            fut.result(timeout=timeout)
+
+    def open_session(self, session_id):
+        """Pins a stream to the least-loaded worker and allocates its frame slot"""
+        with self.lock:
+            worker = self.load.index(min(self.load))
+            self.load[worker] += 1
+        shm = shared_memory.SharedMemory(create=True, size=MAX_FRAME_BYTES)
+        return PoseStream(self, session_id, worker, shm)
+
+    def submit(self, stream, rgb, timestamp_ms, variant=None):
+        """Copies `rgb` into the stream's slot and returns a Future of the landmarks"""
+        variant = variant if variant in self.model_paths else self.default_variant
+        if rgb is not stream.view:  # already in the slot when written through stream.buffer()
+            stream.buffer(rgb.shape)[...] = rgb
+
+        fut = Future()
+        req_id = fut.req_id = next(self.ids)
+        fut.worker = stream.worker
+        with self.lock:
+            self.pending[req_id] = fut
+            q = self.queues[stream.worker]
+        q.put(("detect", req_id, stream.session_id, stream.shm.name, rgb.shape, timestamp_ms, variant))
+        stream.inflight = fut
+        return fut
+
+    def close_session(self, stream):
+        with self.lock:
+            q = self.queues[stream.worker]
+        q.put(("close", stream.session_id, stream.shm.name))
+        with self.lock:
+            self.load[stream.worker] -= 1
+        stream.view = None  # an exported view keeps the segment from closing
+        stream.shm.close()
+        try: stream.shm.unlink()
+        except FileNotFoundError: pass
+
+    def shutdown(self):
+        self.closing = True
+        for q in self.queues: q.put(None)
+        for p in self.procs: p.join(timeout=5)
+        self.responses.put(None)
+        self.reader.join(timeout=5)
+        with self.lock:
+            for fut in self.pending.values():
+                fut.set_exception(RuntimeError("Pose pool shut down"))
+            self.pending.clear()
+
+
+class PoseStream:
+    """Handle for one camera: its worker, its shared frame slot, its timestamp domain"""
+    def __init__(self, pool, session_id, worker, shm):
+        self.pool = pool
+        self.session_id = session_id
+        self.worker = worker
+        self.shm = shm
+        self.view = None
+        self.inflight = None  # last request; the worker reads the slot until it answers
+        self.last_ts = -1
+
+    def wait_idle(self, timeout=5.0):
+        """Blocks until the worker is done with the slot (a timed-out request may still be reading it)"""
+        fut = self.inflight
+        if fut is not None and not fut.done():
+            wait([fut], timeout=timeout)
+            if not fut.done():
+                raise TimeoutError("Pose worker still reading the previous frame")
+
+    def buffer(self, shape):
+        """The stream's shared frame slot as a (h, w, 3) array: write the next frame here to skip a copy"""
+        self.wait_idle()
+        if self.view is None or self.view.shape != shape:
+            if int(np.prod(shape)) > self.shm.size:
+                raise ValueError(f"Frame too large for shared slot: {shape}")
+            self.view = np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf)
+        return self.view
+
+    def detect(self, rgb, timestamp_ms, variant=None, timeout=5.0):
+        # VIDEO mode rejects non-increasing timestamps
+        timestamp_ms = max(int(timestamp_ms), self.last_ts + 1)
+        self.last_ts = timestamp_ms
+        fut = self.pool.submit(self, rgb, timestamp_ms, variant)
+        # On timeout the request stays pending: its late answer frees the slot for the next frame
+        return fut.result(timeout=timeout)
+
+    def close(self):
+        self.pool.close_session(self)
@@ -1,65 +1,315 @@
 import asyncio
 import base64
 import os
-import shutil
-import urllib.request
 import json
 import time
+import uuid
 import numpy as np
 import cv2  # Headless (Safe)
-import mediapipe as mp
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
 from concurrent.futures import ThreadPoolExecutor
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, BackgroundTasks
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from collections import OrderedDict, deque
 from dotenv import load_dotenv
-from dvr_core import SmartDVR
+from dvr_core import SmartDVR, SegmentedRecorder, export_clip, sweep_recordings
+from inference_pool import PoseWorkerPool, MAX_FRAME_BYTES, STUB_MODEL
+from frame_decode import FrameDecoder, jpeg_size
+from adaptive_pose import AdaptivePoseController, MODEL_URLS, LEVELS
+from model_cache import ensure_model, pinned_sha256
+from review_queue import ReviewQueue, GeminiReviewClient, StubReviewClient
+from clip_reducer import reduce_clip
+from clip_store import ClipStore
+from pose_events import LandmarkRing, IncidentDetector, motion_energy
+from broadcast import BroadcastHub, TOPICS
+from preview_encoder import PreviewEncoder, DELTA_KEY
+from metrics import Registry, StageTimer, REVIEW_BUCKETS, sample_stacks
+from wire_protocol import (
+    BINARY_SUBPROTOCOL, OUT_HEADER, MSG_VIDEO_FRAME, MSG_POSE_FRAME, MSG_VIDEO_DELTA, FLAG_ACTION, POSE_SCALE,
+    unpack_frame, pack_message, quantize_poses, pack_poses
+)
 
 # --- CONFIG ---
 load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
-if api_key: 
-    import google.generativeai as genai
-    genai.configure(api_key=api_key)
-else:
+if not api_key:
     print("⚠️ GEMINI_API_KEY not found")
 
 BUFFER_DIR = "temp_buffer"
-MODEL_URL = "https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_heavy/float16/1/pose_landmarker_heavy.task"
+# Exported clips: LRU within a byte / count budget; clips being uploaded are never deleted
+CLIP_STORE_MAX_MB = int(os.getenv("CLIP_STORE_MAX_MB", "512"))
+CLIP_STORE_MAX_CLIPS = int(os.getenv("CLIP_STORE_MAX_CLIPS", "200"))
 MODEL_PATH = "pose_landmarker.task"
+# Downscale / stride / model switching to keep inference under POSE_BUDGET_MS per frame
+POSE_ADAPTIVE = os.getenv("POSE_ADAPTIVE", "1") == "1"
+# Variants the adaptive controller may switch between (heavy lives at MODEL_PATH)
+POSE_VARIANTS = [v for v in os.getenv("POSE_VARIANTS", "lite,full,heavy").split(",") if v in MODEL_URLS]
+if not POSE_ADAPTIVE:
+    # A fixed controller only ever runs its first level: don't download / warm spares of the others
+    POSE_VARIANTS = [next((lv[0] for lv in LEVELS if lv[0] in POSE_VARIANTS), "heavy")]
+MODEL_PATHS = {v: MODEL_PATH if v == "heavy" else f"pose_landmarker_{v}.task" for v in POSE_VARIANTS}
+# "mediapipe" or "stub" (deterministic fake landmarker, no model download); POSE_STUB_MS simulates inference cost
+POSE_BACKEND = os.getenv("POSE_BACKEND", "mediapipe")
+if POSE_BACKEND == "stub":
+    MODEL_PATHS = {v: f"{STUB_MODEL}:{os.getenv('POSE_STUB_MS', '0')}" for v in POSE_VARIANTS}
+POSE_BUDGET_MS = float(os.getenv("POSE_BUDGET_MS", "50"))
+# Longest side of the inference frame (decoded straight at 1/2, 1/4 or 1/8 scale when possible); 0 = full resolution
+POSE_MAX_SIDE = int(os.getenv("POSE_MAX_SIDE", "640"))
+# "encoded" keeps the received JPEG bytes in a fixed-size ring (hard memory cap per stream)
+DVR_STORAGE = os.getenv("DVR_STORAGE", "encoded")
+DVR_MAX_MB = int(os.getenv("DVR_MAX_MB", "32"))
+# DVR_DISK=1 also records every stream to rolling on-disk segments so reviews can reach back minutes
+DVR_DISK = os.getenv("DVR_DISK", "0") == "1"
+DVR_DISK_DIR = os.getenv("DVR_DISK_DIR", "recordings")
+DVR_SEGMENT_SECONDS = float(os.getenv("DVR_SEGMENT_SECONDS", "10"))
+DVR_RETENTION = float(os.getenv("DVR_RETENTION", "3600"))   # seconds of lookback per stream
+DVR_DISK_MAX_MB = int(os.getenv("DVR_DISK_MAX_MB", "0"))    # 0 = retention only
+DVR_SWEEP_SECONDS = float(os.getenv("DVR_SWEEP_SECONDS", "30"))  # how often retention runs (idle / ended streams)
+REVIEW_MAX_FRAMES = int(os.getenv("REVIEW_MAX_FRAMES", "900"))  # long ranges are thinned before export
+DEFAULT_CLIP_SECONDS = 5.0
+# Each worker process holds its own PoseLandmarker(s); cameras are spread across them
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+# "latest" = keep one pending frame per stream and drop stale ones, "fifo" = process every frame
+STREAM_SCHEDULING = os.getenv("STREAM_SCHEDULING", "latest")
+STATS_EVERY = 30  # processed frames between stream_stats messages
+# "video" = annotated JPEG back to the client, "pose" = quantized landmarks only (client draws),
+# "delta" = keyframe + changed tiles only, ACK-driven quality (binary protocol only; text clients get "video")
+# Per connection: /ws/stream?output=pose
+STREAM_OUTPUT = os.getenv("STREAM_OUTPUT", "video")
+STREAM_OUTPUTS = ("video", "pose", "delta")
+PREVIEW_TILE = int(os.getenv("PREVIEW_TILE", "64"))                  # px, delta change-detection grid
+PREVIEW_THRESHOLD = float(os.getenv("PREVIEW_THRESHOLD", "4"))       # mean abs pixel diff that marks a tile changed
+PREVIEW_KEYFRAME_SECONDS = float(os.getenv("PREVIEW_KEYFRAME_SECONDS", "2"))
+PREVIEW_MAX_INFLIGHT = int(os.getenv("PREVIEW_MAX_INFLIGHT", "4"))   # unACKed frames before stepping quality down
+PREVIEW_TARGET_RTT_MS = float(os.getenv("PREVIEW_TARGET_RTT_MS", "250"))
+
+def request_keyframe(source):
+    # A viewer lost part of this stream's delta chain: make the next frame a full one
+    session = sessions.get(source)
+    if session and session.preview: session.preview.request_keyframe()
+
+# Verdicts / score updates / viewer frames: per-client bounded queues, slow clients are dropped
+hub = BroadcastHub(
+    queue_size=int(os.getenv("BROADCAST_QUEUE", "32")),
+    send_timeout=float(os.getenv("BROADCAST_TIMEOUT", "2.0")),
+    on_resync=request_keyframe
+)
+# Decode / draw / encode threads (cv2 releases the GIL); inference happens in pose_pool
+executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS * 2)
+# Clip encoding never runs on the event loop or the frame executor
+export_executor = ThreadPoolExecutor(max_workers=int(os.getenv("EXPORT_WORKERS", "2")))
+clip_jobs = OrderedDict()  # clip_id -> {"status": pending/ready/empty/failed, "path": ...}
+MAX_CLIP_JOBS = 256
+review_tasks = set()  # strong refs so fire-and-forget tasks aren't GC'd
+# "gemini" or "stub" (local fake model, no API calls)
+REVIEW_BACKEND = os.getenv("REVIEW_BACKEND", "gemini")
+REVIEW_CONCURRENCY = int(os.getenv("REVIEW_CONCURRENCY", "2"))
+REVIEW_MAX_PENDING = int(os.getenv("REVIEW_MAX_PENDING", "16"))  # reviews queued or running; more get "Review Busy"
+# Upload-size reduction: keyframes + downscale + re-encode before review (REVIEW_REDUCE=0 sends the raw clip)
+REVIEW_REDUCE = os.getenv("REVIEW_REDUCE", "1") == "1"
+REVIEW_CLIP = {
+    "max_side": int(os.getenv("REVIEW_MAX_SIDE", "480")),
+    "target_fps": float(os.getenv("REVIEW_FPS", "10")),
+    "max_bytes": int(os.getenv("REVIEW_MAX_BYTES", "2000000")),
+}
+
+def make_review_client():
+    if REVIEW_BACKEND == "stub":
+        return StubReviewClient()
+    if api_key:
+        return GeminiReviewClient(api_key=api_key)
+    return None
 
-active_websockets = []
-executor = ThreadPoolExecutor(max_workers=1)
+review_queue = ReviewQueue(make_review_client(), concurrency=REVIEW_CONCURRENCY, max_pending=REVIEW_MAX_PENDING)
+clip_store = None  # created in lifespan (scans BUFFER_DIR)
+
+# Pose-based incident detectors (velocity spike / contact / fall) start reviews on their own
+AUTO_REVIEW = os.getenv("AUTO_REVIEW", "0") == "1"
+INCIDENT_WINDOW = int(os.getenv("INCIDENT_WINDOW", "15"))        # frames per detector window
+INCIDENT_COOLDOWN = float(os.getenv("INCIDENT_COOLDOWN", "10"))  # seconds before the same detector re-arms
+INCIDENT_POST_ROLL = float(os.getenv("INCIDENT_POST_ROLL", "1.0"))  # seconds of follow-through in the clip
+# GET /debug/profile samples every thread's stack; off unless PROFILER_ENABLED=1
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
 
 # --- GLOBAL STATE ---
 VISION_ACTIVE = True 
-global_dvr = SmartDVR(temp_dir=BUFFER_DIR)
+pose_pool = None   # created in the background after startup (spawned workers must not start at import)
+# Filled in by warm_up(); frames before "ready" get a not_ready reply instead of waiting
+startup = {"ready": False, "stage": "starting", "pose": False, "error": None, "seconds": None}
+sessions = {}      # session_id -> StreamSession
+
+# --- METRICS (GET /metrics, Prometheus text format) ---
+registry = Registry()
+FRAME_STAGES = registry.histogram(
+    "refzero_frame_stage_seconds", "Time spent in each step of process_frame_sync", labels=("stage",))
+FRAME_LATENCY = registry.histogram(
+    "refzero_frame_latency_seconds", "Socket receive to result sent", labels=("output",))
+FRAMES = registry.counter("refzero_frames_total", "Frames by outcome", labels=("outcome",))
+FRAME_ERRORS = registry.counter(
+    "refzero_frame_errors_total", "Frames that failed, by the stage that raised", labels=("stage",))
+REVIEW_LATENCY = registry.histogram(
+    "refzero_review_seconds", "Clip export and model review time", labels=("stage", "result"), buckets=REVIEW_BUCKETS)
+# ThreadPoolExecutor has no public queue length; _work_queue holds the not-yet-started tasks
+registry.gauge("refzero_executor_queue_depth", "Tasks waiting for an executor thread", lambda: {
+    "frame": executor._work_queue.qsize(),
+    "export": export_executor._work_queue.qsize(),
+    "review": review_queue.executor._work_queue.qsize(),
+}, labels=("executor",))
+registry.gauge("refzero_pose_requests_pending", "Frames submitted to the pose pool awaiting results",
+               lambda: len(pose_pool.pending) if pose_pool else 0)
+registry.gauge("refzero_pose_worker_restarts", "Pose workers restarted after dying",
+               lambda: pose_pool.restarts if pose_pool else 0)
+registry.gauge("refzero_streams_active", "Open /ws/stream connections", lambda: len(sessions))
+registry.gauge("refzero_dvr_bytes", "Memory held by all DVR buffers",
+               lambda: sum(s.dvr.memory_bytes() for s in list(sessions.values())))
+registry.gauge("refzero_dvr_disk_bytes", "Bytes of on-disk DVR segments",
+               lambda: sum(s.recorder.disk_bytes for s in list(sessions.values()) if s.recorder))
+registry.gauge("refzero_clip_store", "Clip store counters and sizes",
+               lambda: clip_store.snapshot() if clip_store else {}, labels=("field",))
+registry.gauge("refzero_broadcast", "Broadcast hub counters and sizes", lambda: hub.snapshot(), labels=("field",))
+registry.gauge("refzero_review_queue", "Review queue counters and sizes", lambda: review_queue.snapshot(), labels=("field",))
 
 # --- 1. AI SETUP ---
-if not os.path.exists(MODEL_PATH):
-    print("⬇️ Downloading MediaPipe Model...")
-    urllib.request.urlretrieve(MODEL_URL, MODEL_PATH)
-
-landmarker = None
-def get_landmarker():
-    global landmarker
-    if landmarker is None and os.path.exists(MODEL_PATH):
-        try:
-            base_options = python.BaseOptions(model_asset_path=MODEL_PATH)
-            options = vision.PoseLandmarkerOptions(
-                base_options=base_options,
-                running_mode=vision.RunningMode.VIDEO, 
-                num_poses=4,
-                min_pose_detection_confidence=0.5,
-                min_tracking_confidence=0.5
+async def warm_up():
+    """Verify / download models, start the pose workers and run one inference each - off the request path"""
+    global pose_pool
+    t0 = time.perf_counter()
+    try:
+        startup["stage"] = "models"
+        available = {}
+        for variant, path in MODEL_PATHS.items():
+            if POSE_BACKEND == "stub":
+                available[variant] = path
+                continue
+            try:
+                await asyncio.to_thread(ensure_model, path, MODEL_URLS[variant], pinned_sha256(variant))
+                available[variant] = path
+            except Exception as e:
+                print(f"❌ Model unavailable ({variant}): {e}")
+        if available:
+            startup["stage"] = "workers"
+            pose_pool = await asyncio.to_thread(PoseWorkerPool, INFERENCE_WORKERS, available)
+            startup["stage"] = "warmup"
+            await asyncio.to_thread(pose_pool.warmup)
+            startup["pose"] = True
+            print(f"🚀 AI Engine Ready ({INFERENCE_WORKERS} pose workers, VIDEO MODE) in {time.perf_counter() - t0:.1f}s")
+        else:
+            startup["error"] = "No pose model available"
+            print("❌ No pose model available, serving without pose")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        startup["error"] = repr(e)
+        print(f"❌ Warm-up failed, serving without pose: {e!r}")
+    startup.update(ready=True, stage="ready", seconds=round(time.perf_counter() - t0, 2))
+
+class StreamSession:
+    """One /ws/stream connection: its own DVR, clock and pose tracker"""
+    def __init__(self, websocket, output=STREAM_OUTPUT):
+        self.id = uuid.uuid4().hex[:8]
+        self.websocket = websocket
+        self.output = output
+        self.dvr = SmartDVR(temp_dir=BUFFER_DIR, storage=DVR_STORAGE, max_bytes=DVR_MAX_MB * 1024 * 1024)
+        self.start_time = int(time.time() * 1000)
+        self.last_active = time.time()
+        self.send_lock = asyncio.Lock()
+        self.pose = None
+        self.decoder = FrameDecoder(MAX_FRAME_BYTES)  # reused inference buffers
+        self.preview = PreviewEncoder(
+            PREVIEW_TILE, PREVIEW_THRESHOLD, PREVIEW_KEYFRAME_SECONDS, PREVIEW_MAX_INFLIGHT, PREVIEW_TARGET_RTT_MS
+        ) if output == "delta" else None
+        self.pose_ctl = AdaptivePoseController(POSE_BUDGET_MS, variants=POSE_VARIANTS, enabled=POSE_ADAPTIVE)
+        self.attach_pose()
+        self.slot = LatestFrameSlot()
+        self.recorder = SegmentedRecorder(
+            os.path.join(DVR_DISK_DIR, self.id), DVR_SEGMENT_SECONDS, DVR_RETENTION,
+            DVR_DISK_MAX_MB * 1024 * 1024 or None
+        ) if DVR_DISK else None
+        # Landmarks for the same frames (and timestamps) the DVR holds
+        self.landmarks = LandmarkRing(capacity=self.dvr.buffer_size)
+        self.incidents = IncidentDetector(self.landmarks, window=INCIDENT_WINDOW, cooldown=INCIDENT_COOLDOWN)
+
+    async def send(self, message):
+        """The only writer to this socket (frames, stats and hub verdicts): one send at a time"""
+        async with self.send_lock:
+            if isinstance(message, (bytes, bytearray, memoryview)):
+                await self.websocket.send_bytes(bytes(message))
+            elif isinstance(message, str):
+                await self.websocket.send_text(message)
+            else:
+                await self.websocket.send_json(message)
+
+    def attach_pose(self):
+        """Opens the pose stream once the pool is warm (sessions may start before that)"""
+        if self.pose is None and startup["pose"]:
+            self.pose = pose_pool.open_session(self.id)
+            self.pose_ctl = AdaptivePoseController(
+                POSE_BUDGET_MS, variants=list(pose_pool.model_paths), enabled=POSE_ADAPTIVE
             )
-            landmarker = vision.PoseLandmarker.create_from_options(options)
-            print("🚀 AI Engine Ready (VIDEO MODE)!")
-        except Exception as e:
-            print(f"❌ AI Init Failed: {e}")
-    return landmarker
+
+    def close(self):
+        if self.pose:
+            self.pose.close()
+        self.dvr.release()
+        if self.recorder:
+            # Keep the lookback after a disconnect (e.g. a camera dropping mid-play): still reviewable by
+            # this session id (trigger_review), until retention removes it
+            self.recorder.close(delete=False)
+
+    def stats(self):
+        stats = {**self.slot.stats(), "inference": self.pose_ctl.stats(), "incidents": self.incidents.stats()}
+        if self.preview: stats["preview"] = self.preview.stats()
+        return stats
+
+class EndedStream:
+    """What start_review needs of a disconnected stream: its id and its kept recording (no buffer, no landmarks)"""
+    def __init__(self, stream_id, recorder):
+        self.id = stream_id
+        self.recorder = recorder
+        self.dvr = None
+        self.landmarks = None
+
+class LatestFrameSlot:
+    """Single pending frame per stream: a newer frame replaces (drops) the waiting one"""
+    def __init__(self):
+        self.item = None
+        self.skipped = deque(maxlen=150)  # dropped frames, still written to the DVR
+        self.event = asyncio.Event()
+        self.closed = False
+        self.received = 0
+        self.dropped = 0
+        self.processed = 0
+        self.latency_ms = 0.0
+
+    def put(self, item):
+        self.received += 1
+        if self.item is not None:
+            self.dropped += 1
+            FRAMES.inc("dropped")
+            self.skipped.append(self.item)
+        self.item = item
+        self.event.set()
+
+    async def get(self):
+        """(next frame, frames dropped since the last one), or (None, ...) once closed"""
+        while self.item is None and not self.closed:
+            await self.event.wait()
+            self.event.clear()
+        item, self.item = self.item, None
+        skipped = list(self.skipped)
+        self.skipped.clear()
+        return item, skipped
+
+    def close(self):
+        self.closed = True
+        self.event.set()
+
+    def stats(self):
+        return {
+            "received": self.received, "processed": self.processed,
+            "dropped": self.dropped, "latency_ms": round(self.latency_ms, 1)
+        }
 
 # --- 2. DRAWER ---
 POSE_CONNECTIONS = [
@@ -68,33 +318,54 @@ POSE_CONNECTIONS = [
     (23, 25), (25, 27), (24, 26), (26, 28)
 ]
 
-def draw_landmarks(image, detection_result):
-    if not detection_result.pose_landmarks: return image
+# Only the joints used by the skeleton are sent in "pose" output mode
+POSE_JOINTS = sorted({i for connection in POSE_CONNECTIONS for i in connection})
+POSE_SCHEMA = {
+    "joints": POSE_JOINTS,
+    "connections": [(POSE_JOINTS.index(a), POSE_JOINTS.index(b)) for a, b in POSE_CONNECTIONS],
+    "scale": POSE_SCALE,
+}
+
+def draw_landmarks(image, poses):
+    """poses: (num_poses x 33 x 3) normalized landmarks from the pose pool"""
+    if poses is None or not len(poses): return image
     h, w, _ = image.shape
-    for landmarks in detection_result.pose_landmarks:
+    pts = (poses[:, :, :2] * (w, h)).astype(np.int32)
+    for landmarks in pts:
         for p1_idx, p2_idx in POSE_CONNECTIONS:
-            p1 = landmarks[p1_idx]
-            p2 = landmarks[p2_idx]
-            cv2.line(image, (int(p1.x*w), int(p1.y*h)), (int(p2.x*w), int(p2.y*h)), (0, 255, 0), 2)
+            cv2.line(image, tuple(landmarks[p1_idx]), tuple(landmarks[p2_idx]), (0, 255, 0), 2)
     return image
 
 # --- 3. FASTAPI ---
-async def cleanup_loop():
+def expire_recordings(recorders):
+    for recorder in recorders.values():
+        recorder.expire()
+    sweep_recordings(DVR_DISK_DIR, DVR_RETENTION, keep=set(recorders))
+
+async def recording_retention():
+    """Retention on a clock, not only on segment rotation: idle and ended streams expire too"""
     while True:
-        try:
-            await asyncio.sleep(600)
-            if os.path.exists(BUFFER_DIR):
-                shutil.rmtree(BUFFER_DIR)
-                os.makedirs(BUFFER_DIR)
-        except: break
+        recorders = {sid: s.recorder for sid, s in list(sessions.items()) if s.recorder}
+        try: await asyncio.to_thread(expire_recordings, recorders)
+        except Exception as e: print(f"DVR Retention Error: {e}")
+        await asyncio.sleep(DVR_SWEEP_SECONDS)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    if not os.path.exists(BUFFER_DIR): os.makedirs(BUFFER_DIR)
-    task = asyncio.create_task(cleanup_loop())
+    global clip_store
+    clip_store = ClipStore(BUFFER_DIR, CLIP_STORE_MAX_MB * 1024 * 1024, CLIP_STORE_MAX_CLIPS)
+    # Accept connections right away; models load in the background (see /ready)
+    warm_task = asyncio.create_task(warm_up())
+    retention_task = asyncio.create_task(recording_retention()) if DVR_DISK else None
     yield
-    task.cancel()
+    warm_task.cancel()
+    if retention_task: retention_task.cancel()
+    await hub.close()
+    for session in list(sessions.values()): session.close()
+    if pose_pool: pose_pool.shutdown()
+    review_queue.shutdown()
     executor.shutdown()
+    export_executor.shutdown()
 
 app = FastAPI(lifespan=lifespan)
 app.add_middleware(
@@ -102,77 +373,175 @@ app.add_middleware(
 )
 
 # --- 4. ENDPOINTS ---
-async def analyze_clip(clip_path):
-    print(f"⚖️ Reviewing Clip: {clip_path}")
-    for ws in active_websockets:
-        try: await ws.send_json({"type": "score_update", "data": "VAR CHECKING..."})
-        except: pass
+async def analyze_clip(clip_path, job):
+    print(f"⚖️ Reviewing Clip: {clip_path or 'cached footage'}")
+    hub.publish("score_update", "VAR CHECKING...")
 
+    t0 = time.perf_counter()
     try:
-        import google.generativeai as genai
-        
-        # Upload
-        video_file = genai.upload_file(path=clip_path)
-        while video_file.state.name == "PROCESSING":
-            await asyncio.sleep(0.5)
-            video_file = genai.get_file(video_file.name)
-        
-        if video_file.state.name == "FAILED":
-            raise ValueError("Video processing failed.")
-
-        # Model Selection
-        model_name = "models/gemini-2.0-flash" 
-        print(f"🔄 Using Model: {model_name}")
-        model = genai.GenerativeModel(model_name)
-
-        # --- DETAILED PROMPT ---
-        prompt = """
-        You are an expert Sports Referee using Video Assistant Referee (VAR) technology.
-        Analyze this video clip frame-by-frame.
-        
-        1. Identify the Sport.
-        2. Break down the key action (e.g., "Player A drives to basket", "Defender B makes contact").
-        3. Identify any Rules Violated with specific terminology (e.g., "NBA Rule 12B - Blocking Foul", "FIFA Law 12 - Trip").
-        4. Deliver a final Verdict: CLEAN, FOUL, or VIOLATION.
-        
-        RETURN ONLY RAW JSON. Do not use Markdown formatting.
-        Structure:
-        {
-          "sport": "Basketball/Soccer/etc",
-          "action_breakdown": "Clear description of what happened...",
-          "rule_violated": "Specific Rule Name or 'None'",
-          "verdict": "FOUL/CLEAN/VIOLATION",
-          "explanation": "A concise explanation of why this ruling was made.",
-          "confidence": 95
-        }
-        """
-        response = model.generate_content([video_file, prompt])
-        print(f"🤖 Verdict: {response.text}")
-        
+        # Upload + inference run in the review queue's threads, never on this loop
+        verdict = await review_queue.run(job, clip_path)
+        REVIEW_LATENCY.observe(time.perf_counter() - t0, "review", "cached" if job.cached else "ok")
+        print(f"🤖 Verdict{' (cached)' if job.cached else ''}: {verdict}")
+        if job.id in clip_jobs: clip_jobs[job.id]["verdict"] = verdict
+
         # Send to Frontend
-        for ws in active_websockets:
-            try: await ws.send_json({"type": "verdict", "data": response.text})
-            except: pass
-        
-        try:
-            video_file.delete()
-            os.remove(clip_path)
-        except: pass
+        hub.publish("verdict", verdict)
 
     except Exception as e:
+        REVIEW_LATENCY.observe(time.perf_counter() - t0, "review", "error")
         print(f"Gemini Error: {e}")
-        for ws in active_websockets:
-            try: await ws.send_json({"type": "score_update", "data": "REVIEW FAILED"})
-            except: pass
+        hub.publish("score_update", "REVIEW FAILED")
+
+def pose_motion(landmarks, timestamps):
+    """Pose motion energy per clip frame; None (frame differencing) if the landmarks don't cover the clip"""
+    if landmarks is None or len(timestamps) < 2:
+        return None
+    ts, poses, counts = landmarks
+    found = counts >= 0  # frames without a pose result would break the differences
+    ts, poses, counts = ts[found], poses[found], counts[found]
+    if len(ts) < 2 or not np.any(counts > 0) or ts[0] > timestamps[0] + 0.5 or ts[-1] < timestamps[-1] - 0.5:
+        return None
+    return np.interp(timestamps, ts, motion_energy(ts, poses))
+
+def load_snapshot(snapshot):
+    """Reads a disk-backed range (off the loop) and hashes its frames for the verdict cache"""
+    if callable(snapshot):
+        snapshot = snapshot()
+    return snapshot, snapshot.digest()
+
+def build_review_clip(snapshot, path, landmarks=None):
+    if REVIEW_REDUCE:
+        motion = pose_motion(landmarks, snapshot.timestamps)
+        clip_path, _ = reduce_clip(snapshot, path, motion=motion, **REVIEW_CLIP)
+        return clip_path
+    return export_clip(snapshot, path)
+
+async def export_and_review(job, snapshot, landmarks=None):
+    loop = asyncio.get_running_loop()
+    clip_id = job.id
+    staged = clip_store.staging_path(clip_id)
+    t0 = time.perf_counter()
+    try:
+        snapshot, job.key = await loop.run_in_executor(export_executor, load_snapshot, snapshot)
+        if review_queue.cached(job):
+            # These exact frames were reviewed before (reconnect, shifted window): no export, no upload
+            clip_jobs[clip_id] = {"status": "cached", "path": None}
+            await analyze_clip(None, job)
+            return
+        clip_path = await loop.run_in_executor(export_executor, build_review_clip, snapshot, staged, landmarks)
+        REVIEW_LATENCY.observe(time.perf_counter() - t0, "export", "ok" if clip_path else "empty")
+    except Exception as e:
+        REVIEW_LATENCY.observe(time.perf_counter() - t0, "export", "error")
+        print(f"Export Error: {e}")
+        clip_store.discard(staged)
+        clip_jobs[clip_id] = {"status": "failed", "path": None}
+        review_queue.fail(job, e)
+        return
+    if not clip_path:
+        clip_store.discard(staged)
+        clip_jobs[clip_id] = {"status": "empty", "path": None}
+        review_queue.fail(job, ValueError("Empty clip"))
+        return
+    # Visible under its final name only once complete; the reference pins it during upload
+    clip_path = clip_store.commit(clip_id, staged, hold=True)
+    clip_jobs[clip_id] = {"status": "ready", "path": clip_path}
+    try:
+        await analyze_clip(clip_path, job)
+    finally:
+        clip_store.release(clip_id)
+
+def resolve_time(t, now):
+    """Epoch seconds, or <= 0 for seconds relative to now (-30 = thirty seconds ago)"""
+    if t is None: return None
+    return now + t if t <= 0 else t
+
+def start_review(session, reason="manual", start=None, end=None):
+    """Snapshots the session's DVR and queues export + review (never blocks the loop)"""
+    print(f"🚨 Requesting Review [{session.id}] ({reason}). Buffer Size: {len(session.dvr.frame_buffer) if session.dvr else 'ended'}")
+    if start is None and end is None and session.dvr is not None:
+        snapshot = session.dvr.snapshot()
+        frames, fps = len(snapshot), snapshot.fps()
+    else:
+        # An ended stream has no "now": relative times count back from its last recorded frame
+        now = time.time() if session.dvr is not None else session.recorder.span()[1]
+        end = resolve_time(end, now) or now
+        if start == 0:
+            # 0 = from the oldest frame still recorded (not "0 s before now")
+            recorded = session.recorder.span() if session.recorder else None
+            start = recorded[0] if recorded else 0.0
+        else:
+            start = resolve_time(start, now) or end - DEFAULT_CLIP_SECONDS
+        if start >= end:
+            return {"status": "Bad Range"}
+        if session.recorder:
+            # Segment reads happen in the export worker
+            frames = min(session.recorder.count(start, end), REVIEW_MAX_FRAMES)
+            fps = frames / (end - start)
+            recorder = session.recorder
+            snapshot = lambda: recorder.snapshot(start, end, REVIEW_MAX_FRAMES)
+        else:
+            snapshot = session.dvr.snapshot().trimmed(start, end)
+            frames, fps = len(snapshot), snapshot.fps()
+    if frames < 10:
+        return {"status": "Buffer Empty"}
+
+    # A clip inside a review already in flight for this camera joins it
+    span = (start, end) if callable(snapshot) else (snapshot.timestamps[0], snapshot.timestamps[-1])
+    job, is_new = review_queue.open(stream=session.id, span=span, job_id=uuid.uuid4().hex[:12])
+    if job is None:
+        return {"status": "Review Busy"}
+    if not is_new:
+        return {"status": "Review Coalesced", "clip_id": job.id, "session_id": session.id}
+
+    clip_id = job.id
+    clip_jobs[clip_id] = {"status": "pending", "path": None}
+    while len(clip_jobs) > MAX_CLIP_JOBS: clip_jobs.popitem(last=False)
+    # Landmarks for the same span (a copy): keyframes follow the players, not crowd / camera motion
+    landmarks = session.landmarks.between(*span) if REVIEW_REDUCE and session.landmarks else None
+    task = asyncio.create_task(export_and_review(job, snapshot, landmarks))
+    review_tasks.add(task)
+    task.add_done_callback(review_tasks.discard)
+    return {"status": "Review Started", "clip_id": clip_id, "session_id": session.id, "frames": frames, "fps": round(fps, 1), "reason": reason}
+
+async def incident_review(session, incident):
+    # Let the play finish so the clip includes what happened after the trigger
+    await asyncio.sleep(INCIDENT_POST_ROLL)
+    if sessions.get(session.id) is session:
+        result = start_review(session, reason=incident["type"])
+        print(f"🤖 Auto Review [{session.id}] {incident} -> {result['status']}")
 
 @app.post("/api/trigger_review")
-async def trigger_review(background_tasks: BackgroundTasks):
-    print(f"🚨 Requesting Review. Buffer Size: {len(global_dvr.frame_buffer)}")
-    clip_path = global_dvr.save_last_clip()
-    if clip_path:
-        background_tasks.add_task(analyze_clip, clip_path)
-        return {"status": "Review Started", "clip": clip_path}
-    return {"status": "Buffer Empty"}
+async def trigger_review(session_id: str = None, start: float = None, end: float = None):
+    # start / end: epoch seconds or < 0 relative to now; start=0 = oldest recorded, end=0 = now;
+    # omitted = the in-memory buffer
+    # (reaching further back than the buffer needs DVR_DISK=1)
+    # With DVR_DISK=1 a disconnected stream's id still works until retention: "now" is then its last frame
+    # Default to the camera that sent a frame most recently
+    if session_id is None and sessions:
+        session_id = max(sessions.values(), key=lambda s: s.last_active).id
+    session = sessions.get(session_id)
+    if session is None and DVR_DISK and session_id and session_id.isalnum():
+        # Disconnected camera: its recording is kept until retention, review that
+        recorder = await asyncio.to_thread(SegmentedRecorder.load, os.path.join(DVR_DISK_DIR, session_id))
+        if recorder:
+            session = EndedStream(session_id, recorder)
+    if session is None:
+        return {"status": "No Stream"}
+    return start_review(session, start=start, end=end)
+
+@app.get("/api/reviews")
+async def review_stats():
+    return review_queue.snapshot()
+
+@app.get("/api/clips/{clip_id}")
+async def clip_status(clip_id: str):
+    job = clip_jobs.get(clip_id)
+    if job is None:
+        return {"status": "unknown"}
+    if job["status"] == "ready" and clip_id not in clip_store:
+        return {"clip_id": clip_id, **job, "status": "evicted", "path": None}
+    return {"clip_id": clip_id, **job}
 
 @app.post("/api/toggle_vision")
 async def toggle_vision():
@@ -181,63 +550,290 @@ async def toggle_vision():
     return {"status": "ON" if VISION_ACTIVE else "OFF", "enabled": VISION_ACTIVE}
 
 # --- 5. WEBSOCKET HANDLER ---
-def process_frame_sync(frame_data, timestamp_ms):
+def jpeg_array(frame_data):
+    """base64 text payload or raw binary JPEG view -> uint8 array (binary path is zero-copy)"""
+    if isinstance(frame_data, str):
+        return np.frombuffer(base64.b64decode(frame_data), np.uint8)
+    return np.frombuffer(frame_data, np.uint8)
+
+def record_skipped(session, skipped):
+    """Frames dropped by the scheduler still belong in the DVR"""
+    for frame_data, _, received_at, _ in skipped:
+        np_arr = jpeg_array(frame_data)
+        frame = None if session.dvr.storage == "encoded" else cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        session.dvr.write_frame(frame, jpeg_bytes=np_arr, timestamp=received_at)
+        if session.recorder: session.recorder.write(np_arr, received_at)
+        session.landmarks.append(None, received_at)
+
+def pose_message(poses, action, binary_meta=None):
+    quantized = quantize_poses(poses, POSE_JOINTS)
+    flags = FLAG_ACTION if action else 0
+    if binary_meta:
+        seq, client_ts = binary_meta
+        return pack_message(MSG_POSE_FRAME, seq, client_ts, pack_poses(quantized, flags))
+    return {"type": "pose_frame", "data": {"poses": quantized.tolist(), "flags": flags}}
+
+def process_frame_sync(session, frame_data, timestamp_ms, received_at=None, skipped=(), binary_meta=None):
+    timer = StageTimer(FRAME_STAGES)
+    if received_at is None: received_at = time.time()
     try:
-        np_arr = np.frombuffer(base64.b64decode(frame_data), np.uint8)
-        frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-        if frame is None: return None, None, None
+        if skipped:
+            record_skipped(session, skipped)
+            timer.mark("record_skipped")
+
+        np_arr = jpeg_array(frame_data)
+        timer.mark("b64decode")
+        size = jpeg_size(np_arr)
+        if size is None:
+            FRAME_ERRORS.inc("imdecode")
+            return None, None, None
+        # Full resolution only for drawing / re-encoding or a decoded DVR; inference decodes reduced
+        frame = None
+        if session.output != "pose" or session.dvr.storage != "encoded":
+            frame = session.decoder.full(np_arr)
+            if frame is None:
+                FRAME_ERRORS.inc("imdecode")
+                return None, None, None
+        timer.mark("imdecode")
 
-        global_dvr.write_frame(frame)
+        # Encoded DVR stores the original JPEG bytes (no re-encode, no decoded copy)
+        session.dvr.write_frame(frame, jpeg_bytes=np_arr, timestamp=received_at)
+        if session.recorder: session.recorder.write(np_arr, received_at)
+        timer.mark("dvr_write")
 
         action = None
-        if VISION_ACTIVE:
-            ai = get_landmarker()
-            if ai:
-                img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=img_rgb)
-                
-                result = ai.detect_for_video(mp_image, timestamp_ms)
-                frame = draw_landmarks(frame, result)
-                
-                if result.pose_landmarks:
-                    for pose in result.pose_landmarks:
-                        if pose[15].y < pose[0].y or pose[16].y < pose[0].y:
-                            action = "ACTION DETECTED"
+        poses = None
+        incident = None
+        if VISION_ACTIVE and session.pose:
+            ctl = session.pose_ctl
+            detected = ctl.should_detect()
+            if detected:
+                # Decoded (or resized + converted) straight into the pose slot's shared memory
+                max_side = min(filter(None, (ctl.max_side, POSE_MAX_SIDE)), default=None)
+                img_rgb = session.decoder.rgb(np_arr, size, max_side, frame=frame, alloc=session.pose.buffer)
+                timer.mark("preprocess")
+                if img_rgb is None:
+                    FRAME_ERRORS.inc("imdecode")
+                    return None, None, None
+                t0 = time.perf_counter()
+                poses = session.pose.detect(img_rgb, timestamp_ms, variant=ctl.variant)
+                ctl.observe(poses, (time.perf_counter() - t0) * 1000, img_rgb.shape[:2])
+                timer.mark("inference")
+            else:
+                poses = ctl.interpolated()
+                timer.mark("interpolate")
+
+            # Either wrist above the nose
+            if poses is not None and len(poses) and np.any(np.minimum(poses[:, 15, 1], poses[:, 16, 1]) < poses[:, 0, 1]):
+                action = "ACTION DETECTED"
+
+            # Extrapolated poses carry no new evidence (and fake velocities): a skipped frame keeps its
+            # place in the ring (frame-aligned with the DVR) but records no result
+            session.landmarks.append(poses if detected else None, received_at)
+            if detected and AUTO_REVIEW:
+                incident = session.incidents.update()
+            timer.mark("incidents")
+        else:
+            session.landmarks.append(None, received_at)
 
+        if session.output == "pose":
+            # No draw, no JPEG encode - the client already has the image
+            out = pose_message(poses, action, binary_meta)
+            timer.mark("pack")
+            return out, action, incident
+
+        frame = draw_landmarks(frame, poses)
+        timer.mark("draw")
+        seq, client_ts = binary_meta or (0, 0)
+        if session.preview:
+            payload = session.preview.encode(frame, seq)
+            timer.mark("imencode")
+            # Link too slow even for the smallest preview: landmarks only, drawn over the client's own video
+            out = pose_message(poses, action, binary_meta) if payload is None \
+                else pack_message(MSG_VIDEO_DELTA, seq, client_ts, payload)
+            timer.mark("pack")
+            return out, action, incident
         _, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 50])
-        b64 = base64.b64encode(buffer).decode('utf-8')
-        return b64, action, None
+        timer.mark("imencode")
+        if binary_meta:
+            out = pack_message(MSG_VIDEO_FRAME, seq, client_ts, buffer)
+        else:
+            out = {"type": "video_frame", "data": base64.b64encode(buffer).decode('utf-8')}
+        timer.mark("pack")
+        return out, action, incident
 
     except Exception as e:
+        # Attribute the failure to the step after the last one that completed
+        FRAME_ERRORS.inc(f"after_{timer.stage}")
         print(f"Error: {e}")
         return None, None, None
 
+async def handle_frame(session, slot, encoded, current_timestamp, received_at, binary_meta=None, skipped=()):
+    loop = asyncio.get_running_loop()
+    if not startup["ready"]:
+        # Still warming up: keep the frame for the DVR and answer at once
+        await loop.run_in_executor(executor, record_skipped, session, [*skipped, (encoded, current_timestamp, received_at, binary_meta)])
+        FRAMES.inc("not_ready")
+        await session.send({"type": "not_ready", "data": {"stage": startup["stage"]}})
+        return
+    if session.pose is None:
+        session.attach_pose()
+    out, action, incident = await loop.run_in_executor(
+        executor, process_frame_sync, session, encoded, current_timestamp, received_at, skipped, binary_meta
+    )
+    if incident:
+        hub.publish("score_update", f"INCIDENT: {incident['type'].replace('_', ' ').upper()}")
+        task = asyncio.create_task(incident_review(session, incident))
+        review_tasks.add(task)
+        task.add_done_callback(review_tasks.discard)
+    slot.processed += 1
+    FRAMES.inc("processed" if out is not None else "error")
+    # Time from socket receive to result ready - stays bounded when stale frames are dropped
+    slot.latency_ms = (time.time() - received_at) * 1000
+
+    if out is not None:
+        await session.send(out)
+        # Spectators on /ws/viewer get the same (already encoded) frame
+        topic = "pose_frame" if session.output == "pose" else "video_frame"
+        if hub.has_subscribers(topic, session.id):
+            # Delta frames are flagged so the hub never hands a viewer a delta after a dropped one
+            keyframe = bool(out[OUT_HEADER.size] & DELTA_KEY) if session.preview and out[0] == MSG_VIDEO_DELTA else None
+            hub.publish(topic, out if binary_meta else out["data"], source=session.id, keyframe=keyframe)
+        if action and current_timestamp % 10 == 0:
+            await session.send({"type": "score_update", "data": action})
+        FRAME_LATENCY.observe(time.time() - received_at, session.output)
+    if slot.processed % STATS_EVERY == 0:
+        await session.send({"type": "stream_stats", "data": session.stats()})
+
+async def frame_worker(session, slot):
+    while True:
+        item, skipped = await slot.get()
+        if item is None: break
+        await handle_frame(session, slot, *item, skipped=skipped)
+
+def handle_preview_control(preview, text):
+    """Delta clients: {"type": "ack", "seq": n} after drawing frame n, {"type": "keyframe"} to resync"""
+    try: msg = json.loads(text or "")
+    except ValueError: return
+    if not isinstance(msg, dict): return
+    if msg.get("type") == "ack" and isinstance(msg.get("seq"), int):
+        preview.ack(msg["seq"])
+    elif msg.get("type") == "keyframe":
+        preview.request_keyframe()
+
 @app.websocket("/ws/stream")
 async def video_stream(websocket: WebSocket):
-    await websocket.accept()
-    active_websockets.append(websocket)
-    print("🟢 Frontend Connected")
-    loop = asyncio.get_running_loop()
-    start_time = int(time.time() * 1000)
+    # Binary framing is opt-in via subprotocol; plain clients keep the base64 text path
+    binary = BINARY_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=BINARY_SUBPROTOCOL if binary else None)
+    output = websocket.query_params.get("output", STREAM_OUTPUT)
+    if output not in STREAM_OUTPUTS: output = STREAM_OUTPUT
+    if output == "delta" and not binary: output = "video"  # delta segments are binary-only
+    session = StreamSession(websocket, output=output)
+    sessions[session.id] = session
+    # Through the session's send: the hub must never evict / close the ingest socket or write concurrently
+    subscription = hub.subscribe(websocket, topics=("verdict", "score_update"), send=session.send)
+    slot = session.slot
+    print(f"🟢 Frontend Connected [{session.id}] ({STREAM_SCHEDULING}, {'binary' if binary else 'text'}, {session.output})")
+    if session.output == "pose":
+        await session.send({"type": "pose_schema", "data": POSE_SCHEMA})
+    worker = asyncio.create_task(frame_worker(session, slot)) if STREAM_SCHEDULING == "latest" else None
     
     try:
         while True:
-            data = await websocket.receive_text()
-            if "data:image" in data:
-                _, encoded = data.split(",", 1)
-                current_timestamp = int(time.time() * 1000) - start_time
-                
-                b64, action, _ = await loop.run_in_executor(
-                    executor, process_frame_sync, encoded, current_timestamp
-                )
-                
-                if b64:
-                    await websocket.send_json({"type": "video_frame", "data": b64})
-                    if action and current_timestamp % 10 == 0:
-                        await websocket.send_json({"type": "score_update", "data": action})
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            if message.get("bytes") is not None:
+                try: seq, client_ts, encoded = unpack_frame(message["bytes"])
+                except ValueError: continue
+                binary_meta = (seq, client_ts)
+            elif "data:image" in (message.get("text") or ""):
+                _, encoded = message["text"].split(",", 1)
+                binary_meta = None
+            else:
+                if session.preview: handle_preview_control(session.preview, message.get("text"))
+                continue
+
+            current_timestamp = int(time.time() * 1000) - session.start_time
+            session.last_active = time.time()
+            item = (encoded, current_timestamp, session.last_active, binary_meta)
+
+            if worker:
+                slot.put(item)
+            else:
+                slot.received += 1
+                await handle_frame(session, slot, *item)
     except WebSocketDisconnect:
-        if websocket in active_websockets: active_websockets.remove(websocket)
-        print("🔴 Disconnected")
+        print(f"🔴 Disconnected [{session.id}] {slot.stats()}")
+    finally:
+        if worker:
+            # Let the in-flight frame finish before the session's resources go away
+            slot.close()
+            try: await worker
+            except Exception: pass
+        await hub.unsubscribe(subscription)
+        sessions.pop(session.id, None)
+        session.close()
+
+@app.websocket("/ws/viewer")
+async def viewer(websocket: WebSocket):
+    """
+    Read-only feed for spectators: /ws/viewer?topics=verdict,video_frame&session_id=<id>
+    (no session_id = every stream). Frames arrive as the publishing stream encoded them;
+    streams in "pose" output publish on pose_frame instead of video_frame.
+    """
+    await websocket.accept()
+    topics = [t for t in websocket.query_params.get("topics", ",".join(TOPICS)).split(",") if t in TOPICS]
+    source = websocket.query_params.get("session_id")
+    subscription = hub.subscribe(websocket, topics=topics, source=source)
+    if "video_frame" in topics:
+        # Delta streams: the next frame is a full one, so the new viewer has a picture to patch
+        for session in list(sessions.values()):
+            if session.preview and source in (None, session.id): session.preview.request_keyframe()
+    print(f"👀 Viewer Connected #{subscription.id} {topics}")
+    try:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    except (WebSocketDisconnect, RuntimeError):
+        pass  # evicted by the hub (socket already closed)
+    finally:
+        await hub.unsubscribe(subscription)
+
+@app.get("/api/streams")
+async def list_streams():
+    return {sid: {**s.stats(), "recorded": s.recorder.span() if s.recorder else None} for sid, s in sessions.items()}
+
+@app.get("/api/recordings")
+async def list_recordings():
+    # Ended streams keep their recording (reviewable by id) until retention deletes it
+    if not DVR_DISK:
+        return {}
+    names = await asyncio.to_thread(lambda: os.listdir(DVR_DISK_DIR) if os.path.isdir(DVR_DISK_DIR) else [])
+    return {name: "live" if name in sessions else "ended" for name in sorted(names)}
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 503 until models are verified and the pose workers have run one inference,
+    and for good if that failed (the server still answers frames, but can't run inference)
+    """
+    ok = startup["ready"] and startup["pose"] and not startup["error"]
+    return JSONResponse(startup, status_code=200 if ok else 503)
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profile")
+async def profile(seconds: float = 5.0, hz: int = 100):
+    """Collapsed stacks of every thread (feed to flamegraph.pl or speedscope)"""
+    if not PROFILER_ENABLED:
+        return {"status": "Profiler Disabled"}
+    # Own thread: sampling must not sit in the frame executor's queue
+    stacks = await asyncio.to_thread(sample_stacks, min(seconds, 60.0), max(1, min(hz, 1000)))
+    return PlainTextResponse(stacks)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,159 @@
+import bisect
+import collections
+import sys
+import threading
+import time
+
+# Frame stages are mostly sub-10 ms; review / export run into seconds
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+REVIEW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect + three increments under a lock"""
+    def __init__(self, name, help, labels=(), buckets=STAGE_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            s = self.series.get(label_values)
+            if s is None:
+                s = self.series[label_values] = [0] * (len(self.buckets) + 2) + [0.0]
+            s[i] += 1
+            s[-2] += 1
+            s[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {k: list(v) for k, v in self.series.items()}
+        for values, s in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, s):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(self.label_names + ('le',), values + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.label_names + ('le',), values + ('+Inf',))} {s[-2]}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, values)} {s[-1]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, values)} {s[-2]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.series = collections.Counter()
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, n=1):
+        with self.lock:
+            self.series[label_values] += n
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            series = dict(self.series)
+        for values, n in sorted(series.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, values)} {n}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time: `fn()` returns a number, or {label value(s): number}"""
+    def __init__(self, name, help, fn, labels=()):
+        self.name, self.help, self.fn, self.label_names = name, help, fn, tuple(labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            value = self.fn()
+        except Exception:
+            return lines
+        if isinstance(value, dict):
+            for values, v in sorted(value.items()):
+                values = values if isinstance(values, tuple) else (values,)
+                lines.append(f"{self.name}{_labels(self.label_names, values)} {v}")
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def histogram(self, *args, **kwargs):
+        return self._add(Histogram(*args, **kwargs))
+
+    def counter(self, *args, **kwargs):
+        return self._add(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self._add(Gauge(*args, **kwargs))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """
+    Per-frame stage clock: one perf_counter() call per stage.
+        t = StageTimer(hist); ...decode...; t.mark("decode"); ...; t.mark("encode")
+    """
+    __slots__ = ("hist", "last", "stage")
+
+    def __init__(self, hist):
+        self.hist = hist
+        self.last = time.perf_counter()
+        self.stage = "start"
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.hist.observe(now - self.last, stage)
+        self.last = now
+        self.stage = stage  # last completed stage, for error attribution
+
+
+def sample_stacks(seconds=5.0, hz=100, skip_idle=True):
+    """
+    Poor man's sampling profiler: snapshots every thread's stack `hz` times a second.
+    Returns collapsed stacks ("outer;inner;leaf count" lines) for flamegraph.pl / speedscope.
+    """
+    me = threading.get_ident()
+    names = {t.ident: t.name for t in threading.enumerate()}
+    counts = collections.Counter()
+    interval = 1.0 / hz
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            # Threads parked in a queue / selector / lock wait are not interesting
+            if skip_idle and stack and stack[0].split(" ", 1)[0] in ("wait", "select", "poll", "get", "_worker", "acquire", "_recv", "sleep"):
+                continue
+            counts[";".join([names.get(ident, str(ident))] + stack[::-1])] += 1
+        time.sleep(interval)
+    return "\n".join(f"{stack} {n}" for stack, n in counts.most_common()) + "\n"
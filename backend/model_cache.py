@@ -0,0 +1,71 @@
+import hashlib
+import os
+import urllib.request
+import zipfile
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def intact(path):
+    """.task files are zip bundles: every member's CRC must check out (catches truncated / corrupt files)"""
+    try:
+        with zipfile.ZipFile(path) as z:
+            return z.testzip() is None
+    except (zipfile.BadZipFile, OSError):
+        return False
+
+
+def pinned_sha256(variant):
+    """Optional pinned checksum, e.g. POSE_MODEL_SHA256_HEAVY=<hex>"""
+    return os.getenv(f"POSE_MODEL_SHA256_{variant.upper()}") or None
+
+
+def ensure_model(path, url, expected=None):
+    """
+    Returns `path` once it holds a verified copy of the model. Blocking - run it in a thread.
+    - the checksum is kept next to the file (`<path>.sha256`) and re-checked on every start
+    - `expected` pins the checksum; otherwise a file is only trusted (and its checksum recorded)
+      once the bundle checks out as intact
+    - a missing, truncated or mismatching file is re-downloaded (to a temp name, then renamed)
+    """
+    sidecar = path + ".sha256"
+    if os.path.exists(path):
+        digest = sha256_file(path)
+        recorded = None
+        if os.path.exists(sidecar):
+            with open(sidecar) as f:
+                recorded = f.read().strip() or None
+        want = expected or recorded
+        if digest == want or (want is None and intact(path)):
+            if recorded != digest:
+                _write_sidecar(sidecar, digest)
+            return path
+        print(f"⚠️ {'Checksum mismatch' if want else 'Damaged file'} for {path}, downloading again")
+
+    print(f"⬇️ Downloading {os.path.basename(path)}...")
+    tmp = path + ".download"
+    try:
+        urllib.request.urlretrieve(url, tmp)
+        digest = sha256_file(tmp)
+        if expected and digest != expected:
+            raise ValueError(f"Downloaded {path} has sha256 {digest}, expected {expected}")
+        if not expected and not intact(tmp):
+            raise ValueError(f"Downloaded {path} is not a complete model bundle")
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    _write_sidecar(sidecar, digest)
+    return path
+
+
+def _write_sidecar(sidecar, digest):
+    with open(sidecar + ".tmp", "w") as f:
+        f.write(digest + "\n")
+    os.replace(sidecar + ".tmp", sidecar)
@@ -0,0 +1,195 @@
+"""
+One OCR model (and one Gemini review rate limit) for every agent job on the machine.
+
+The first agent worker starts the service (ensure_service); every job connects to it (connect) and
+gets a proxy with the easyocr `readtext(image, detail=...)` signature, so ScoreboardOCR works as is.
+Requests from all rooms are collected for a few ms and run as one padded `readtext_batched` call.
+LiveKit runs each job in its own process, so the review token bucket lives here too (review_bucket).
+
+The manager unpickles whatever a client sends, so it only accepts clients with the auth key:
+OCR_SERVICE_AUTHKEY, or else a random key the first service writes to OCR_SERVICE_KEYFILE (mode 0600).
+"""
+import os
+import queue
+import secrets
+import threading
+import time
+import multiprocessing as mproc
+from concurrent.futures import Future
+from multiprocessing.managers import BaseManager
+import cv2
+from review_scheduler import TokenBucket
+
+OCR_ADDRESS = (os.getenv("OCR_SERVICE_HOST", "127.0.0.1"), int(os.getenv("OCR_SERVICE_PORT", "50055")))
+OCR_KEYFILE = os.path.expanduser(os.getenv("OCR_SERVICE_KEYFILE", "~/.refzero/ocr_service.key"))
+OCR_BACKEND = os.getenv("OCR_BACKEND", "easyocr")    # "stub" = fixed result, no model (pipeline checks)
+OCR_MAX_BATCH = int(os.getenv("OCR_MAX_BATCH", "8"))
+OCR_BATCH_WAIT_MS = float(os.getenv("OCR_BATCH_WAIT_MS", "20"))
+OCR_MAX_PENDING = int(os.getenv("OCR_MAX_PENDING", "64"))   # beyond this, requests fail fast
+# Gemini image reviews across ALL rooms / jobs on the host share one rate limit
+REVIEW_RPS = float(os.getenv("REVIEW_RPS", "0.5"))
+REVIEW_BURST = int(os.getenv("REVIEW_BURST", "3"))
+
+
+class StubReader:
+    """Deterministic stand-in for easyocr.Reader"""
+    def readtext(self, image, detail=1):
+        return self.readtext_batched([image], detail=detail)[0]
+
+    def readtext_batched(self, images, detail=1, **_):
+        out = []
+        for img in images:
+            h, w = img.shape[:2]
+            out.append([([[0, 0], [w, 0], [w, h], [0, h]], "0 - 0", 1.0)] if detail else ["0 - 0"])
+        return out
+
+
+def _readtext_batched(reader, images, detail):
+    """readtext_batched needs equal sizes: pad right / bottom (keeps box coordinates valid)"""
+    if len(images) == 1:
+        return [reader.readtext(images[0], detail=detail)]
+    h = max(img.shape[0] for img in images)
+    w = max(img.shape[1] for img in images)
+    padded = [cv2.copyMakeBorder(img, 0, h - img.shape[0], 0, w - img.shape[1], cv2.BORDER_CONSTANT, value=0)
+              for img in images]
+    return reader.readtext_batched(padded, detail=detail)
+
+
+class OCRBatcher:
+    """
+    Lives in the service process. Each client connection calls readtext() from its own server thread;
+    one batching thread runs the model, so calls arriving together share a forward pass.
+    """
+    def __init__(self, reader, max_batch=8, max_wait=0.02, max_pending=64):
+        self.reader = reader
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.Queue(maxsize=max_pending)
+        self.counts = {"requests": 0, "batches": 0, "rejected": 0, "failed": 0}
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def readtext(self, image, detail=1, timeout=30.0):
+        fut = Future()
+        try:
+            self.requests.put_nowait((image, detail, fut))
+        except queue.Full:
+            self.counts["rejected"] += 1
+            raise RuntimeError("OCR service busy")
+        return fut.result(timeout=timeout)
+
+    def _loop(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try: batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty: break
+            # Box search (detail=1) and score reads (detail=0) batch separately
+            for detail in {d for _, d, _ in batch}:
+                group = [r for r in batch if r[1] == detail]
+                try:
+                    results = _readtext_batched(self.reader, [img for img, _, _ in group], detail)
+                    for (_, _, fut), result in zip(group, results):
+                        fut.set_result(result)
+                except Exception as e:
+                    self.counts["failed"] += len(group)
+                    for _, _, fut in group:
+                        fut.set_exception(e)
+                self.counts["batches"] += 1
+                self.counts["requests"] += len(group)
+
+    def stats(self):
+        return {**self.counts, "pending": self.requests.qsize()}
+
+
+_batcher = None
+_review_bucket = None
+
+
+def _init_service():
+    # Runs once in the service process: the only place the model is loaded
+    global _batcher, _review_bucket
+    _review_bucket = TokenBucket(REVIEW_RPS, REVIEW_BURST)
+    if OCR_BACKEND == "stub":
+        reader = StubReader()
+    else:
+        import easyocr
+        print("📚 Loading OCR Model (shared by all rooms)...")
+        reader = easyocr.Reader(['en'], gpu=False)
+    _batcher = OCRBatcher(reader, OCR_MAX_BATCH, OCR_BATCH_WAIT_MS / 1000, OCR_MAX_PENDING)
+    print(f"✅ OCR Service Ready (pid {os.getpid()})")
+
+
+def _get_service():
+    return _batcher
+
+
+def _get_review_bucket():
+    return _review_bucket
+
+
+def _authkey(create=False):
+    """OCR_SERVICE_AUTHKEY, else the key file (written with a fresh random key when `create`)"""
+    key = os.getenv("OCR_SERVICE_AUTHKEY")
+    if key:
+        return key.encode()
+    try:
+        fd = os.open(OCR_KEYFILE, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+    except FileNotFoundError:
+        if not create:
+            raise RuntimeError(f"OCR service key not found: set OCR_SERVICE_AUTHKEY or start the service first ({OCR_KEYFILE})")
+        os.makedirs(os.path.dirname(OCR_KEYFILE), mode=0o700, exist_ok=True)
+        key = secrets.token_hex(32)
+        fd = os.open(OCR_KEYFILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(key)
+        return key.encode()
+    with os.fdopen(fd) as f:
+        st = os.fstat(f.fileno())
+        if st.st_mode & 0o077 or (hasattr(os, "getuid") and st.st_uid != os.getuid()):
+            raise RuntimeError(f"{OCR_KEYFILE} must be owned by this user and not readable by others (chmod 600)")
+        return f.read().strip().encode()
+
+
+class OCRManager(BaseManager):
+    pass
+
+
+OCRManager.register("get_service", callable=_get_service, exposed=("readtext", "stats"))
+OCRManager.register("get_review_bucket", callable=_get_review_bucket, exposed=("try_acquire",))
+
+
+def _connect(address, authkey):
+    manager = OCRManager(address=address, authkey=authkey or _authkey())
+    manager.connect()
+    return manager
+
+
+def connect(address=OCR_ADDRESS, authkey=None):
+    """Proxy to the shared service (thread-safe: each calling thread gets its own connection)"""
+    return _connect(address, authkey).get_service()
+
+
+def review_bucket(address=OCR_ADDRESS, authkey=None):
+    """Proxy to the host-wide review TokenBucket (`try_acquire()` is a blocking round trip)"""
+    return _connect(address, authkey).get_review_bucket()
+
+
+def ensure_service(address=OCR_ADDRESS, authkey=None):
+    """
+    Starts the service unless one already answers at `address` (e.g. another worker on the host).
+    Returns the manager that owns the process, or None if it was already running.
+    """
+    authkey = authkey or _authkey(create=True)
+    try:
+        connect(address, authkey).stats()
+        return None
+    except (ConnectionError, OSError):
+        pass
+    manager = OCRManager(address=address, authkey=authkey, ctx=mproc.get_context("spawn"))
+    # Returns after the initializer: the model is loaded before the first job connects
+    manager.start(initializer=_init_service)
+    return manager
@@ -0,0 +1,223 @@
+import numpy as np
+from inference_pool import NUM_LANDMARKS, MAX_POSES
+
+NOSE = 0
+FACE = list(range(11))                            # nose, eyes, ears, mouth
+SHOULDERS = [11, 12]
+HIPS = [23, 24]
+EXTREMITIES = [13, 14, 15, 16, 25, 26, 27, 28]   # elbows, wrists, knees, ankles
+STRIKE_JOINTS = [15, 16, 27, 28]                  # wrists, ankles
+TARGET_JOINTS = [0, 11, 12, 23, 24]               # head + torso
+
+
+class LandmarkRing:
+    """
+    Landmarks of the last `capacity` frames as one (frames x poses x 33 x 3) array,
+    written alongside the DVR (same receive timestamps) so events map straight onto clips.
+    Slot i holds the same player across frames: each pose takes the slot whose previous hip centre is
+    nearest (within `match_radius`, normalized units). A player nobody matches gets a slot that was empty
+    in the previous frame, never one just vacated, so consecutive values in a slot are one person.
+    One entry per DVR frame. Only real detections are stored as poses (not interpolated ones):
+    count = -1 marks a frame with no pose result (skipped by the stride or the scheduler); detections()
+    drops those for anything that differentiates over time.
+    """
+    def __init__(self, capacity=150, max_poses=MAX_POSES, match_radius=0.15):
+        self.capacity = capacity
+        self.match_radius = match_radius
+        self.poses = np.full((capacity, max_poses, NUM_LANDMARKS, 3), np.nan, dtype=np.float32)
+        self.counts = np.full(capacity, -1, dtype=np.int8)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.last = np.full((max_poses, 2), np.nan, dtype=np.float32)  # hip centre per slot, last result
+        self.head = 0   # next write position
+        self.size = 0
+
+    def append(self, poses, timestamp):
+        i = self.head
+        self.poses[i] = np.nan
+        if poses is None:
+            self.counts[i] = -1
+        else:
+            placed = 0
+            if len(poses):
+                for k, slot in self._match(poses):
+                    self.poses[i, slot] = poses[k]
+                    placed += 1
+            self.counts[i] = placed
+            self.last = _mid(self.poses[i], HIPS)
+        self.timestamps[i] = timestamp
+        self.head = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def _match(self, poses):
+        """(pose index, slot) pairs: greedy nearest hip centre, then newcomers left-to-right into free slots"""
+        centres = _mid(poses, HIPS)                                                   # (N, 2)
+        dist = np.linalg.norm(centres[:, None] - self.last[None], axis=-1)            # (N, S), NaN = empty slot
+        dist = np.where(np.isnan(dist), np.inf, dist)
+        pairs, used_poses, used_slots = [], set(), set()
+        for k, slot in zip(*np.unravel_index(np.argsort(dist, axis=None), dist.shape)):
+            if dist[k, slot] > self.match_radius:
+                break
+            if k in used_poses or slot in used_slots:
+                continue
+            pairs.append((int(k), int(slot)))
+            used_poses.add(k)
+            used_slots.add(slot)
+        free = [s for s in np.flatnonzero(np.isnan(self.last[:, 0])) if s not in used_slots]
+        newcomers = [k for k in np.argsort(centres[:, 0]) if k not in used_poses]
+        # No free slot: the newcomer waits a frame until a vacated slot has gone empty
+        pairs += [(int(k), int(s)) for k, s in zip(newcomers, free)]
+        return pairs
+
+    def window(self, n):
+        """Last `n` frames oldest-first: (timestamps, poses, counts) - copies, safe to keep"""
+        n = min(n, self.size)
+        idx = (self.head - n + np.arange(n)) % self.capacity
+        return self.timestamps[idx], self.poses[idx], self.counts[idx]
+
+    def detections(self, n):
+        """Last `n` frames that have a pose result, oldest-first: (timestamps, poses, counts) copies"""
+        idx = (self.head - self.size + np.arange(self.size)) % self.capacity
+        idx = idx[self.counts[idx] >= 0][-n:]
+        return self.timestamps[idx], self.poses[idx], self.counts[idx]
+
+    def between(self, start, end):
+        """Frames with start <= timestamp <= end, oldest-first (e.g. the span of a DVR snapshot)"""
+        ts, poses, counts = self.window(self.size)
+        mask = (ts >= start) & (ts <= end)
+        return ts[mask], poses[mask], counts[mask]
+
+    def clear(self):
+        self.poses[:] = np.nan
+        self.counts[:] = -1
+        self.last[:] = np.nan
+        self.head = self.size = 0
+
+
+def _mid(poses, joints):
+    return poses[..., joints, :2].mean(axis=-2)
+
+
+def _torso(poses):
+    """(..., poses) torso length: shoulder-mid to hip-mid, the per-player distance unit"""
+    return np.linalg.norm(_mid(poses, SHOULDERS) - _mid(poses, HIPS), axis=-1)
+
+
+def velocity_spike(ts, poses, counts, threshold=12.0, reach=0.5):
+    """
+    Wrist / ankle faster than `threshold` torso lengths per second between consecutive frames that ends
+    within `reach` torso lengths of another player's head or torso. Passes and shots are as fast
+    (10-15 torso lengths / s) but end away from other players. Returns (score, pose index) or None.
+    """
+    if len(ts) < 2:
+        return None
+    dt = np.maximum(np.diff(ts), 1e-3)[:, None, None]                  # (W-1, 1, 1)
+    xy = poses[:, :, STRIKE_JOINTS, :2]                                  # (W, P, J, 2)
+    scale = np.maximum(_torso(poses[1:]), 0.02)[:, :, None]             # tiny / far-away players would explode
+    # Slots are stable players, so a NaN on either side (absent player) leaves NaN
+    speed = np.linalg.norm(np.diff(xy, axis=0), axis=-1) / dt / scale  # (W-1, P, J)
+    end = xy[1:, :, :, None, None, :]                                   # (W-1, P, J, 1, 1, 2)
+    targets = poses[1:, None, None, :, TARGET_JOINTS, :2]               # (W-1, 1, 1, P, T, 2)
+    gap = np.linalg.norm(end - targets, axis=-1) / scale[..., None, None]
+    p = poses.shape[1]
+    gap[:, np.arange(p), :, np.arange(p)] = np.inf                      # own body
+    near = np.where(np.isnan(gap), np.inf, gap).min(axis=(3, 4)) < reach
+    speed = np.where(near, speed, np.nan)
+    if np.all(np.isnan(speed)):
+        return None
+    peak = float(np.nanmax(speed))
+    if peak < threshold:
+        return None
+    _, pose, _ = np.unravel_index(np.nanargmax(speed), speed.shape)
+    return peak, int(pose)
+
+
+def contact(ts, poses, counts, radius=0.2, persist=5):
+    """
+    A wrist / elbow / knee / ankle of one player within `radius` torso lengths of another player's
+    face for the last `persist` detections. Hands on the torso or hips are normal close guarding and
+    don't count. Returns (score, (attacker, target)) or None.
+    """
+    if len(ts) < persist or np.any(counts[-persist:] < 2):
+        return None
+    recent = poses[-persist:]                                           # (F, P, 33, 3)
+    a = recent[:, :, None, EXTREMITIES, None, :2]                       # (F, P, 1, E, 1, 2)
+    b = recent[:, None, :, None, FACE, :2]                              # (F, 1, P, 1, T, 2)
+    dist = np.linalg.norm(a - b, axis=-1)                               # (F, P, P, E, T)
+    scale = np.maximum(_torso(recent), 0.02)[:, :, None, None, None]
+    closest = np.nanmin(np.where(np.isnan(dist), np.inf, dist / scale), axis=(3, 4))  # (F, P, P)
+    p = closest.shape[1]
+    closest[:, np.arange(p), np.arange(p)] = np.inf                     # a player touching themself
+    sustained = closest.max(axis=0)                                     # worst frame per pair
+    if not np.any(sustained < radius):
+        return None
+    i, j = np.unravel_index(np.argmin(sustained), sustained.shape)
+    return float(radius / max(sustained[i, j], 1e-3)), (int(i), int(j))
+
+
+def fall(ts, poses, counts, drop_speed=1.5, horizontal=1.0):
+    """
+    Hip centre dropping faster than `drop_speed` torso lengths / s somewhere in the window,
+    ending with a torso that is more horizontal than vertical. Returns (score, pose) or None.
+    """
+    if len(ts) < 3 or counts[-1] <= 0:
+        return None
+    dt = np.maximum(np.diff(ts), 1e-3)[:, None]
+    hip_y = _mid(poses, HIPS)[..., 1]                                   # (W, P), y grows downward
+    drop = np.diff(hip_y, axis=0) / dt / np.maximum(_torso(poses[1:]), 0.02)
+    axis = _mid(poses[-1], SHOULDERS) - _mid(poses[-1], HIPS)           # (P, 2)
+    lying = np.abs(axis[:, 0]) > horizontal * np.abs(axis[:, 1])        # (P,)
+    peak = np.nanmax(np.where(np.isnan(drop), -np.inf, drop), axis=0)  # (P,)
+    hit = lying & (peak > drop_speed)
+    if not np.any(hit):
+        return None
+    pose = int(np.argmax(np.where(hit, peak, -np.inf)))
+    return float(peak[pose]), pose
+
+
+def motion_energy(ts, poses):
+    """(W,) summed landmark speed of every visible player in torso lengths / s (0 where nobody is)"""
+    if len(ts) < 2:
+        return np.zeros(len(ts), dtype=np.float32)
+    dt = np.maximum(np.diff(ts), 1e-3)[:, None]
+    speed = np.linalg.norm(np.diff(poses[..., :2], axis=0), axis=-1).mean(axis=-1) / dt   # (W-1, P)
+    energy = np.nansum(speed / np.maximum(_torso(poses[1:]), 0.02), axis=1)
+    return np.concatenate([energy[:1], energy]).astype(np.float32)
+
+
+DETECTORS = {"velocity_spike": velocity_spike, "contact": contact, "fall": fall}
+
+
+class IncidentDetector:
+    """
+    Runs every detector over the last `window` detections of a LandmarkRing (frames without a pose
+    result are skipped, so velocities span real detections at any stride).
+    An incident type re-arms after `cooldown` seconds so one play triggers one review.
+    """
+    def __init__(self, ring, window=15, cooldown=10.0, detectors=None):
+        self.ring = ring
+        self.window = window
+        self.cooldown = cooldown
+        self.detectors = detectors or DETECTORS
+        self.last_fired = {}
+        self.counts = {name: 0 for name in self.detectors}
+
+    def update(self):
+        """Checks the latest window; returns an incident dict or None"""
+        ts, poses, counts = self.ring.detections(self.window)
+        if not len(ts) or counts[-1] <= 0:
+            return None
+        now = ts[-1]
+        for name, detect in self.detectors.items():
+            if now - self.last_fired.get(name, -np.inf) < self.cooldown:
+                continue
+            hit = detect(ts, poses, counts)
+            if hit is None:
+                continue
+            score, who = hit
+            self.last_fired[name] = now
+            self.counts[name] += 1
+            return {"type": name, "score": round(score, 2), "players": who, "timestamp": float(now)}
+        return None
+
+    def stats(self):
+        return dict(self.counts)
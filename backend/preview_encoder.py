@@ -0,0 +1,166 @@
+import struct
+import time
+import cv2
+import numpy as np
+
+# MSG_VIDEO_DELTA payload: flags (u8), quality (u8), canvas width (u16), canvas height (u16), tile count (u16),
+# then per tile: x (u16), y (u16), JPEG length (u32), JPEG bytes. The client keeps a canvas of the
+# given size and draws each JPEG at (x, y); a KEY message is one full-canvas tile and resets it.
+DELTA_HEADER = struct.Struct("<BBHHH")
+TILE_HEADER = struct.Struct("<HHI")
+DELTA_KEY = 1
+
+# Degradation ladder, best first: (JPEG quality, canvas scale). Past the last rung: overlay only.
+LEVELS = [(50, 1.0), (40, 1.0), (35, 0.75), (30, 0.75), (30, 0.5), (25, 0.5)]
+
+
+class PreviewEncoder:
+    """
+    Inter-frame preview for /ws/stream?output=delta: a full JPEG keyframe, then only the tiles
+    that changed since what the client last received (changed-region MJPEG, CPU only).
+    - tiles are compared against the client's copy, so small changes add up until they are sent
+    - keyframes every `keyframe_interval` s, on a scale change, or on request (new viewer, client resync)
+    - quality / scale follow client ACKs: too many unacked frames or a slow RTT steps down,
+      a run of prompt ACKs steps up; below the last level only landmarks are sent (overlay only)
+    Until the first ACK arrives the client is assumed not to ACK and the level stays fixed.
+    """
+    def __init__(self, tile=64, threshold=4.0, keyframe_interval=2.0, max_inflight=4,
+                 target_rtt_ms=250.0, recover_after=30, key_ratio=0.6):
+        self.tile = tile
+        self.threshold = threshold
+        self.keyframe_interval = keyframe_interval
+        self.max_inflight = max_inflight
+        self.target_rtt_ms = target_rtt_ms
+        self.recover_after = recover_after
+        self.key_ratio = key_ratio          # more of the frame changed than this -> send a keyframe instead
+        self.level = 0
+        self.ref = None                     # what the client's canvas shows (BGR, canvas size)
+        self.scaled = None
+        self.last_key = 0.0
+        self.force_key = True
+        self.acking = False
+        self.inflight = {}                  # seq -> (sent time, bytes)
+        self.rtt_ms = None
+        self.good = 0
+        self.counts = {"keyframes": 0, "deltas": 0, "overlay": 0, "tiles": 0, "bytes": 0, "acked_bytes": 0}
+
+    @property
+    def overlay_only(self):
+        return self.level >= len(LEVELS)
+
+    def request_keyframe(self):
+        self.force_key = True
+
+    def ack(self, seq):
+        """Cumulative: the client has shown everything up to `seq`"""
+        self.acking = True
+        now = time.time()
+        # Called on the event loop while encode() runs in an executor thread: snapshot the keys
+        for s in [s for s in list(self.inflight) if s <= seq]:
+            entry = self.inflight.pop(s, None)
+            if entry is None:
+                continue
+            sent, nbytes = entry
+            rtt = (now - sent) * 1000
+            self.rtt_ms = rtt if self.rtt_ms is None else 0.8 * self.rtt_ms + 0.2 * rtt
+            self.counts["acked_bytes"] += nbytes
+
+    def _adapt(self):
+        if not self.acking:
+            return
+        congested = len(self.inflight) > self.max_inflight or (self.rtt_ms or 0) > self.target_rtt_ms
+        if congested:
+            self.good = 0
+            if self.level < len(LEVELS):
+                self.level += 1
+                self.force_key = True
+                # What was in flight at the old level no longer says anything about the new one
+                self.inflight.clear()
+                self.rtt_ms = None
+        else:
+            self.good += 1
+            if self.good >= self.recover_after and self.level > 0:
+                self.level -= 1
+                self.good = 0
+                self.force_key = True
+
+    def encode(self, frame, seq):
+        """Annotated BGR frame -> delta payload, or None when the client should get landmarks only"""
+        self._adapt()
+        if self.overlay_only:
+            self.counts["overlay"] += 1
+            # Landmark frames are ACKed too: once they come back promptly, video resumes at the lowest rung
+            self._sent(seq, time.time(), 0)
+            return None
+        quality, scale = LEVELS[self.level]
+        if scale < 1.0:
+            h, w = frame.shape[:2]
+            size = (max(1, int(w * scale)), max(1, int(h * scale)))
+            if self.scaled is None or self.scaled.shape[1::-1] != size:
+                self.scaled = np.empty((size[1], size[0], 3), np.uint8)
+            frame = cv2.resize(frame, size, dst=self.scaled, interpolation=cv2.INTER_AREA)
+        h, w = frame.shape[:2]
+        now = time.time()
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+
+        key = self.force_key or self.ref is None or self.ref.shape != frame.shape \
+            or now - self.last_key >= self.keyframe_interval
+        rects = []
+        if not key:
+            t = self.tile
+            rows, cols = -(-h // t), -(-w // t)
+            # Mean absolute difference per tile (INTER_AREA averages each tile's pixels)
+            diff = cv2.resize(cv2.absdiff(frame, self.ref), (cols, rows), interpolation=cv2.INTER_AREA)
+            changed = diff.reshape(rows, cols, -1).max(axis=2) > self.threshold
+            if changed.sum() > self.key_ratio * rows * cols:
+                key = True
+            else:
+                # Runs of changed tiles in a row become one strip (fewer JPEG headers)
+                for r, c0, c1 in _runs(changed):
+                    rects.append((c0 * t, r * t, min(c1 * t, w), min((r + 1) * t, h)))
+
+        if key:
+            rects = [(0, 0, w, h)]
+            if self.ref is None or self.ref.shape != frame.shape:
+                self.ref = np.empty_like(frame)
+            self.force_key = False
+            self.last_key = now
+
+        parts = [DELTA_HEADER.pack(DELTA_KEY if key else 0, quality, w, h, len(rects))]
+        for x0, y0, x1, y1 in rects:
+            region = frame[y0:y1, x0:x1]
+            _, jpeg = cv2.imencode('.jpg', region, params)
+            parts.append(TILE_HEADER.pack(x0, y0, len(jpeg)))
+            parts.append(jpeg.tobytes())
+            self.ref[y0:y1, x0:x1] = region
+        payload = b"".join(parts)
+
+        self.counts["keyframes" if key else "deltas"] += 1
+        self.counts["tiles"] += len(rects)
+        self.counts["bytes"] += len(payload)
+        if self.acking:
+            self._sent(seq, now, len(payload))
+        return payload
+
+    def _sent(self, seq, now, nbytes):
+        if len(self.inflight) >= 8 * self.max_inflight:  # a client that stopped ACKing
+            self.inflight.pop(next(iter(list(self.inflight))), None)
+        self.inflight[seq] = (now, nbytes)
+
+    def stats(self):
+        quality, scale = LEVELS[min(self.level, len(LEVELS) - 1)]
+        return {
+            **self.counts, "level": self.level, "quality": None if self.overlay_only else quality,
+            "scale": None if self.overlay_only else scale, "inflight": len(self.inflight),
+            "rtt_ms": round(self.rtt_ms, 1) if self.rtt_ms is not None else None,
+        }
+
+
+def _runs(changed):
+    """(row, first col, end col) for every horizontal run of True in a (rows x cols) bool grid"""
+    padded = np.zeros((changed.shape[0], changed.shape[1] + 2), np.int8)
+    padded[:, 1:-1] = changed
+    edges = np.diff(padded, axis=1)
+    starts = np.argwhere(edges == 1)
+    ends = np.argwhere(edges == -1)
+    return [(int(r), int(c0), int(c1)) for (r, c0), (_, c1) in zip(starts, ends)]
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+REVIEW_MODEL = "models/gemini-2.0-flash"
+
+# --- DETAILED PROMPT ---
+REVIEW_PROMPT = """
+You are an expert Sports Referee using Video Assistant Referee (VAR) technology.
+Analyze this video clip frame-by-frame.
+
+1. Identify the Sport.
+2. Break down the key action (e.g., "Player A drives to basket", "Defender B makes contact").
+3. Identify any Rules Violated with specific terminology (e.g., "NBA Rule 12B - Blocking Foul", "FIFA Law 12 - Trip").
+4. Deliver a final Verdict: CLEAN, FOUL, or VIOLATION.
+
+RETURN ONLY RAW JSON. Do not use Markdown formatting.
+Structure:
+{
+  "sport": "Basketball/Soccer/etc",
+  "action_breakdown": "Clear description of what happened...",
+  "rule_violated": "Specific Rule Name or 'None'",
+  "verdict": "FOUL/CLEAN/VIOLATION",
+  "explanation": "A concise explanation of why this ruling was made.",
+  "confidence": 95
+}
+"""
+
+
+class GeminiReviewClient:
+    """Blocking Gemini calls - only ever run from ReviewQueue's worker threads"""
+    def __init__(self, model_name=REVIEW_MODEL, prompt=REVIEW_PROMPT, poll_interval=0.5, api_key=None):
+        self.genai = None  # SDK imported on the first review, not at server start
+        self.api_key = api_key
+        self.model_name = model_name
+        self.prompt = prompt
+        self.poll_interval = poll_interval
+
+    def _sdk(self):
+        if self.genai is None:
+            import google.generativeai as genai
+            if self.api_key: genai.configure(api_key=self.api_key)
+            self.genai = genai
+        return self.genai
+
+    def review(self, clip_path):
+        genai = self._sdk()
+        # Upload
+        video_file = genai.upload_file(path=clip_path)
+        try:
+            while video_file.state.name == "PROCESSING":
+                time.sleep(self.poll_interval)
+                video_file = genai.get_file(video_file.name)
+
+            if video_file.state.name == "FAILED":
+                raise ValueError("Video processing failed.")
+
+            print(f"🔄 Using Model: {self.model_name}")
+            model = genai.GenerativeModel(self.model_name)
+            response = model.generate_content([video_file, self.prompt])
+            return response.text
+        finally:
+            try: video_file.delete()
+            except: pass
+
+
+class StubReviewClient:
+    """Local stand-in for the model (REVIEW_BACKEND=stub); returns a fixed verdict"""
+    def __init__(self, delay=0.5, verdict="CLEAN"):
+        self.delay = delay
+        self.verdict = verdict
+        self.calls = 0
+
+    def review(self, clip_path):
+        self.calls += 1
+        time.sleep(self.delay)
+        return json.dumps({
+            "sport": "Unknown",
+            "action_breakdown": f"Stub review of {clip_path}",
+            "rule_violated": "None",
+            "verdict": self.verdict,
+            "explanation": "Stub reviewer - no model was called.",
+            "confidence": 0
+        })
+
+
+class ReviewJob:
+    def __init__(self, job_id, stream=None, span=None):
+        self.id = job_id
+        self.stream = stream
+        self.span = span  # (first, last) capture timestamp of the clip
+        # Hash of the clip's source frames, set by the export worker (ClipSnapshot.digest()):
+        # the rendered mp4 never comes out byte-identical, the received JPEGs do
+        self.key = None
+        self.future = asyncio.get_running_loop().create_future()
+        self.waiters = 1
+        self.cached = False
+
+
+class ReviewQueue:
+    """
+    Bounded-concurrency review queue.
+    - SDK calls run in a thread pool, never on the event loop
+    - a request whose span lies inside an in-flight review of the same stream joins that review
+    - verdicts are cached by job.key (source frame hash): set it, then check cached(job) before rendering the clip
+    """
+    def __init__(self, client, concurrency=2, max_pending=16, cache_size=128):
+        self.client = client
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.cache_size = cache_size
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.semaphore = None
+        self.active = {}          # job_id -> ReviewJob (not yet resolved)
+        self.cache = OrderedDict()  # job key -> verdict text
+        self.stats = {"submitted": 0, "coalesced": 0, "cache_hits": 0, "completed": 0, "failed": 0}
+
+    def open(self, stream=None, span=None, job_id=None):
+        """
+        Returns (job, is_new). An in-flight review of the same stream that covers `span`
+        is shared instead of starting a second upload (a wider request gets its own review).
+        Returns (None, False) when full.
+        """
+        if span is not None:
+            for job in self.active.values():
+                if job.stream == stream and job.span and job.span[0] <= span[0] and span[1] <= job.span[1]:
+                    job.waiters += 1
+                    self.stats["coalesced"] += 1
+                    return job, False
+        if len(self.active) >= self.max_pending:
+            return None, False
+        job = ReviewJob(job_id, stream, span)
+        self.active[job_id] = job
+        self.stats["submitted"] += 1
+        return job, True
+
+    def fail(self, job, error):
+        self._resolve(job, error=error)
+
+    def cached(self, job):
+        """True if the same footage was already reviewed (run() then needs no clip)"""
+        return job.key is not None and job.key in self.cache
+
+    async def run(self, job, clip_path=None):
+        """Reviews `clip_path` for a job returned by open(); resolves the job's future"""
+        if self.cached(job):
+            self.cache.move_to_end(job.key)
+            self.stats["cache_hits"] += 1
+            job.cached = True
+            self._resolve(job, result=self.cache[job.key])
+            return await job.future
+        if self.client is None:
+            self._resolve(job, error=RuntimeError("No review client configured"))
+            return await job.future
+
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_running_loop()
+        try:
+            async with self.semaphore:
+                verdict = await loop.run_in_executor(self.executor, self.client.review, clip_path)
+
+            if job.key is not None:
+                self.cache[job.key] = verdict
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+            self._resolve(job, result=verdict)
+        except Exception as e:
+            self._resolve(job, error=e)
+        return await job.future
+
+    def _resolve(self, job, result=None, error=None):
+        self.active.pop(job.id, None)
+        if job.future.done():
+            return
+        if error is not None:
+            self.stats["failed"] += 1
+            job.future.set_exception(error)
+            job.future.exception()  # mark retrieved; waiters still see it via await
+        else:
+            self.stats["completed"] += 1
+            job.future.set_result(result)
+
+    def snapshot(self):
+        return {**self.stats, "in_flight": len(self.active), "cached": len(self.cache)}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
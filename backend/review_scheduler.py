@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+import cv2
+from concurrent.futures import ThreadPoolExecutor
+from scoreboard import dhash, hamming
+
+IMAGE_MODEL = "models/gemini-2.0-flash-exp"
+IMAGE_PROMPT = "You are an NBA Ref. Analyze this image. Return JSON ONLY: {\"event\": \"description\", \"foul\": boolean, \"rule_citation\": \"rule name\"}"
+
+
+class TokenBucket:
+    """Thread-safe token bucket; the agent uses one in the shared service process (ocr_service.review_bucket)"""
+    def __init__(self, rate=0.5, capacity=3):
+        self.rate = rate          # tokens per second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+def gemini_image_review(jpeg_bytes):
+    """Inline image request - no temp file, no upload/poll round trips. Blocking."""
+    import google.generativeai as genai
+    model = genai.GenerativeModel(IMAGE_MODEL)
+    result = model.generate_content([{"mime_type": "image/jpeg", "data": jpeg_bytes}, IMAGE_PROMPT])
+    return result.text
+
+
+class RoomReviewScheduler:
+    """
+    Periodic still-image review for one room.
+    - at most one request in flight; a newer frame replaces the pending one
+    - frames whose dHash barely moved since the last review are skipped
+    - every request must take a token from the shared bucket (may be a proxy: called off the loop)
+    """
+    def __init__(self, publish, bucket, review_fn=gemini_image_review, executor=None,
+                 min_interval=5.0, hash_threshold=6, jpeg_quality=80):
+        self.publish = publish
+        self.bucket = bucket
+        self.review_fn = review_fn
+        self.executor = executor or ThreadPoolExecutor(max_workers=1)
+        self.min_interval = min_interval
+        self.hash_threshold = hash_threshold
+        self.jpeg_quality = jpeg_quality
+        self.last_offer = 0.0
+        self.last_hash = None
+        self.pending = None
+        self.task = None
+        self.stats = {"offered": 0, "unchanged": 0, "replaced": 0, "rate_limited": 0, "reviewed": 0, "failed": 0}
+
+    def offer(self, frame):
+        """Called for every frame; cheap unless a review is due"""
+        now = time.time()
+        if now - self.last_offer < self.min_interval:
+            return
+        self.last_offer = now
+        self.stats["offered"] += 1
+
+        h = dhash(frame)
+        if self.last_hash is not None and hamming(h, self.last_hash) <= self.hash_threshold:
+            self.stats["unchanged"] += 1
+            return
+        if self.pending is not None:
+            self.stats["replaced"] += 1
+        self.pending = (frame, h)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._drain())
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        while self.pending is not None:
+            frame, h = self.pending
+            self.pending = None
+            try:
+                if not await loop.run_in_executor(self.executor, self.bucket.try_acquire):
+                    self.stats["rate_limited"] += 1
+                    continue
+                jpeg = await loop.run_in_executor(self.executor, self._encode, frame)
+                if jpeg is None: continue
+                text = await loop.run_in_executor(self.executor, self.review_fn, jpeg)
+                self.last_hash = h
+                self.stats["reviewed"] += 1
+                if text:
+                    await self.publish(text.replace("```json", "").replace("```", ""))
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"Gemini Error: {e}")
+
+    def _encode(self, frame):
+        ok, buf = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+        return buf.tobytes() if ok else None
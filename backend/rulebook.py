@@ -0,0 +1,182 @@
+import difflib
+import json
+import math
+import os
+import re
+import sys
+from collections import Counter, OrderedDict
+
+RULEBOOK_DIR = os.getenv("RULEBOOK_DIR", "rulebooks")
+
+# Lines that start a new rule section, e.g. "RULE 12B", "Law 12 - Fouls", "Section I", "Article 4"
+HEADING_RE = re.compile(r"^\s*(rule|law|section|article|part)\s+([0-9ivxlc]+[a-z]?)\b.*$", re.IGNORECASE)
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "that", "the", "to", "was", "with", "official", "rulebook",
+}
+CHUNK_WORDS = 200
+HEADING_WEIGHT = 3  # heading tokens count 3x so "Rule 12B" lands on the 12B section
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def split_sections(text):
+    """Rulebook text -> [(heading, body)], chunked to ~CHUNK_WORDS words per entry"""
+    sections, parent, heading, lines = [], "", "", []
+    for line in text.splitlines():
+        line = line.strip()
+        m = HEADING_RE.match(line)
+        if m:
+            if lines: sections.append((heading, " ".join(lines)))
+            lines = []
+            # "Section I" / "Article 4" nest under the last "Rule" / "Law"
+            short = line[:80]
+            if m.group(1).lower() in ("section", "article") and parent:
+                heading = f"{parent} / {short}"
+            else:
+                parent = heading = short
+            lines.append(line)  # headings often carry text on the same line
+        elif line:
+            lines.append(line)
+    if lines: sections.append((heading, " ".join(lines)))
+
+    chunks = []
+    for heading, body in sections:
+        words = body.split()
+        for i in range(0, max(len(words), 1), CHUNK_WORDS):
+            chunks.append((heading, " ".join(words[i:i + CHUNK_WORDS])))
+    return chunks
+
+
+def read_source(path):
+    if path.lower().endswith(".pdf"):
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            raise RuntimeError("PDF ingest needs `pip install pypdf` (or pass pre-extracted text)")
+        return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+class RulebookIndex:
+    """BM25 inverted index over one sport's rulebook sections"""
+    def __init__(self, sport, docs, postings, doc_len):
+        self.sport = sport
+        self.docs = docs            # [{"heading": ..., "text": ...}]
+        self.postings = postings    # term -> [[doc_id, tf], ...]
+        self.doc_len = doc_len
+        self.avgdl = sum(doc_len) / len(doc_len) if doc_len else 0.0
+        self.vocab = sorted(postings)
+
+    @classmethod
+    def build(cls, sport, text):
+        docs, postings, doc_len = [], {}, []
+        for heading, body in split_sections(text):
+            doc_id = len(docs)
+            docs.append({"heading": heading, "text": body})
+            tf = Counter(tokenize(body))
+            for t in tokenize(heading):
+                tf[t] += HEADING_WEIGHT
+            doc_len.append(sum(tf.values()))
+            for term, n in tf.items():
+                postings.setdefault(term, []).append([doc_id, n])
+        return cls(sport, docs, postings, doc_len)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["sport"], data["docs"], data["postings"], data["doc_len"])
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"sport": self.sport, "docs": self.docs, "postings": self.postings, "doc_len": self.doc_len}, f)
+        os.replace(tmp, path)
+
+    def _expand(self, term):
+        """Exact term, or the closest vocabulary terms for typos / OCR noise"""
+        if term in self.postings:
+            return [term]
+        # Rule numbers ("12b") must match exactly; only fuzz real words
+        if len(term) < 4 or not term.isalpha():
+            return []
+        candidates = [v for v in self.vocab if v[:1] == term[:1]]
+        return difflib.get_close_matches(term, candidates, n=2, cutoff=0.8)
+
+    def search(self, query, k=3, k1=1.5, b=0.75):
+        n_docs = len(self.docs)
+        scores = Counter()
+        for term in set(tokenize(query)):
+            for t in self._expand(term):
+                plist = self.postings[t]
+                idf = math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+                for doc_id, tf in plist:
+                    norm = tf * (k1 + 1) / (tf + k1 * (1 - b + b * self.doc_len[doc_id] / self.avgdl))
+                    scores[doc_id] += idf * norm
+        return [(score, self.docs[doc_id]) for doc_id, score in scores.most_common(k)]
+
+
+class RulebookLibrary:
+    """Per-sport indexes on disk + an LRU of recent citation lookups"""
+    def __init__(self, root=RULEBOOK_DIR, cache_size=256, min_score=2.0):
+        self.root = root
+        self.cache_size = cache_size
+        self.min_score = min_score
+        self.indexes = {}
+        self.cache = OrderedDict()
+
+    def _path(self, sport):
+        return os.path.join(self.root, f"{sport.lower()}.json")
+
+    def ingest(self, sport, source_path):
+        index = RulebookIndex.build(sport.upper(), read_source(source_path))
+        index.save(self._path(sport))
+        self.indexes[sport.upper()] = index
+        self.cache = OrderedDict((k, v) for k, v in self.cache.items() if k[0] != sport.upper())
+        print(f"📖 Indexed {sport.upper()}: {len(index.docs)} sections, {len(index.postings)} terms")
+        return index
+
+    def get(self, sport):
+        sport = sport.upper()
+        if sport not in self.indexes:
+            path = self._path(sport)
+            self.indexes[sport] = RulebookIndex.load(path) if os.path.exists(path) else None
+        return self.indexes[sport]
+
+    def lookup(self, sport, citation):
+        """Best matching section {"heading", "text", "score"} or None on a miss"""
+        key = (sport.upper(), " ".join(tokenize(citation)))
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        index = self.get(sport)
+        hit = None
+        if index is not None:
+            results = index.search(citation, k=1)
+            if results and results[0][0] >= self.min_score:
+                score, doc = results[0]
+                hit = {**doc, "score": round(score, 2)}
+
+        self.cache[key] = hit
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return hit
+
+
+if __name__ == "__main__":
+    # python rulebook.py ingest NBA nba_rulebook.txt
+    # python rulebook.py lookup NBA "Rule 12B Blocking Foul"
+    library = RulebookLibrary()
+    if len(sys.argv) == 4 and sys.argv[1] == "ingest":
+        library.ingest(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) == 4 and sys.argv[1] == "lookup":
+        print(json.dumps(library.lookup(sys.argv[2], sys.argv[3]), indent=2))
+    else:
+        print("Usage: python rulebook.py ingest <SPORT> <file.txt|file.pdf> | lookup <SPORT> <citation>")
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import cv2
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+TOP_FRACTION = 0.15  # default search area: top 15% of the frame
+ROI_PAD = 8
+# Share of the box's pixels that must move by more than CHANGE_PIXEL grey levels to re-run OCR.
+# On 720p broadcast frames one changed digit (98->99, a clock tick) is ~1-2% of the box; JPEG noise is ~0%.
+CHANGE_FRACTION = float(os.getenv("SCOREBOARD_CHANGE_FRACTION", "0.004"))
+CHANGE_PIXEL = int(os.getenv("SCOREBOARD_CHANGE_PIXEL", "48"))
+
+
+def dhash(img, size=8):
+    """64-bit difference hash of a BGR/gray image"""
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def gate_image(img):
+    """Blurred grey copy used for change checks (the blur keeps compression noise under CHANGE_PIXEL)"""
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return cv2.GaussianBlur(gray, (3, 3), 0)
+
+
+def changed_fraction(a, b, pixel=CHANGE_PIXEL):
+    """Share of pixels that differ by more than `pixel` grey levels (1.0 if the shapes differ)"""
+    if a is None or b is None or a.shape != b.shape:
+        return 1.0
+    return np.count_nonzero(cv2.absdiff(a, b) > pixel) / a.size
+
+
+def digits_only(texts):
+    return " | ".join([x for x in texts if any(c.isdigit() for c in x)])
+
+
+class ScoreboardOCR:
+    """
+    Change-gated scoreboard reader for one video track.
+    - the scoreboard box is found once (digit-bearing text in the top strip) and cached
+    - OCR only runs when more than `change_fraction` of the box's pixels changed since the last read
+    - the box is searched for again after `relocalize_after` checks without a good read
+    - readtext runs in a worker thread, one call in flight at a time
+    - `on_change(score)` fires only when the recognised score string changes
+    """
+    def __init__(self, reader, on_change, executor=None, change_fraction=CHANGE_FRACTION, relocalize_after=12):
+        self.reader = reader
+        self.on_change = on_change
+        self.executor = executor or ThreadPoolExecutor(max_workers=1)
+        self.change_fraction = change_fraction
+        self.relocalize_after = relocalize_after
+        self.roi = None          # (x0, y0, x1, y1) in frame coords
+        self.frame_shape = None
+        self.last_gate = None    # gate_image of the region at the last OCR run
+        self.last_score = None
+        self.read_ok = False     # last OCR run found digits
+        self.since_read = 0      # checks since the box last showed a readable score
+        self.task = None
+        self.stats = {"checked": 0, "ocr_runs": 0, "published": 0}
+
+    def _region(self, frame):
+        if self.roi is None:
+            return frame[0:int(frame.shape[0] * TOP_FRACTION), :]
+        x0, y0, x1, y1 = self.roi
+        return frame[y0:y1, x0:x1]
+
+    def submit(self, frame):
+        """Cheap per-frame check on the event loop; schedules OCR only if the ROI changed"""
+        if self.task is not None and not self.task.done():
+            return
+        if frame.shape != self.frame_shape:
+            self.frame_shape, self.roi, self.last_gate = frame.shape, None, None
+
+        self.stats["checked"] += 1
+        region = self._region(frame)
+        unchanged = changed_fraction(gate_image(region), self.last_gate) <= self.change_fraction
+        # An unchanged box that last read fine still shows a score; anything else counts towards
+        # relocalizing, including a static box that never read (camera moved onto the crowd)
+        self.since_read = 0 if unchanged and self.read_ok else self.since_read + 1
+        if self.roi is not None and self.since_read > self.relocalize_after:
+            self.roi, self.last_gate, self.since_read = None, None, 0  # search the strip again
+            region, unchanged = self._region(frame), False
+        if unchanged:
+            return
+        self.task = asyncio.create_task(self._run(frame, region.copy()))
+
+    async def _run(self, frame, region):
+        loop = asyncio.get_running_loop()
+        try:
+            if self.roi is None:
+                top = frame[0:int(frame.shape[0] * TOP_FRACTION), :].copy()
+                score = await loop.run_in_executor(self.executor, self._localize, top)
+            else:
+                score = await loop.run_in_executor(self.executor, self._read, region)
+            self.stats["ocr_runs"] += 1
+            # Gate against whatever region we will compare with next time
+            self.last_gate = gate_image(self._region(frame))
+            self.read_ok = bool(score)
+            if score:
+                self.since_read = 0
+            if score and score != self.last_score:
+                self.last_score = score
+                self.stats["published"] += 1
+                await self.on_change(score)
+        except Exception as e:
+            print(f"OCR Error: {e}")
+
+    def _localize(self, top):
+        """Full OCR of the top strip; caches the box around digit-bearing text"""
+        results = self.reader.readtext(top)
+        boxes = [np.array(box) for box, text, _ in results if any(c.isdigit() for c in text)]
+        if boxes:
+            pts = np.concatenate(boxes)
+            x0, y0 = np.maximum(pts.min(axis=0).astype(int) - ROI_PAD, 0)
+            x1, y1 = pts.max(axis=0).astype(int) + ROI_PAD
+            self.roi = (int(x0), int(y0), int(min(x1, top.shape[1])), int(min(y1, top.shape[0])))
+        return digits_only([text for _, text, _ in results])
+
+    def _read(self, region):
+        return digits_only(self.reader.readtext(region, detail=0))
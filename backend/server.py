@@ -1,5 +1,9 @@
 import os
-from fastapi import FastAPI
+import re
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from livekit import api
 
@@ -10,25 +14,68 @@ app.add_middleware(
 )
 
 # DEFAULT DEV KEYS (From 'livekit-server --dev')
-LIVEKIT_URL = "ws://localhost:7880"
-API_KEY = "devkey"
-API_SECRET = "secret"
+LIVEKIT_URL = os.getenv("LIVEKIT_URL", "ws://localhost:7880")
+API_KEY = os.getenv("LIVEKIT_API_KEY", "devkey")
+API_SECRET = os.getenv("LIVEKIT_API_SECRET", "secret")
+DEFAULT_ROOM = "ref-room"
+# One room per court, e.g. ROOMS=court-1,court-2 (empty = any room name)
+ROOMS = [r for r in os.getenv("ROOMS", "").split(",") if r]
+TOKEN_TTL = int(os.getenv("TOKEN_TTL", "3600"))               # seconds
+TOKEN_REFRESH_MARGIN = int(os.getenv("TOKEN_REFRESH_MARGIN", "300"))  # re-sign this long before expiry
+NAME_RE = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+class TokenCache:
+    """Signed join tokens per (room, identity), reused until `margin` seconds before they expire"""
+    def __init__(self, ttl=3600, margin=300, max_entries=1024):
+        self.ttl = ttl
+        self.margin = min(margin, ttl // 2)
+        self.max_entries = max_entries
+        self.tokens = OrderedDict()  # (room, identity) -> (jwt, expires_at)
+        self.stats = {"hits": 0, "signed": 0}
+
+    def get(self, room, identity):
+        key = (room, identity)
+        now = time.time()
+        cached = self.tokens.get(key)
+        if cached and cached[1] - self.margin > now:
+            self.tokens.move_to_end(key)
+            self.stats["hits"] += 1
+            return cached
+        jwt = api.AccessToken(API_KEY, API_SECRET) \
+            .with_identity(identity) \
+            .with_name(identity) \
+            .with_ttl(timedelta(seconds=self.ttl)) \
+            .with_grants(api.VideoGrants(
+                room_join=True,
+                room=room,
+                can_publish=True,
+                can_subscribe=True
+            )).to_jwt()
+        self.tokens[key] = (jwt, now + self.ttl)
+        self.tokens.move_to_end(key)
+        while len(self.tokens) > self.max_entries:
+            self.tokens.popitem(last=False)
+        self.stats["signed"] += 1
+        return self.tokens[key]
+
+
+tokens = TokenCache(TOKEN_TTL, TOKEN_REFRESH_MARGIN)
 
 @app.get("/api/token")
-async def get_token():
-    # Generate a token for a user
-    token = api.AccessToken(API_KEY, API_SECRET) \
-        .with_identity("Player") \
-        .with_name("Player") \
-        .with_grants(api.VideoGrants(
-            room_join=True,
-            room="ref-room",
-            can_publish=True,
-            can_subscribe=True
-        ))
-    
-    return {"token": token.to_jwt(), "url": LIVEKIT_URL}
+async def get_token(room: str = DEFAULT_ROOM, identity: str = "Player"):
+    # /api/token?room=court-2&identity=cam-north (defaults keep the single-room setup working)
+    if not NAME_RE.match(room) or not NAME_RE.match(identity):
+        raise HTTPException(status_code=400, detail="Invalid room or identity")
+    if ROOMS and room not in ROOMS:
+        raise HTTPException(status_code=404, detail=f"Unknown room: {room}")
+    token, expires_at = tokens.get(room, identity)
+    return {"token": token, "url": LIVEKIT_URL, "room": room, "expires_at": int(expires_at)}
+
+@app.get("/api/rooms")
+async def list_rooms():
+    return {"rooms": ROOMS or [DEFAULT_ROOM], "tokens": tokens.stats}
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,96 @@
+import asyncio
+from broadcast import BroadcastHub
+
+
+class BlockedSocket:
+    """A viewer whose sends never finish until released"""
+    def __init__(self):
+        self.sent = []
+        self.release = asyncio.Event()
+
+    async def send_bytes(self, data):
+        await self.release.wait()
+        self.sent.append(data)
+
+    send_text = send_bytes
+
+
+async def viewer(hub, **kwargs):
+    ws = BlockedSocket()
+    sub = hub.subscribe(ws, topics=("video_frame", "verdict"), **kwargs)
+    await asyncio.sleep(0)  # writer task waiting for the first message
+    return ws, sub
+
+
+def queued(sub):
+    return [message for message, _, _ in sub.queue]
+
+
+def test_lossy_frames_drop_oldest():
+    async def main():
+        hub = BroadcastHub(queue_size=3, send_timeout=60)
+        ws, sub = await viewer(hub)
+        for i in range(6):
+            hub.publish("video_frame", b"f%d" % i, source="cam")
+        return queued(sub), sub.dropped
+    assert asyncio.run(main()) == ([b"f3", b"f4", b"f5"], 3)
+
+
+def test_dropped_delta_skips_to_the_next_keyframe():
+    async def main():
+        resyncs = []
+        hub = BroadcastHub(queue_size=3, send_timeout=60, on_resync=resyncs.append)
+        ws, sub = await viewer(hub)
+        hub.publish("video_frame", b"K0", source="cam", keyframe=True)
+        hub.publish("video_frame", b"D1", source="cam", keyframe=False)
+        hub.publish("video_frame", b"D2", source="cam", keyframe=False)
+        # Full: K0 goes, so D1 / D2 (and this D3) patch a picture the viewer won't have
+        hub.publish("video_frame", b"D3", source="cam", keyframe=False)
+        after_drop = queued(sub)
+        hub.publish("video_frame", b"D4", source="cam", keyframe=False)
+        hub.publish("video_frame", b"K5", source="cam", keyframe=True)
+        hub.publish("video_frame", b"D6", source="cam", keyframe=False)
+        return after_drop, queued(sub), resyncs, sub.dropped
+    after_drop, final, resyncs, dropped = asyncio.run(main())
+    assert after_drop == [] and final == [b"K5", b"D6"]
+    assert resyncs == ["cam"] and dropped == 5
+
+
+def test_drop_stops_at_a_queued_keyframe_and_spares_other_streams():
+    async def main():
+        resyncs = []
+        hub = BroadcastHub(queue_size=4, send_timeout=60, on_resync=resyncs.append)
+        ws, sub = await viewer(hub)
+        hub.publish("video_frame", b"a-D1", source="a", keyframe=False)
+        hub.publish("video_frame", b"b-D1", source="b", keyframe=False)
+        hub.publish("video_frame", b"a-K2", source="a", keyframe=True)
+        hub.publish("video_frame", b"a-D3", source="a", keyframe=False)
+        hub.publish("video_frame", b"b-D2", source="b", keyframe=False)  # full: a-D1 goes, a-K2 still restores a
+        return queued(sub), resyncs
+    final, resyncs = asyncio.run(main())
+    assert final == [b"b-D1", b"a-K2", b"a-D3", b"b-D2"]
+    assert resyncs == []
+
+
+def test_delivery_after_resync():
+    async def main():
+        hub = BroadcastHub(queue_size=2, send_timeout=60)
+        ws, sub = await viewer(hub)
+        for i, key in enumerate([True, False, False, False, True, False]):
+            hub.publish("video_frame", b"%d" % i, source="cam", keyframe=key)
+        ws.release.set()
+        await asyncio.sleep(0.05)  # let the writer drain and go idle
+        await hub.close()
+        return ws.sent
+    assert asyncio.run(main()) == [b"4", b"5"]
+
+
+def test_slow_client_with_reliable_messages_is_evicted():
+    async def main():
+        hub = BroadcastHub(queue_size=2, send_timeout=60)
+        ws, sub = await viewer(hub)
+        ws.close = lambda code=None: asyncio.sleep(0)
+        for i in range(3):
+            hub.publish("verdict", str(i))
+        return sub.id in hub.subscribers, hub.stats["evicted"]
+    assert asyncio.run(main()) == (False, 1)
@@ -0,0 +1,76 @@
+import cv2
+import numpy as np
+from clip_reducer import frame_repeats, reduce_clip, select_keyframes
+from dvr_core import ClipSnapshot
+
+
+class CountingSnapshot(ClipSnapshot):
+    """Records which frames were decoded"""
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.decodes = []
+
+    def decode(self, i):
+        self.decodes.append(i)
+        return super().decode(i)
+
+
+def burst(n=90, fps=30, storage="encoded"):
+    """A ball that only moves in the middle third of the clip"""
+    frames, ts = [], []
+    for i in range(n):
+        img = np.full((360, 640, 3), 50, np.uint8)
+        x = 100 + (i * 20 if n // 4 < i < n // 2 else 0)
+        cv2.circle(img, (min(x, 600), 180), 30, (255, 255, 255), -1)
+        frames.append(cv2.imencode(".jpg", img)[1].tobytes() if storage == "encoded" else img)
+        ts.append(1000 + i / fps)
+    return CountingSnapshot(storage, frames, ts)
+
+
+def test_only_picked_frames_are_decoded_twice(tmp_path):
+    snap = burst()
+    path, stats = reduce_clip(snap, str(tmp_path / "clip.mp4"))
+    assert path and stats["frames_out"] < len(snap)
+    # One pass over everything for thumbnails, then only the kept frames again
+    assert len(snap.decodes) == len(snap) + stats["frames_out"]
+    assert snap.decodes[:len(snap)] == list(range(len(snap)))
+
+
+def test_clip_plays_in_real_time(tmp_path):
+    path, stats = reduce_clip(burst(storage="decoded"), str(tmp_path / "clip.mp4"))
+    cap = cv2.VideoCapture(path)
+    duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS)
+    assert abs(duration - 89 / 30) < 0.2
+    assert stats["size"] == "480x270" and stats["frames_written"] == int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+
+def test_byte_budget_shrinks_the_clip(tmp_path):
+    path, stats = reduce_clip(burst(), str(tmp_path / "clip.mp4"), max_bytes=1)
+    assert path and stats["size"] != "480x270"
+
+
+def test_undecodable_frames_keep_timestamps_aligned(tmp_path):
+    snap = burst()
+    snap.frames[10] = b"not a jpeg"
+    motion = np.zeros(len(snap)); motion[60] = 100.0
+    path, stats = reduce_clip(snap, str(tmp_path / "clip.mp4"), motion=motion)
+    assert path and 60 in snap.decodes[len(snap):]
+
+
+def test_unwritable_path():
+    assert reduce_clip(burst(), "/nonexistent/dir/clip.mp4") == (None, {})
+
+
+def test_select_keyframes_prefers_motion():
+    ts = [i / 30 for i in range(90)]
+    scores = np.zeros(90, np.float32); scores[40:50] = 10.0
+    picked = select_keyframes(ts, scores)
+    assert picked[0] == 0 and picked[-1] == 89
+    assert set(range(40, 50)) & set(picked)
+    assert frame_repeats(ts, picked, 10.0)[-1] == 1
+
+
+def test_frames_sharing_a_slot_do_not_stretch_the_clip():
+    ts = [0.0, 0.1, 0.79, 0.81, 1.5, 3.0]
+    repeats = frame_repeats(ts, list(range(6)), 10.0)
+    assert min(repeats) == 1 and sum(repeats) == 31
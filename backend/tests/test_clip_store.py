@@ -0,0 +1,96 @@
+import os
+from clip_store import ClipStore
+
+
+def stage(store, clip_id, nbytes=10):
+    path = store.staging_path(clip_id)
+    with open(path, "wb") as f:
+        f.write(b"x" * nbytes)
+    return path
+
+
+def put(store, clip_id, nbytes=10, hold=False):
+    return store.commit(clip_id, stage(store, clip_id, nbytes), hold=hold)
+
+
+def test_commit_moves_staged_file_into_place(tmp_path):
+    store = ClipStore(str(tmp_path))
+    staged = stage(store, "a")
+    path = store.commit("a", staged, hold=False)
+    assert not os.path.exists(staged) and os.path.getsize(path) == 10
+    assert "a" in store and store.snapshot()["bytes"] == 10
+
+
+def test_count_budget_evicts_least_recently_used(tmp_path):
+    store = ClipStore(str(tmp_path), max_clips=2)
+    paths = {c: put(store, c) for c in "abc"}
+    assert "a" not in store and not os.path.exists(paths["a"])
+    assert list(store.clips) == ["b", "c"]
+
+
+def test_byte_budget(tmp_path):
+    store = ClipStore(str(tmp_path), max_bytes=25)
+    put(store, "a")
+    put(store, "b")
+    put(store, "c")
+    assert list(store.clips) == ["b", "c"] and store.bytes == 20
+
+
+def test_acquire_makes_clip_most_recently_used(tmp_path):
+    store = ClipStore(str(tmp_path), max_clips=2)
+    put(store, "a")
+    put(store, "b")
+    assert store.acquire("a")
+    store.release("a")
+    put(store, "c")
+    assert list(store.clips) == ["a", "c"]
+
+
+def test_held_clip_survives_until_released(tmp_path):
+    store = ClipStore(str(tmp_path), max_clips=1)
+    held = put(store, "a", hold=True)
+    put(store, "b", hold=True)
+    # Over budget, but both uploads are still reading their files
+    assert list(store.clips) == ["a", "b"] and os.path.exists(held)
+    assert store.snapshot()["held"] == 2
+    store.release("a")
+    assert "a" not in store and not os.path.exists(held)
+    assert list(store.clips) == ["b"]
+
+
+def test_unheld_clip_goes_before_an_older_held_one(tmp_path):
+    store = ClipStore(str(tmp_path), max_clips=1)
+    put(store, "a", hold=True)
+    put(store, "b")
+    assert list(store.clips) == ["a"]
+
+
+def test_refcounts_nest(tmp_path):
+    store = ClipStore(str(tmp_path), max_clips=1)
+    put(store, "a", hold=True)
+    assert store.acquire("a")
+    put(store, "b", hold=True)
+    store.release("a")
+    assert "a" in store  # one reference still held
+    store.release("a")
+    assert list(store.clips) == ["b"]
+    store.release("a")  # releasing an evicted clip is a no-op
+    assert store.acquire("a") is None
+
+
+def test_recommit_replaces_size(tmp_path):
+    store = ClipStore(str(tmp_path))
+    put(store, "a", nbytes=10)
+    put(store, "a", nbytes=4)
+    assert store.bytes == 4 and len(store.clips) == 1
+
+
+def test_restart_drops_staging_and_adopts_newest(tmp_path):
+    store = ClipStore(str(tmp_path))
+    for i, c in enumerate("abc"):
+        os.utime(put(store, c), (1000 + i, 1000 + i))
+    leftover = stage(store, "partial")
+    store = ClipStore(str(tmp_path), max_clips=2)
+    assert not os.path.exists(leftover)
+    assert list(store.clips) == ["b", "c"]
+    assert not os.path.exists(os.path.join(str(tmp_path), "clip_a.mp4"))
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from dvr_core import EncodedFrameRing, SmartDVR
+
+
+def frame(i, n=30):
+    return bytes([i % 256]) * n
+
+
+def contents(ring):
+    return [(data[0], len(data), ts) for data, ts in ring.items()]
+
+
+def test_keeps_order_within_capacity():
+    ring = EncodedFrameRing(capacity=4, max_bytes=1000)
+    for i in range(3):
+        assert ring.append(frame(i), timestamp=float(i))
+    assert len(ring) == 3
+    assert contents(ring) == [(0, 30, 0.0), (1, 30, 1.0), (2, 30, 2.0)]
+
+
+def test_capacity_evicts_oldest():
+    ring = EncodedFrameRing(capacity=4, max_bytes=1000)
+    for i in range(6):
+        ring.append(frame(i), timestamp=float(i))
+    assert [ts for _, ts in ring.items()] == [2.0, 3.0, 4.0, 5.0]
+
+
+def test_byte_budget_wraps_and_evicts_overwritten_entries():
+    ring = EncodedFrameRing(capacity=10, max_bytes=100)
+    for i in range(5):  # 3 x 30 bytes fit, the 4th wraps to offset 0 over frames 0 and 1
+        ring.append(frame(i), timestamp=float(i))
+    assert contents(ring) == [(2, 30, 2.0), (3, 30, 3.0), (4, 30, 4.0)]
+    assert ring.write_pos == 60
+
+
+def test_mixed_sizes_never_return_corrupt_frames():
+    rng = np.random.default_rng(0)
+    ring = EncodedFrameRing(capacity=8, max_bytes=256)
+    written = {}
+    for i in range(200):
+        n = int(rng.integers(1, 90))
+        data = bytes([i % 256]) * n
+        assert ring.append(data, timestamp=float(i))
+        written[float(i)] = data
+        items = ring.items()
+        assert items[-1][1] == float(i)  # the newest frame is always kept
+        assert [ts for _, ts in items] == sorted(ts for _, ts in items)
+        for data, ts in items:
+            assert data == written[ts]
+        assert sum(len(d) for d, _ in items) <= ring.max_bytes
+
+
+@pytest.mark.parametrize("n", [0, 101])
+def test_rejects_empty_and_oversized(n):
+    ring = EncodedFrameRing(capacity=4, max_bytes=100)
+    assert not ring.append(b"x" * n)
+    assert len(ring) == 0
+
+
+def test_clear():
+    ring = EncodedFrameRing(capacity=4, max_bytes=100)
+    ring.append(frame(1))
+    ring.clear()
+    assert len(ring) == 0 and ring.items() == []
+
+
+def test_smart_dvr_encoded_snapshot(tmp_path):
+    dvr = SmartDVR(buffer_size=3, temp_dir=str(tmp_path), storage="encoded", max_bytes=1000)
+    for i in range(5):
+        dvr.write_frame(None, jpeg_bytes=np.frombuffer(frame(i), np.uint8), timestamp=10.0 + i)
+    snap = dvr.snapshot()
+    assert snap.storage == "encoded"
+    assert snap.timestamps == [12.0, 13.0, 14.0]
+    assert [f[0] for f in snap.frames] == [2, 3, 4]
+    assert snap.trimmed(13.0, 14.0).timestamps == [13.0, 14.0]
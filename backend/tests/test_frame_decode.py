@@ -0,0 +1,52 @@
+import struct
+import cv2
+import numpy as np
+import pytest
+from frame_decode import jpeg_size
+
+
+def encode(h, w, *params):
+    ok, buf = cv2.imencode(".jpg", np.zeros((h, w, 3), np.uint8), list(params))
+    assert ok
+    return buf.tobytes()
+
+
+@pytest.mark.parametrize("h,w", [(1, 1), (360, 640), (720, 1280), (1080, 1920), (1920, 1080), (300, 4000)])
+def test_baseline_sizes(h, w):
+    assert jpeg_size(encode(h, w)) == (h, w)
+
+
+def test_progressive():
+    data = encode(240, 320, cv2.IMWRITE_JPEG_PROGRESSIVE, 1)
+    assert b"\xff\xc2" in data
+    assert jpeg_size(data) == (240, 320)
+
+
+def test_skips_app_segments_and_fill_bytes():
+    data = encode(48, 64)
+    exif = b"Exif\x00\x00" + b"\x00" * 500
+    app1 = b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif
+    data = data[:2] + app1 + b"\xff\xff" + data[2:]
+    assert jpeg_size(data) == (48, 64)
+
+
+@pytest.mark.parametrize("buf_type", [bytes, bytearray, memoryview, np.frombuffer])
+def test_accepts_buffer_types(buf_type):
+    data = encode(10, 20)
+    buf = np.frombuffer(data, np.uint8) if buf_type is np.frombuffer else buf_type(data)
+    assert jpeg_size(buf) == (10, 20)
+
+
+def test_not_a_jpeg():
+    ok, png = cv2.imencode(".png", np.zeros((10, 10, 3), np.uint8))
+    assert jpeg_size(png.tobytes()) is None
+    assert jpeg_size(b"") is None
+    assert jpeg_size(b"\xff\xd8") is None
+
+
+def test_truncated_before_sof():
+    data = encode(100, 200)
+    sof = data.index(b"\xff\xc0")
+    assert jpeg_size(data[:sof + 4]) is None
+    assert jpeg_size(data[:sof + 9]) is None  # height/width bytes cut off
+    assert jpeg_size(data[:sof + 10]) == (100, 200)
@@ -0,0 +1,179 @@
+import warnings
+import numpy as np
+import pytest
+from pose_events import (
+    HIPS, SHOULDERS, IncidentDetector, LandmarkRing, contact, fall, motion_energy, velocity_spike,
+)
+
+FPS = 15
+
+
+@pytest.fixture(autouse=True)
+def no_numpy_warnings():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        yield
+
+
+def person(x, y=0.6, torso=0.15):
+    """Upright player: hips at (x, y), limbs at shoulder height, knees / ankles below the hips"""
+    p = np.zeros((33, 3), np.float32)
+    p[:, 0], p[:, 1] = x, y - torso
+    p[:11, 1] = y - torso - 0.05          # face
+    p[SHOULDERS, 1] = y - torso
+    p[HIPS, 1] = y
+    p[[25, 26, 27, 28], 1] = y + 0.15
+    return p
+
+
+def play(frames, stride=1, window=15, fps=FPS):
+    """Feeds a play frame by frame; with stride > 1 only every stride-th frame has a detection"""
+    ring = LandmarkRing(60)
+    detector = IncidentDetector(ring, window=window)
+    hits = []
+    for i, poses in enumerate(frames):
+        detected = i % stride == 0
+        ring.append(poses if detected else None, i / fps)
+        if detected:
+            hit = detector.update()
+            if hit: hits.append(hit["type"])
+    return ring, hits
+
+
+def two(a, b):
+    return np.stack([a, b])
+
+
+# --- LandmarkRing matching ---
+
+def test_crossing_players_keep_their_slots():
+    ring, _ = play([two(person(0.3 + 0.02 * i), person(0.7 - 0.02 * i)) for i in range(20)])
+    _, poses, _ = ring.window(20)
+    assert np.all(np.diff(poses[:, 0, 23, 0]) > 0)   # slot 0: the player moving right
+    assert np.all(np.diff(poses[:, 1, 23, 0]) < 0)
+
+
+def test_detection_order_does_not_matter():
+    ring = LandmarkRing(10)
+    ring.append(two(person(0.2), person(0.8)), 0.0)
+    ring.append(two(person(0.81), person(0.21)), 0.1)  # the landmarker listed them the other way round
+    _, poses, _ = ring.window(2)
+    assert poses[1, 0, 23, 0] == pytest.approx(0.21) and poses[1, 1, 23, 0] == pytest.approx(0.81)
+
+
+def test_newcomer_never_takes_a_slot_just_vacated():
+    ring = LandmarkRing(10, max_poses=2)
+    ring.append(two(person(0.2), person(0.8)), 0.0)
+    ring.append(two(person(0.2), person(0.5)), 0.1)   # 0.8 left, someone new at 0.5
+    ring.append(two(person(0.2), person(0.5)), 0.2)
+    _, poses, counts = ring.window(3)
+    assert counts.tolist() == [2, 1, 2]
+    assert np.isnan(poses[1, 1, 23, 0]) and poses[2, 1, 23, 0] == pytest.approx(0.5)
+
+
+def test_skipped_frames_keep_the_ring_frame_aligned():
+    ring = LandmarkRing(8)
+    for i in range(12):
+        ring.append(two(person(0.2 + 0.01 * i), person(0.8)) if i % 3 == 0 else None, float(i))
+    ts, _, counts = ring.window(8)
+    assert ts.tolist() == [float(i) for i in range(4, 12)]
+    assert counts.tolist() == [-1, -1, 2, -1, -1, 2, -1, -1]
+    ts, poses, counts = ring.detections(15)
+    assert ts.tolist() == [6.0, 9.0] and counts.tolist() == [2, 2]
+    # Matching carries across the gaps
+    assert poses[:, 0, 23, 0] == pytest.approx([0.26, 0.29])
+
+
+# --- detectors ---
+
+def strike(n=20, at=12):
+    frames = []
+    for i in range(n):
+        a, b = person(0.45), person(0.6)
+        if i == at:
+            a[15, 0], a[15, 1] = 0.6, 0.4            # wrist lands on the other player's head, then comes back
+        frames.append(two(a, b))
+    return frames
+
+
+def test_strike_fires_velocity_spike():
+    assert play(strike())[1] == ["velocity_spike"]
+
+
+def test_strike_fires_with_skipped_frames():
+    # 45 fps camera, every 3rd frame detected: the NaN frames in between must not hide the spike
+    assert play(strike(n=60, at=36), stride=3, fps=3 * FPS)[1] == ["velocity_spike"]
+
+
+def test_pass_away_from_players_does_not_fire():
+    frames = []
+    for i in range(20):
+        a, b = person(0.2), person(0.8)
+        a[[15, 16], 0] = 0.2 + (0.15 if i % 4 == 1 else 0)   # ~15 torso lengths / s, nowhere near b
+        frames.append(two(a, b))
+    assert play(frames)[1] == []
+
+
+def test_close_guarding_does_not_fire():
+    frames = []
+    for i in range(20):
+        a, b = person(0.45), person(0.55)
+        a[[15, 16], 0], a[[15, 16], 1] = 0.55, 0.52          # hands on the torso
+        frames.append(two(a, b))
+    assert play(frames)[1] == []
+
+
+def test_hand_on_face_fires_contact():
+    frames = []
+    for i in range(20):
+        a, b = person(0.45), person(0.6)
+        a[15, 0], a[15, 1] = 0.6, 0.41
+        frames.append(two(a, b))
+    assert play(frames)[1] == ["contact"]
+    ts = np.arange(5) / FPS
+    hit = contact(ts, np.stack(frames[:5]), np.full(5, 2))
+    assert hit is not None and hit[1] == (0, 1)
+
+
+def test_contact_needs_persistence():
+    frames = [two(person(0.45), person(0.6)) for _ in range(5)]
+    frames[-1][0, 15, :2] = (0.6, 0.41)
+    assert contact(np.arange(5) / FPS, np.stack(frames), np.full(5, 2)) is None
+
+
+def test_fall_needs_a_drop_and_a_lying_torso():
+    frames = [two(person(0.3), person(0.7)) for _ in range(6)]
+    down = frames[-1][1]
+    down[HIPS, 1] = 0.85
+    down[SHOULDERS, 0], down[SHOULDERS, 1] = 0.85, 0.85       # torso now horizontal
+    ts = np.arange(6) / FPS
+    hit = fall(ts, np.stack(frames), np.full(6, 2))
+    assert hit is not None and hit[1] == 1
+    standing = [two(person(0.3), person(0.7)) for _ in range(6)]
+    assert fall(ts, np.stack(standing), np.full(6, 2)) is None
+
+
+def test_velocity_spike_ignores_absent_players():
+    poses = np.stack([two(person(0.45), person(0.6)) for _ in range(4)])
+    poses[2, 1] = np.nan
+    assert velocity_spike(np.arange(4) / FPS, poses, np.array([2, 2, 1, 2])) is None
+
+
+def test_cooldown_rearms():
+    ring = LandmarkRing(60)
+    detector = IncidentDetector(ring, window=15, cooldown=10.0)
+    fired = []
+    for k in range(2):
+        for i, poses in enumerate(strike()):
+            ring.append(poses, k * 5.0 + i / FPS)
+            hit = detector.update()
+            if hit: fired.append(hit["timestamp"])
+    assert len(fired) == 1 and detector.stats()["velocity_spike"] == 1
+
+
+def test_motion_energy_is_zero_when_still():
+    poses = np.stack([two(person(0.3), person(0.7)) for _ in range(5)])
+    assert motion_energy(np.arange(5) / FPS, poses).tolist() == [0.0] * 5
+    poses[3:, 0, :, 0] += 0.1
+    energy = motion_energy(np.arange(5) / FPS, poses)
+    assert energy[3] > 0 and energy[4] == 0
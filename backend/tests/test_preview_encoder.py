@@ -0,0 +1,120 @@
+import cv2
+import numpy as np
+from preview_encoder import DELTA_HEADER, DELTA_KEY, LEVELS, TILE_HEADER, PreviewEncoder
+
+
+class Canvas:
+    """What the browser does with a MSG_VIDEO_DELTA payload"""
+    def __init__(self):
+        self.image = None
+
+    def apply(self, payload):
+        flags, quality, w, h, ntiles = DELTA_HEADER.unpack_from(payload)
+        if flags & DELTA_KEY or self.image is None or self.image.shape[:2] != (h, w):
+            self.image = np.zeros((h, w, 3), np.uint8)
+        i = DELTA_HEADER.size
+        tiles = []
+        for _ in range(ntiles):
+            x, y, n = TILE_HEADER.unpack_from(payload, i)
+            i += TILE_HEADER.size
+            tile = cv2.imdecode(np.frombuffer(payload, np.uint8, n, i), cv2.IMREAD_COLOR)
+            i += n
+            self.image[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+            tiles.append((x, y, tile.shape[1], tile.shape[0]))
+        assert i == len(payload)
+        return flags, quality, tiles
+
+
+def scene(t, h=360, w=640):
+    """Smooth background (JPEG-friendly) with a square moving right"""
+    yy, xx = np.mgrid[0:h, 0:w]
+    frame = np.dstack([xx * 255 // w, yy * 255 // h, np.full_like(xx, 96)]).astype(np.uint8)
+    x = 40 + 12 * t
+    frame[100:160, x:x + 60] = (255, 255, 255)
+    return frame
+
+
+def error(a, b):
+    return np.abs(a.astype(np.int16) - b.astype(np.int16)).mean()
+
+
+def encoder(**kwargs):
+    return PreviewEncoder(keyframe_interval=1e9, **kwargs)
+
+
+def test_deltas_reconstruct_the_stream():
+    enc, canvas = encoder(), Canvas()
+    for t in range(20):
+        frame = scene(t)
+        flags, _, tiles = canvas.apply(enc.encode(frame, t))
+        assert bool(flags & DELTA_KEY) == (t == 0)
+        assert error(canvas.image, frame) < 3.0
+        assert error(canvas.image, enc.ref) < 3.0
+        if t:
+            # Only the strip the square moves through is resent
+            assert all(y < 192 and y + th > 64 for x, y, tw, th in tiles)
+            assert sum(tw * th for _, _, tw, th in tiles) < 0.1 * frame.shape[0] * frame.shape[1]
+
+
+def test_static_frame_sends_no_tiles():
+    enc, canvas = encoder(), Canvas()
+    canvas.apply(enc.encode(scene(0), 0))
+    flags, _, tiles = canvas.apply(enc.encode(scene(0), 1))
+    assert flags == 0 and tiles == []
+
+
+def test_slow_drift_accumulates_until_sent():
+    enc, canvas = encoder(), Canvas()
+    base = scene(0)
+    canvas.apply(enc.encode(base, 0))
+    sent = 0
+    for step in range(1, 16):
+        frame = cv2.add(base, np.full_like(base, step))  # +1 grey level per frame, below threshold
+        sent += len(canvas.apply(enc.encode(frame, step))[2])
+        assert error(canvas.image, frame) < enc.threshold + 3.0
+    assert sent  # the client's copy is what's compared, so the drift is eventually sent
+
+
+def test_large_change_becomes_a_keyframe():
+    enc, canvas = encoder(), Canvas()
+    canvas.apply(enc.encode(scene(0), 0))
+    frame = 255 - scene(0)
+    flags, _, tiles = canvas.apply(enc.encode(frame, 1))
+    assert flags & DELTA_KEY and len(tiles) == 1
+    assert error(canvas.image, frame) < 3.0
+
+
+def test_requested_keyframe():
+    enc, canvas = encoder(), Canvas()
+    canvas.apply(enc.encode(scene(0), 0))
+    enc.request_keyframe()
+    late_joiner = Canvas()
+    flags, _, _ = late_joiner.apply(enc.encode(scene(1), 1))
+    assert flags & DELTA_KEY
+    assert error(late_joiner.image, scene(1)) < 3.0
+
+
+def test_congestion_steps_down_with_a_scaled_keyframe():
+    enc, canvas = encoder(max_inflight=2), Canvas()
+    canvas.apply(enc.encode(scene(0), 0))
+    enc.ack(0)
+    seq = 1
+    while enc.level < 3:  # never ACKed -> inflight grows past max_inflight
+        payload = enc.encode(scene(seq), seq)
+        seq += 1
+    flags, quality, w, h, _ = DELTA_HEADER.unpack_from(payload)
+    assert flags & DELTA_KEY
+    assert (quality, w / 640) == LEVELS[enc.level]
+    canvas.apply(payload)
+    assert canvas.image.shape[:2] == (h, w)
+    assert error(canvas.image, cv2.resize(scene(seq - 1), (w, h), interpolation=cv2.INTER_AREA)) < 3.0
+
+
+def test_overlay_only_past_the_last_level():
+    enc = encoder(max_inflight=1)
+    enc.encode(scene(0), 0)
+    enc.ack(0)
+    for seq in range(1, 40):
+        if enc.encode(scene(seq), seq) is None:
+            break
+    assert enc.overlay_only and enc.stats()["quality"] is None
@@ -0,0 +1,97 @@
+import asyncio
+from review_queue import ReviewQueue, StubReviewClient
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_request_inside_an_in_flight_review_joins_it():
+    async def main():
+        queue = ReviewQueue(StubReviewClient(delay=0))
+        job, new = queue.open("cam", (10.0, 20.0), "a")
+        joined, joined_new = queue.open("cam", (12.0, 19.0), "b")
+        return job, new, joined, joined_new, queue.stats["coalesced"]
+    job, new, joined, joined_new, coalesced = run(main())
+    assert new and not joined_new and joined is job
+    assert job.waiters == 2 and coalesced == 1
+
+
+def test_wider_or_shifted_request_gets_its_own_review():
+    async def main():
+        queue = ReviewQueue(StubReviewClient(delay=0))
+        short, _ = queue.open("cam", (19.0, 20.0), "short")
+        whole, whole_new = queue.open("cam", (0.0, 20.0), "whole")     # whole buffer / start=0
+        later, later_new = queue.open("cam", (19.5, 21.0), "later")    # overlaps, runs past it
+        return short, whole, whole_new, later, later_new, queue
+    short, whole, whole_new, later, later_new, queue = run(main())
+    assert whole_new and whole is not short and whole.id == "whole"
+    assert later_new and later.id == "later"
+    assert queue.stats["coalesced"] == 0 and len(queue.active) == 3
+
+
+def test_other_streams_and_finished_reviews_are_not_joined():
+    async def main():
+        queue = ReviewQueue(StubReviewClient(delay=0))
+        job, _ = queue.open("cam", (10.0, 20.0), "a")
+        _, other_new = queue.open("other", (12.0, 18.0), "b")
+        await queue.run(job, "clip.mp4")
+        _, again_new = queue.open("cam", (12.0, 18.0), "c")
+        return other_new, again_new
+    assert run(main()) == (True, True)
+
+
+def test_full_queue():
+    async def main():
+        queue = ReviewQueue(StubReviewClient(delay=0), max_pending=1)
+        queue.open("cam", (0.0, 1.0), "a")
+        return queue.open("cam", (5.0, 6.0), "b")
+    assert run(main()) == (None, False)
+
+
+def test_failure_reaches_every_waiter():
+    async def main():
+        queue = ReviewQueue(StubReviewClient(delay=0))
+        job, _ = queue.open("cam", (0.0, 10.0), "a")
+        joined, _ = queue.open("cam", (1.0, 2.0), "b")
+        queue.fail(job, ValueError("Empty clip"))
+        try:
+            await joined.future
+        except ValueError as e:
+            return str(e), queue.active
+    assert run(main()) == ("Empty clip", {})
+
+
+def test_verdict_cache_is_keyed_by_source_frames():
+    from dvr_core import ClipSnapshot
+    frames = [b"jpeg-%d" % i for i in range(20)]
+    # A reconnect (new session id) and a window shifted by a few ms over the same frames
+    first = ClipSnapshot("encoded", frames, [100.0 + i for i in range(20)])
+    again = ClipSnapshot("encoded", list(frames), [100.004 + i for i in range(20)])
+    other = ClipSnapshot("encoded", frames[1:], [101.0 + i for i in range(19)])
+
+    async def main():
+        client = StubReviewClient(delay=0)
+        queue = ReviewQueue(client)
+        results = []
+        for stream, snap in (("cam1", first), ("cam2", again), ("cam2", other)):
+            job, _ = queue.open(stream, (snap.timestamps[0], snap.timestamps[-1]), stream + str(len(results)))
+            job.key = snap.digest()
+            hit = queue.cached(job)
+            await queue.run(job, None if hit else "clip.mp4")
+            results.append((hit, job.cached))
+        return results, client.calls, queue.stats["cache_hits"]
+    results, calls, hits = run(main())
+    assert results == [(False, False), (True, True), (False, False)]
+    assert calls == 2 and hits == 1
+
+
+def test_decoded_frames_digest():
+    import numpy as np
+    from dvr_core import ClipSnapshot
+    a = np.zeros((4, 6, 3), np.uint8)
+    b = a.copy(); b[0, 0, 0] = 1
+    digest = lambda frames: ClipSnapshot("decoded", frames, [0.0] * len(frames)).digest()
+    assert digest([a, a]) == digest([a.copy(), a.copy()])
+    assert digest([a, a]) != digest([a, b])
+    assert digest([a[:, ::2]]) == digest([np.ascontiguousarray(a[:, ::2])])
@@ -0,0 +1,109 @@
+import os
+import time
+import numpy as np
+from dvr_core import SegmentedRecorder, sweep_recordings
+
+
+def jpeg(i):
+    return f"frame{i:05d}".encode()
+
+
+def record(recorder, n, t0=1000.0, fps=10):
+    for i in range(n):
+        recorder.write(jpeg(i), t0 + i / fps)
+
+
+def names(snapshot):
+    return [int(f.decode()[5:]) for f in snapshot.frames]
+
+
+def test_rotation_writes_indexed_segments(tmp_path):
+    rec = SegmentedRecorder(str(tmp_path), segment_seconds=2.0, retention=1e9)
+    record(rec, 50)  # 5 s at 10 fps -> two closed 2 s segments + the open one
+    assert len(rec.segments) == 2
+    for first, last, frames, nbytes, path in rec.segments:
+        assert frames == 20 and nbytes == 20 * len(jpeg(0))
+        index = np.load(path + ".idx")
+        assert index[0, 0] == first and index[-1, 0] == last
+    assert len(rec.index) == 10
+    assert rec.span() == (1000.0, 1004.9)
+
+
+def test_range_snapshot_spans_segments(tmp_path):
+    rec = SegmentedRecorder(str(tmp_path), segment_seconds=2.0, retention=1e9)
+    record(rec, 50)
+    snap = rec.snapshot(1001.5, 1004.2)
+    assert names(snap) == list(range(15, 43))
+    assert snap.timestamps[0] == 1001.5 and snap.timestamps[-1] == 1004.2
+    assert rec.snapshot(2000.0, 2001.0).frames == []
+
+
+def test_thinned_snapshot_reads_only_the_kept_frames(tmp_path):
+    rec = SegmentedRecorder(str(tmp_path), segment_seconds=2.0, retention=1e9)
+    record(rec, 50)
+    snap = rec.snapshot(1000.0, 1004.9, max_frames=6)
+    expected = np.linspace(0, 49, 6).astype(int).tolist()
+    assert names(snap) == expected
+    assert snap.timestamps == [1000.0 + i / 10 for i in expected]
+
+
+def test_expired_segment_files_are_skipped(tmp_path):
+    rec = SegmentedRecorder(str(tmp_path), segment_seconds=2.0, retention=1e9)
+    record(rec, 50)
+    os.remove(rec.segments[0][4])
+    assert names(rec.snapshot(1000.0, 1004.9)) == list(range(20, 50))
+
+
+def test_retention_on_rotation_and_expire(tmp_path):
+    rec = SegmentedRecorder(str(tmp_path), segment_seconds=2.0, retention=3.0)
+    record(rec, 80)  # 8 s; the last rotation (at 1006) drops segments that ended before 1002.9
+    assert [s[0] for s in rec.segments] == [1002.0, 1004.0]
+    assert not os.path.exists(os.path.join(str(tmp_path), "1000000.mjpeg"))
+    # Idle stream: expire() closes the stale open segment and applies retention by the clock
+    rec.expire(now=1007.9 + 2.5)
+    assert rec.file is None and [s[0] for s in rec.segments] == [1006.0]
+    rec.expire(now=1020.0)
+    assert rec.span() is None and rec.disk_bytes == 0
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_disk_budget(tmp_path):
+    per_segment = 20 * len(jpeg(0))
+    rec = SegmentedRecorder(str(tmp_path), segment_seconds=2.0, retention=1e9, max_bytes=2 * per_segment)
+    record(rec, 100)
+    assert rec.disk_bytes <= 2 * per_segment + len(rec.index) * len(jpeg(0))
+
+
+def test_close_keeps_or_deletes(tmp_path):
+    kept = SegmentedRecorder(str(tmp_path / "kept"), segment_seconds=2.0)
+    record(kept, 25)
+    kept.close(delete=False)
+    assert sorted(os.listdir(str(tmp_path / "kept"))) == ["1000000.mjpeg", "1000000.mjpeg.idx", "1002000.mjpeg", "1002000.mjpeg.idx"]
+    gone = SegmentedRecorder(str(tmp_path / "gone"), segment_seconds=2.0)
+    record(gone, 25)
+    gone.close()
+    assert not os.path.exists(str(tmp_path / "gone"))
+
+
+def test_sweep_recordings(tmp_path):
+    root = tmp_path / "recordings"
+    for name in ("live", "ended", "recent"):
+        (root / name).mkdir(parents=True)
+        (root / name / "1.mjpeg").write_bytes(b"x")
+    old = time.time() - 100
+    for name in ("live", "ended"):
+        os.utime(root / name / "1.mjpeg", (old, old))
+    assert sweep_recordings(str(root), retention=50, keep={"live"}) == 1
+    assert sorted(os.listdir(str(root))) == ["live", "recent"]
+    assert sweep_recordings(str(tmp_path / "missing"), retention=50) == 0
+
+
+def test_load_reopens_an_ended_recording(tmp_path):
+    rec = SegmentedRecorder(str(tmp_path), segment_seconds=2.0, retention=1e9)
+    record(rec, 45)
+    rec.close(delete=False)
+    ended = SegmentedRecorder.load(str(tmp_path))
+    assert ended.span() == (1000.0, 1004.4) and len(ended.segments) == 3
+    assert names(ended.snapshot(1003.0, 1004.4)) == list(range(30, 45))
+    assert ended.count(1000.0, 1004.4) >= 45
+    assert SegmentedRecorder.load(str(tmp_path / "missing")) is None
@@ -0,0 +1,73 @@
+import cv2
+import numpy as np
+import pytest
+import wire_protocol as wp
+
+
+def test_unpack_frame_round_trip():
+    jpeg = b"\xff\xd8fake jpeg\xff\xd9"
+    data = wp.IN_HEADER.pack(42, 1_700_000_000_123) + jpeg
+    seq, ts, view = wp.unpack_frame(data)
+    assert (seq, ts) == (42, 1_700_000_000_123)
+    assert isinstance(view, memoryview) and view.tobytes() == jpeg
+
+
+@pytest.mark.parametrize("data", [b"", b"\x00" * wp.IN_HEADER.size])
+def test_unpack_frame_rejects_header_only(data):
+    with pytest.raises(ValueError):
+        wp.unpack_frame(data)
+
+
+def test_pack_message_round_trip():
+    payload = b"\x01\x02\x03payload"
+    out = wp.pack_message(wp.MSG_VIDEO_FRAME, 7, 123456789, payload)
+    assert wp.OUT_HEADER.unpack_from(out) == (wp.MSG_VIDEO_FRAME, 7, 123456789)
+    assert bytes(out[wp.OUT_HEADER.size:]) == payload
+
+
+def test_pack_message_flattens_imencode_output_and_wraps_seq():
+    ok, buf = cv2.imencode(".jpg", np.zeros((16, 16, 3), np.uint8))
+    buf = buf.reshape(-1, 1)  # older OpenCV builds return N x 1
+    out = wp.pack_message(wp.MSG_VIDEO_FRAME, 2**32 + 5, 0, buf)
+    msg_type, seq, _ = wp.OUT_HEADER.unpack_from(out)
+    assert (msg_type, seq) == (wp.MSG_VIDEO_FRAME, 5)
+    assert bytes(out[wp.OUT_HEADER.size:]) == buf.tobytes()
+
+
+def unpack_poses(payload, n_joints):
+    n, flags = payload[0], payload[1]
+    xy = np.frombuffer(payload, dtype="<u2", offset=2).reshape(n, n_joints, 2)
+    return xy.astype(np.float64) / wp.POSE_SCALE, flags
+
+
+def test_pose_payload_round_trip():
+    rng = np.random.default_rng(1)
+    poses = rng.random((3, 33, 3))
+    joints = [0, 11, 12, 23, 24]
+    payload = wp.pack_poses(wp.quantize_poses(poses, joints), wp.FLAG_ACTION)
+    assert len(payload) == 2 + 3 * len(joints) * 2 * 2
+    xy, flags = unpack_poses(payload, len(joints))
+    assert flags == wp.FLAG_ACTION
+    np.testing.assert_allclose(xy, poses[:, joints, :2], atol=1 / wp.POSE_SCALE)
+
+
+def test_pose_quantize_clips_out_of_frame_landmarks():
+    poses = np.array([[[-0.2, 1.4, 0.0]] * 33])
+    q = wp.quantize_poses(poses, [0])
+    assert q.tolist() == [[[0, wp.POSE_SCALE]]]
+
+
+@pytest.mark.parametrize("poses", [None, np.zeros((0, 33, 3))])
+def test_pose_payload_without_people(poses):
+    payload = wp.pack_poses(wp.quantize_poses(poses, [0, 1]), 0)
+    assert payload == b"\x00\x00"
+    xy, _ = unpack_poses(payload, 2)
+    assert xy.shape == (0, 2, 2)
+
+
+def test_pose_message_in_out_header():
+    payload = wp.pack_poses(wp.quantize_poses(np.full((1, 33, 3), 0.5), [0]), 0)
+    out = wp.pack_message(wp.MSG_POSE_FRAME, 9, 1000, payload)
+    assert wp.OUT_HEADER.unpack_from(out) == (wp.MSG_POSE_FRAME, 9, 1000)
+    xy, _ = unpack_poses(bytes(out[wp.OUT_HEADER.size:]), 1)
+    np.testing.assert_allclose(xy, 0.5, atol=1 / wp.POSE_SCALE)
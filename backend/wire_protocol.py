@@ -0,0 +1,47 @@
+import struct
+import numpy as np
+
+# Negotiated with the Sec-WebSocket-Protocol header:
+#   new WebSocket(url, ["refzero.bin.v1"])
+# Without it the socket stays on the legacy base64 "data:image" text messages.
+BINARY_SUBPROTOCOL = "refzero.bin.v1"
+
+# Client -> server: seq (u32), capture timestamp ms (u64), then raw JPEG bytes
+IN_HEADER = struct.Struct("<IQ")
+# Server -> client: message type (u8), seq (u32), capture timestamp ms (u64), then payload
+OUT_HEADER = struct.Struct("<BIQ")
+
+MSG_VIDEO_FRAME = 1
+MSG_POSE_FRAME = 2   # payload: num_poses (u8), flags (u8), num_poses x joints x (x, y) u16
+MSG_VIDEO_DELTA = 3  # payload: see preview_encoder.DELTA_HEADER (output=delta, ACKed with {"type": "ack", "seq": n})
+
+FLAG_ACTION = 1
+POSE_SCALE = 65535   # normalized [0, 1] coords quantized to u16
+
+
+def unpack_frame(data):
+    """Returns (seq, timestamp_ms, jpeg view) without copying the JPEG bytes"""
+    if len(data) <= IN_HEADER.size:
+        raise ValueError("Binary frame too short")
+    seq, timestamp_ms = IN_HEADER.unpack_from(data)
+    return seq, timestamp_ms, memoryview(data)[IN_HEADER.size:]
+
+
+def pack_message(msg_type, seq, timestamp_ms, payload):
+    payload = memoryview(payload).cast("B")  # flat view (cv2.imencode returns N x 1)
+    out = bytearray(OUT_HEADER.size + len(payload))
+    OUT_HEADER.pack_into(out, 0, msg_type, seq & 0xFFFFFFFF, timestamp_ms)
+    out[OUT_HEADER.size:] = payload
+    return out
+
+
+def quantize_poses(poses, joints):
+    """(poses x 33 x 3) normalized landmarks -> (poses x len(joints) x 2) u16 x/y"""
+    if poses is None or not len(poses):
+        return np.zeros((0, len(joints), 2), dtype=np.uint16)
+    xy = np.clip(poses[:, joints, :2], 0.0, 1.0)
+    return np.rint(xy * POSE_SCALE).astype(np.uint16)
+
+
+def pack_poses(quantized, flags):
+    return bytes((min(len(quantized), 255), flags)) + quantized[:255].astype("<u2").tobytes()